@@ -1,7 +1,8 @@
-"""Initialization of API app."""
+"""Initialization of WSGI app."""
 
 from trickster.api_app import ApiApp
 from trickster.config import Config
+from trickster.wsgi_app import WsgiApp
 
 
-app = ApiApp(Config())
+app = WsgiApp(ApiApp(Config()))
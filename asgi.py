@@ -0,0 +1,8 @@
+"""Initialization of ASGI app."""
+
+from trickster.api_app import ApiApp
+from trickster.asgi_app import AsgiApp
+from trickster.config import Config
+
+
+app = AsgiApp(ApiApp(Config()))
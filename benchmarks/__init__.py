@@ -0,0 +1 @@
+"""Benchmarks of Trickster."""
@@ -0,0 +1,61 @@
+"""Benchmark of loading routes files serially and by worker processes.
+
+Routes files are generated to a temporary directory, then they are loaded
+by the current process and by given numbers of worker processes:
+
+    python -m benchmarks.load_routes --files 8 --routes 20000 --workers 2 4
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from trickster.loader import RoutesFiles
+
+
+def write_files(directory: Path, files: int, routes: int) -> None:
+    """Write NDJSON routes files with given number of Routes each."""
+    for file_index in range(files):
+        with (directory / f'routes{file_index:04}.ndjson').open('w') as routes_file:
+            for index in range(routes):
+                route = {
+                    'id': f'route{file_index}x{index}',
+                    'path': f'/api/items/{file_index}/{index}$',
+                    'method': 'GET',
+                    'responses': [{'status': 200, 'body': {'file': file_index, 'item': index}, 'repeat': 3}]
+                }
+                routes_file.write(json.dumps(route) + '\n')
+
+
+def measure(directory: Path, workers: int) -> float:
+    """Get time of loading all Routes in seconds."""
+    start = time.perf_counter()
+    count = sum(1 for _ in RoutesFiles(str(directory), max_workers=workers))
+    elapsed = time.perf_counter() - start
+    assert count, 'No routes were loaded.'
+    return elapsed
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=8, help='Number of routes files.')
+    parser.add_argument('--routes', type=int, default=20000, help='Number of Routes in every file.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[os.cpu_count() or 1], help='Numbers of workers.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_files(Path(directory), args.files, args.routes)
+        print(f'{args.files} files, {args.files * args.routes} routes, {os.cpu_count()} CPUs')
+        serial = measure(Path(directory), 1)
+        print(f'{"serial":>10} {serial:8.2f}s')
+        for workers in args.workers:
+            parallel = measure(Path(directory), workers)
+            print(f'{workers:>2} workers {parallel:8.2f}s {serial / parallel:6.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Microbenchmarks of matching a request by a single Route of common shapes.
+
+Compiled matcher of the Route is compared to testing the method, the regular
+expression and activity of the Route every time:
+
+    python -m benchmarks.route_match --number 200000
+"""
+
+import argparse
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+from trickster.routing.input import IncomingTestRequest
+from trickster.routing.router import Route
+
+
+# Route definition, method and path of the request
+SHAPES: List[Tuple[str, Dict[str, Any], str, str]] = [
+    ('literal', {'path': '/api/users$'}, 'GET', '/api/users'),
+    ('prefix', {'path': '/api/users'}, 'GET', '/api/users/1'),
+    ('wildcard', {'path': '/api/users/.*'}, 'GET', '/api/users/1/orders'),
+    ('parametrized', {'path': '/api/users/[0-9]+/orders$'}, 'GET', '/api/users/1/orders'),
+    ('other method', {'path': '/api/users/[0-9]+/orders$', 'method': 'POST'}, 'GET', '/api/users/1/orders'),
+    ('any method', {'path': '/api/users$', 'method': None}, 'DELETE', '/api/users'),
+    ('token auth', {'path': '/api/users$', 'auth': {'method': 'token', 'token': 'secret'}}, 'GET', '/api/users')
+]
+
+
+class Request:
+    """Request with plain attributes, so the benchmark measures only the Route."""
+
+    def __init__(self, method: str, path: str) -> None:
+        self.method = method
+        self.path = path
+        self.headers = {'Authorization': 'Bearer secret'}
+
+
+def generic_match(route: Route) -> Callable[[Any], bool]:
+    """Match request testing all conditions of the Route every time."""
+    def match(request: Any) -> bool:
+        return all([
+            route.method in [None, request.method],
+            bool(route.path.match(request.path)),
+            route.is_active
+        ])
+    return match
+
+
+def serve(match: Callable[[Any], bool], route: Route, skip_no_auth: bool) -> Callable[[Any], None]:
+    """Match request and authenticate it like the app does."""
+    def serve_request(request: Any) -> None:
+        if match(request) and (route.auth_required or not skip_no_auth):
+            route.authenticate(request)
+    return serve_request
+
+
+def measure(function: Callable[[Any], None], request: Any, number: int) -> float:
+    """Get time of one call in nanoseconds."""
+    return timeit.timeit(lambda: function(request), number=number) / number * 1e9
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=200000, help='Number of matches of every shape.')
+    args = parser.parse_args()
+
+    print(f'{"shape":15} {"generic":>10} {"compiled":>10}')
+    for name, definition, method, path in SHAPES:
+        route = Route.deserialize({'id': name, 'responses': [{'body': ''}], 'method': 'GET', **definition})
+        request = Request(method, path)
+        assert route.match(request) == generic_match(route)(request)
+        assert route.match(IncomingTestRequest('http://localhost/', path, method)) == route.match(request)
+        generic = measure(serve(generic_match(route), route, False), request, args.number)
+        compiled = measure(serve(route.match, route, True), request, args.number)
+        print(f'{name:15} {generic:8.0f}ns {compiled:8.0f}ns')
+
+
+if __name__ == '__main__':
+    main()
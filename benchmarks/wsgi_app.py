@@ -0,0 +1,73 @@
+"""Benchmark of serving user Routes by Flask app and by WSGI app bypassing Flask.
+
+Requests are passed directly to the WSGI callables, without network and server,
+so the benchmark measures only the overhead of the app itself:
+
+    python -m benchmarks.wsgi_app --routes 1000 --requests 20000
+"""
+
+import argparse
+import time
+from typing import Any, Callable, Dict, List
+
+from trickster.api_app import ApiApp
+from trickster.config import Config
+from trickster.wsgi_app import WsgiApp
+
+from werkzeug.test import EnvironBuilder
+
+
+def create_routes(count: int) -> List[Dict[str, Any]]:
+    """Create Routes with literal and parametrized paths that never get exhausted."""
+    return [
+        {
+            'id': f'route{i}',
+            'path': f'/api/v1/resource{i}/[0-9]+$' if i % 2 else f'/api/v1/resource{i}$',
+            'responses': [{'body': {'id': i, 'name': f'resource {i}'}}]
+        }
+        for i in range(count)
+    ]
+
+
+def create_environs(routes: int, requests: int) -> List[Dict[str, Any]]:
+    """Create WSGI environments of requests spread over all Routes, every tenth one matching no Route."""
+    paths = [
+        '/unknown/path' if i % 10 == 9 else f'/api/v1/resource{i % routes}' + ('/42' if i % routes % 2 else '')
+        for i in range(requests)
+    ]
+    return [EnvironBuilder(path=path).get_environ() for path in paths]
+
+
+def measure(app: Callable, environs: List[Dict[str, Any]]) -> float:
+    """Serve all requests by the app, return number of requests per second."""
+    def start_response(status: str, headers: List[Any], exc_info: Any = None) -> None:
+        pass
+
+    start = time.perf_counter()
+    for environ in environs:
+        result = app(dict(environ), start_response)
+        b''.join(result)
+        if hasattr(result, 'close'):
+            result.close()
+    return len(environs) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routes', type=int, default=1000, help='Number of Routes.')
+    parser.add_argument('--requests', type=int, default=20000, help='Number of requests served by each app.')
+    args = parser.parse_args()
+
+    api_app = ApiApp(Config())
+    api_app.user_router.reset(create_routes(args.routes))
+    environs = create_environs(args.routes, args.requests)
+
+    flask_rate = measure(api_app, environs)
+    wsgi_rate = measure(WsgiApp(api_app), environs)
+    print(f'Flask app: {flask_rate:10.0f} requests/s')
+    print(f'WSGI app:  {wsgi_rate:10.0f} requests/s ({wsgi_rate / flask_rate:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,23 @@
 """Initialization of CLI app."""
 
+import logging
 import subprocess
+from pathlib import Path
 
 import click
 
 from trickster.api_app import ApiApp
+from trickster.compiled import compile_routes
 from trickster.config import Config
+from trickster.routing.index import RouteIndex
+from trickster.routing.router import RouteOrder
 from trickster.sys import multi_glob, remove_file
 
 
 TESTABLE_FILES = [
     'trickster',
     'app.py',
+    'asgi.py',
     'cli.py'
 ]
 
@@ -43,14 +49,58 @@ def cli() -> None:
 @cli.command()
 @click.option('-p', '--port', default=Config.DEFAULT_PORT, help='The port to bind to.')
 @click.option('-x', '--prefix', default=Config.DEFAULT_INTERNAL_PREFIX, help='Url prefix of internal endpoints.')
-@click.option('-r', '--routes', type=click.Path(exists=True), help='Path to json file with default routes.')
-def run(port: int, prefix: str, routes: str) -> None:
+@click.option('-r', '--routes', help='Path, directory or glob pattern of JSON or NDJSON files with default routes.')
+@click.option('-s', '--routes-snapshot', type=click.Path(dir_okay=False), help='Path to compiled default routes.')
+@click.option(
+    '-i', '--index',
+    type=click.Choice(RouteIndex.names()),
+    default=Config.DEFAULT_ROUTE_INDEX,
+    help='Index used to match routes.'
+)
+@click.option(
+    '-o', '--route-order',
+    type=click.Choice([order.value for order in RouteOrder]),
+    default=Config.DEFAULT_ROUTE_ORDER,
+    help='Order of routes with the same priority.'
+)
+@click.option('-l', '--lazy-routes', is_flag=True, help='Deserialize responses of default routes on first use.')
+def run(
+    port: int,
+    prefix: str,
+    routes: str,
+    routes_snapshot: str,
+    index: str,
+    route_order: str,
+    lazy_routes: bool
+) -> None:
     """Start local Trickster app."""
-    config = Config(internal_prefix=prefix, port=port, routes_path=routes)
+    logging.basicConfig(level=logging.INFO)
+    config = Config(
+        internal_prefix=prefix,
+        port=port,
+        routes_path=routes,
+        routes_snapshot_path=routes_snapshot,
+        route_index=index,
+        route_order=route_order,
+        lazy_routes=lazy_routes
+    )
     app = ApiApp(config)
     app.run()
 
 
+@cli.command('compile-routes')
+@click.argument('routes')
+@click.argument('output', type=click.Path(dir_okay=False))
+def compile_routes_snapshot(routes: str, output: str) -> None:
+    """Compile routes files to binary snapshot loaded faster than the files.
+
+    ROUTES is path, directory or glob pattern of routes files, use the same value
+    to configure default routes so Trickster can check the snapshot is fresh.
+    """
+    snapshot = compile_routes(str(Path(routes)), Path(output))
+    click.secho(f'Compiled {len(snapshot.routes)} routes to {output}', fg='green')
+
+
 @cli.command()
 @click.option('--no-cov', is_flag=True, default=False)
 @click.option('-t', '--tag', type=click.Choice(['integration', 'unit']))
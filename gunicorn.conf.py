@@ -1,11 +1,53 @@
 """Configuration for gunicorn worker."""
 
+import gc
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
 from trickster.config import Config
+from trickster.routing.shared import SharedState
+
+app_config = Config()
 
 bind = f'0.0.0.0:{Config.DEFAULT_PORT}'
-workers = 1
+workers = app_config.WORKERS
 
 timeout = 90
 accesslog = '-'
 errorlog = '-'
 loglevel = 'info'
+
+# Log progress of loading default routes
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(process)d] [%(levelname)s] %(message)s')
+
+
+def on_starting(server: Any) -> None:
+    """Create fresh state of Routes shared by workers if there are more of them, preload the app."""
+    if workers > 1:
+        path = app_config.SHARED_STATE or Path(tempfile.mkdtemp(prefix='trickster-')) / 'state'
+        SharedState.remove(path)
+        os.environ['TRICKSTER_SHARED_STATE'] = str(path)
+    if app_config.PRELOAD:
+        preload(server)
+
+
+def preload(server: Any) -> None:
+    """Load the app in the master process, workers forked later share its memory.
+
+    Gunicorn `preload_app` setting can't be used, it loads the app before the shared
+    state is created. Workers reuse the app loaded by `server.app`. Garbage collector
+    is disabled while the app loads so freed objects don't leave holes in memory
+    pages, and all objects are frozen so collections in workers never write to them.
+    """
+    gc.disable()
+    server.app.wsgi().preload()
+    gc.freeze()
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    """Enable garbage collector disabled for preloading of the app."""
+    if app_config.PRELOAD:
+        gc.enable()
@@ -40,6 +40,9 @@ def main() -> None:
             'basicauth'
         ],
         extras_require={
+            'asgi': [
+                'uvicorn'
+            ],
             'dev': [
                 'setuptools',
                 'wheel',
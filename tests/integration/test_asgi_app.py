@@ -0,0 +1,220 @@
+"""Integration tests of ASGI app."""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from trickster.asgi_app import AsgiApp
+
+
+@pytest.fixture
+def asgi_app(app):
+    return AsgiApp(app)
+
+
+def call(asgi_app, method, path, body=b'', headers=None, query_string=b''):
+    """Send request to ASGI app, return status, headers and body of the response."""
+    return asyncio.run(call_async(asgi_app, method, path, body, headers, query_string))
+
+
+async def call_async(asgi_app, method, path, body=b'', headers=None, query_string=b''):
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'root_path': '',
+        'query_string': query_string,
+        'headers': [(b'host', b'localhost'), *(headers or [])],
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 12345)
+    }
+    received = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return received.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi_app(scope, receive, send)
+    start, response_body = sent
+    return start['status'], dict(start['headers']), response_body['body']
+
+
+def add_route(asgi_app, route):
+    status, _, body = call(
+        asgi_app, 'POST', '/internal/routes', json.dumps(route).encode('utf-8'),
+        headers=[(b'content-type', b'application/json')]
+    )
+    assert status == 201
+    return json.loads(body)
+
+
+@pytest.mark.integration
+class TestAsgiApp:
+    def test_call_route(self, asgi_app):
+        add_route(asgi_app, {
+            'path': '/path',
+            'responses': [{'body': {'key': 'value'}, 'status': 201}]
+        })
+
+        status, headers, body = call(asgi_app, 'GET', '/path')
+
+        assert status == 201
+        assert body == b'{"key": "value"}'
+        assert headers[b'content-type'] == b'application/json'
+        assert headers[b'content-length'] == b'16'
+
+    def test_call_route_with_conditions(self, asgi_app):
+        add_route(asgi_app, {
+            'path': '/path',
+            'conditions': {'headers': {'X-Tenant': 'acme'}, 'args': {'version': '2'}},
+            'responses': [{'body': 'acme'}]
+        })
+
+        status, _, body = call(asgi_app, 'GET', '/path', headers=[(b'x-tenant', b'acme')], query_string=b'version=2')
+        assert status == 200
+        assert body == b'acme'
+        status, _, _ = call(asgi_app, 'GET', '/path', headers=[(b'x-tenant', b'acme')], query_string=b'version=1')
+        assert status == 404
+
+    def test_call_route_with_default_content_type(self, asgi_app):
+        add_route(asgi_app, {'path': '/path', 'responses': [{'body': 'string'}]})
+
+        status, headers, body = call(asgi_app, 'GET', '/path')
+
+        assert status == 200
+        assert body == b'string'
+        assert headers[b'content-type'] == b'text/html; charset=utf-8'
+
+    def test_call_route_head(self, asgi_app):
+        add_route(asgi_app, {'path': '/path', 'method': 'HEAD', 'responses': [{'body': 'string'}]})
+
+        status, headers, body = call(asgi_app, 'HEAD', '/path')
+
+        assert status == 200
+        assert body == b''
+        assert headers[b'content-length'] == b'6'
+
+    def test_call_route_uses_response(self, asgi_app):
+        add_route(asgi_app, {'id': 'route_id', 'path': '/path', 'responses': [{'body': 'string', 'repeat': 1}]})
+
+        assert call(asgi_app, 'GET', '/path')[0] == 200
+        assert call(asgi_app, 'GET', '/path')[0] == 404
+
+        _, _, body = call(asgi_app, 'GET', '/internal/routes/route_id')
+        assert json.loads(body)['responses'][0]['used_count'] == 1
+
+    def test_call_route_not_found(self, asgi_app):
+        status, headers, body = call(asgi_app, 'GET', '/path')
+
+        assert status == 404
+        assert headers[b'content-type'] == b'application/json'
+        assert json.loads(body)['error'] == 'Not Found'
+
+    def test_call_route_authentication_error(self, asgi_app):
+        add_route(asgi_app, {
+            'path': '/path',
+            'auth': {'method': 'token', 'token': 'secret'},
+            'responses': [{'body': 'string'}]
+        })
+
+        status, _, body = call(asgi_app, 'GET', '/path', headers=[(b'authorization', b'wrong')])
+
+        assert status == 401
+        assert json.loads(body)['error'] == 'Unauthorized'
+
+    def test_call_route_authenticated(self, asgi_app):
+        add_route(asgi_app, {
+            'path': '/path',
+            'auth': {'method': 'token', 'token': 'secret'},
+            'responses': [{'body': 'string'}]
+        })
+
+        status, _, body = call(asgi_app, 'GET', '/path', headers=[(b'authorization', b'Bearer secret')])
+
+        assert status == 200
+        assert body == b'string'
+
+    def test_internal_endpoints_are_handled_by_api_app(self, asgi_app):
+        status, _, body = call(asgi_app, 'GET', '/internal/health')
+
+        assert status == 200
+        assert json.loads(body) == {'status': 'ok'}
+
+    def test_unknown_internal_path_is_matched_against_routes(self, asgi_app):
+        add_route(asgi_app, {'path': '/internal/custom', 'responses': [{'body': 'string'}]})
+
+        status, _, body = call(asgi_app, 'GET', '/internal/custom')
+
+        assert status == 200
+        assert body == b'string'
+
+    def test_root_is_handled_by_api_app(self, asgi_app):
+        add_route(asgi_app, {'path': '/', 'responses': [{'body': 'string'}]})
+
+        status, _, body = call(asgi_app, 'GET', '/')
+
+        assert status == 404
+        assert json.loads(body)['error'] == 'Not Found'
+
+    def test_unsupported_method_is_handled_by_api_app(self, asgi_app):
+        add_route(asgi_app, {'path': '/path', 'responses': [{'body': 'string'}]})
+
+        status, _, body = call(asgi_app, 'PROPFIND', '/path')
+
+        assert status == 405
+        assert json.loads(body)['error'] == 'Method Not Allowed'
+
+    def test_delays_dont_block(self, asgi_app):
+        add_route(asgi_app, {'path': '/path', 'responses': [{'body': 'string', 'delay': 0.2}]})
+
+        async def call_concurrently():
+            return await asyncio.gather(*[call_async(asgi_app, 'GET', '/path') for _ in range(5)])
+
+        start = time.monotonic()
+        responses = asyncio.run(call_concurrently())
+
+        assert time.monotonic() - start < 0.6
+        assert [status for status, _, _ in responses] == [200] * 5
+
+    def test_internal_requests_dont_block(self, asgi_app, mocker):
+        add_route(asgi_app, {'path': '/path', 'responses': [{'body': 'string'}]})
+        stats = asgi_app.api_app.user_router.stats
+        mocker.patch.object(asgi_app.api_app.user_router, 'stats', side_effect=lambda: time.sleep(0.3) or stats())
+        finished = []
+
+        async def call_and_record(method, path):
+            status, _, _ = await call_async(asgi_app, method, path)
+            finished.append((path, status))
+
+        async def call_concurrently():
+            await asyncio.gather(call_and_record('GET', '/internal/stats'), call_and_record('GET', '/path'))
+
+        asyncio.run(call_concurrently())
+
+        assert finished == [('/path', 200), ('/internal/stats', 200)]
+
+    def test_lifespan(self, asgi_app):
+        received = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return received.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(asgi_app({'type': 'lifespan'}, receive, send))
+
+        assert sent == [{'type': 'lifespan.startup.complete'}, {'type': 'lifespan.shutdown.complete'}]
+
+    def test_preload(self, asgi_app, mocker):
+        preload = mocker.patch.object(asgi_app.api_app, 'preload')
+        asgi_app.preload()
+        preload.assert_called_once_with()
@@ -2,6 +2,9 @@
 
 import pytest
 
+from trickster.api_app import ApiApp
+from trickster.config import Config
+
 
 @pytest.mark.integration
 class TestExternalEndpoints:
@@ -31,3 +34,65 @@ class TestExternalEndpoints:
             'error': 'Unauthorized',
             'message': 'HMAC authentication failed, URL is missing required parameter: "hmac_timestamp".'
         }
+
+    def test_call_route_not_found(self, client):
+        response = client.get('/path')
+
+        assert response.status_code == 404
+        assert response.content_type == 'application/json'
+        assert response.json == {
+            'error': 'Not Found',
+            'message': (
+                'The requested URL was not found on the server. If you entered the URL manually '
+                'please check your spelling and try again.'
+            )
+        }
+
+    def test_call_route(self, client):
+        client.post('/internal/routes', json={
+            'path': '/path',
+            'responses': [
+                {
+                    'body': 'response_body'
+                }
+            ]
+        })
+
+        response = client.get('/path')
+
+        assert response.status_code == 200
+        assert response.data == b'response_body'
+
+    def test_call_route_with_conditions(self, client):
+        client.post('/internal/routes', json={
+            'path': '/path',
+            'conditions': {'headers': {'x-tenant': 'acme'}, 'args': {'debug': {'present': True}}},
+            'responses': [{'body': 'acme'}]
+        })
+        client.post('/internal/routes', json={'path': '/path', 'responses': [{'body': 'default'}]})
+
+        assert client.get('/path?debug=1', headers={'X-TENANT': 'acme'}).data == b'acme'
+        assert client.get('/path', headers={'X-Tenant': 'acme'}).data == b'default'
+        assert client.get('/path?debug=1', headers={'X-Tenant': 'other'}).data == b'default'
+
+
+@pytest.mark.integration
+class TestExternalEndpointsWithSharedState:
+    def test_workers_share_routes_and_usage(self, tmp_path):
+        config = Config(shared_state_path=str(tmp_path / 'state'))
+        worker1 = ApiApp(config).test_client()
+        worker2 = ApiApp(config).test_client()
+
+        worker1.post('/internal/routes', json={
+            'id': 'route_id',
+            'path': '/path',
+            'responses': [{'body': 'response_body', 'repeat': 2}]
+        })
+
+        assert worker2.get('/path').status_code == 200
+        assert worker1.get('/path').status_code == 200
+        assert worker2.get('/path').status_code == 404
+        assert worker1.get('/internal/routes/route_id').json['used_count'] == 2
+
+        worker2.post('/internal/reset')
+        assert worker1.get('/internal/routes').json == []
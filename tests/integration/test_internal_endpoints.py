@@ -1,7 +1,13 @@
 """Integration tests of internal API endpoints."""
 
+import gzip
+import json
+
 import pytest
 
+from trickster.api_app import ApiApp
+from trickster.config import Config
+
 
 @pytest.mark.integration
 class TestInternalEndpoints:
@@ -24,11 +30,15 @@ class TestInternalEndpoints:
         assert response.status_code == 201
         assert response.json == {
             'id': 'route_id',
+            'priority': 0,
             'path': '/path',
+            'path_class': 'prefix',
+            'conditions': {},
             'method': 'GET',
             'response_selection': 'greedy',
             'used_count': 0,
             'is_active': True,
+            'quarantined': False,
             'auth': None,
             'responses': [
                 {
@@ -89,11 +99,15 @@ class TestInternalEndpoints:
         assert response.status_code == 201
         assert response.json == {
             'id': 'route_id',
+            'priority': 0,
             'path': '/endpoint',
+            'path_class': 'prefix',
+            'conditions': {},
             'method': 'GET',
             'response_selection': 'random',
             'used_count': 0,
             'is_active': True,
+            'quarantined': False,
             'auth': {
                 'method': 'basic',
                 'password': 'password',
@@ -172,11 +186,15 @@ class TestInternalEndpoints:
         assert response.json == [
             {
                 'id': 'route_id1',
+                'priority': 0,
                 'path': '/endpoint1',
+                'path_class': 'prefix',
+                'conditions': {},
                 'method': 'GET',
                 'response_selection': 'greedy',
                 'used_count': 0,
                 'is_active': True,
+                'quarantined': False,
                 'auth': None,
                 'responses': [
                     {
@@ -194,11 +212,15 @@ class TestInternalEndpoints:
             },
             {
                 'id': 'route_id2',
+                'priority': 0,
                 'path': '/endpoint2',
+                'path_class': 'prefix',
+                'conditions': {},
                 'method': 'GET',
                 'response_selection': 'greedy',
                 'used_count': 0,
                 'is_active': True,
+                'quarantined': False,
                 'auth': None,
                 'responses': [
                     {
@@ -234,6 +256,144 @@ class TestInternalEndpoints:
         assert response.json == []
 
 
+    def test_add_routes_from_json_array(self, client):
+        response = client.post('/internal/routes/bulk', json=[
+            {'id': 'route1', 'path': '/endpoint1', 'responses': [{'body': 'response1'}]},
+            {'id': 'route2', 'path': '/endpoint2', 'responses': [{'body': 'response2'}]}
+        ])
+        assert response.status_code == 201
+        assert response.json == ['route1', 'route2']
+
+        assert client.get('/endpoint2').data == b'response2'
+
+    def test_add_routes_from_gzipped_ndjson(self, client):
+        routes = [
+            {'id': 'route1', 'path': '/endpoint1', 'responses': [{'body': 'response1'}]},
+            {'id': 'route2', 'path': '/endpoint2', 'responses': [{'body': 'response2'}]}
+        ]
+        body = gzip.compress('\n'.join(json.dumps(route) for route in routes).encode('utf-8'))
+
+        response = client.post(
+            '/internal/routes/bulk',
+            data=body,
+            headers={'Content-Type': 'application/x-ndjson', 'Content-Encoding': 'gzip'}
+        )
+        assert response.status_code == 201
+        assert response.json == ['route1', 'route2']
+
+    def test_add_routes_reports_invalid_routes(self, client):
+        client.post('/internal/routes', json={'id': 'route1', 'path': '/endpoint1', 'responses': [{'body': ''}]})
+
+        response = client.post('/internal/routes/bulk', json=[
+            {'id': 'route2', 'path': '/endpoint2', 'responses': [{'body': ''}]},
+            {'id': 'route1', 'path': '/endpoint1', 'responses': [{'body': ''}]}
+        ])
+        assert response.status_code == 400
+        assert response.json == {
+            'error': 'Bad Request',
+            'message': '1 of 2 Routes could not be added.',
+            'errors': [{'index': 1, 'message': 'Route id "route1" already exists.'}]
+        }
+
+        response = client.get('/internal/routes')
+        assert [route['id'] for route in response.json] == ['route1']
+
+    def test_add_routes_validates_schema(self, client):
+        response = client.post('/internal/routes/bulk', json=[{'path': '/endpoint1'}])
+        assert response.status_code == 400
+        assert response.json['message'] == '1 of 1 Routes are invalid.'
+        assert [error['index'] for error in response.json['errors']] == [0]
+
+    def test_add_routes_reports_invalid_path_of_item(self, client):
+        response = client.post('/internal/routes/bulk', json=[
+            {'id': 'route1', 'path': '/endpoint1', 'responses': [{'body': ''}]},
+            {'id': 'route2', 'path': '/(', 'responses': [{'body': ''}]}
+        ])
+        assert response.status_code == 400
+        assert response.json['message'] == '1 of 2 Routes could not be added.'
+        assert response.json['errors'][0]['index'] == 1
+        assert response.json['errors'][0]['message'].startswith('Path "/(" is not a valid regex')
+        assert client.get('/internal/routes').json == []
+
+    def test_add_routes_limits_decompressed_size(self, client, mocker):
+        mocker.patch('trickster.loader.MAX_DECOMPRESSED_SIZE', 10)
+        response = client.post(
+            '/internal/routes/bulk',
+            data=gzip.compress(b' ' * 11 + b'[]'),
+            headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+        )
+        assert response.status_code == 400
+        assert response.json['message'] == 'Decompressed data are bigger than 10 bytes.'
+
+    def test_move_route(self, client):
+        client.post('/internal/routes', json={'id': 'route1', 'path': '/.*', 'responses': [{'body': 'route1'}]})
+        client.post('/internal/routes', json={'id': 'route2', 'path': '/endpoint', 'responses': [{'body': 'route2'}]})
+
+        response = client.post('/internal/routes/route2/move', json={'position': 0})
+        assert response.status_code == 204
+
+        response = client.get('/internal/routes')
+        assert [route['id'] for route in response.json] == ['route2', 'route1']
+        assert client.get('/endpoint').data == b'route2'
+
+    def test_move_missing_route(self, client):
+        response = client.post('/internal/routes/route1/move', json={'position': 0})
+        assert response.status_code == 404
+        assert response.json == {
+            'error': 'Not Found',
+            'message': 'Cannot move route "route1". Route doesn\'t exist.'
+        }
+
+    def test_move_route_validates_position(self, client):
+        client.post('/internal/routes', json={'id': 'route1', 'path': '/endpoint', 'responses': [{'body': ''}]})
+        response = client.post('/internal/routes/route1/move', json={'position': -1})
+        assert response.status_code == 400
+
+    def test_route_with_priority_wins(self, client):
+        client.post('/internal/routes', json={'path': '/.*', 'responses': [{'body': 'catch all'}]})
+        response = client.post('/internal/routes', json={
+            'path': '/endpoint',
+            'priority': 10,
+            'responses': [{'body': 'endpoint'}]
+        })
+        assert response.json['priority'] == 10
+        assert client.get('/endpoint').data == b'endpoint'
+
+    def test_add_route_with_unsafe_path(self, client):
+        response = client.post('/internal/routes', json={'path': '/(a+)+$', 'responses': [{'body': ''}]})
+        assert response.status_code == 400
+        assert response.json == {
+            'error': 'Bad Request',
+            'message': 'Path "/(a+)+$" repeats a part that has its own unlimited repeat, '
+                       'matching it may take exponential time.'
+        }
+
+    def test_add_route_with_invalid_path(self, client):
+        response = client.post('/internal/routes', json={'path': '/(', 'responses': [{'body': ''}]})
+        assert response.status_code == 400
+        assert response.json['message'].startswith('Path "/(" is not a valid regex')
+
+    def test_add_route_with_invalid_conditions(self, client):
+        response = client.post('/internal/routes', json={
+            'path': '/path',
+            'conditions': {'headers': {'X-Tenant': {'present': 'yes'}}},
+            'responses': [{'body': ''}]
+        })
+        assert response.status_code == 400
+
+    def test_add_route_with_unsafe_condition(self, client):
+        response = client.post('/internal/routes', json={
+            'path': '/path',
+            'conditions': {'headers': {'X-Tenant': {'regex': '(a+)+$'}}},
+            'responses': [{'body': ''}]
+        })
+        assert response.status_code == 400
+        assert response.json == {
+            'error': 'Bad Request',
+            'message': 'Condition on headers "X-Tenant" repeats a part that has its own unlimited repeat, '
+                       'matching it may take exponential time.'
+        }
+
     def test_create_and_delete_route(self, client):
         client.post('/internal/routes', json={
             'id': 'route1',
@@ -282,7 +442,10 @@ class TestInternalEndpoints:
             'auth': None,
             'id': 'route1',
             'method': 'GET',
+            'priority': 0,
             'path': '/endpoint2',
+            'path_class': 'prefix',
+            'conditions': {},
             'response_selection': 'greedy',
             'responses': [
                 {
@@ -298,7 +461,8 @@ class TestInternalEndpoints:
                 }
             ],
             'used_count': 0,
-            'is_active': True
+            'is_active': True,
+            'quarantined': False
         }]
 
     def test_update_route_change_route_id(self, client):
@@ -330,7 +494,10 @@ class TestInternalEndpoints:
             'auth': None,
             'id': 'route2',
             'method': 'GET',
+            'priority': 0,
             'path': '/endpoint2',
+            'path_class': 'prefix',
+            'conditions': {},
             'response_selection': 'greedy',
             'responses': [
                 {
@@ -346,7 +513,8 @@ class TestInternalEndpoints:
                 }
             ],
             'used_count': 0,
-            'is_active': True
+            'is_active': True,
+            'quarantined': False
         }]
 
 
@@ -529,7 +697,10 @@ class TestInternalEndpoints:
             'auth': None,
             'id': 'route_id',
             'method': 'GET',
+            'priority': 0,
             'path': '/endpoint',
+            'path_class': 'prefix',
+            'conditions': {},
             'response_selection': 'greedy',
             'responses': [
                 {
@@ -545,7 +716,8 @@ class TestInternalEndpoints:
                 }
             ],
             'used_count': 0,
-            'is_active': True
+            'is_active': True,
+            'quarantined': False
         }
 
     def test_get_route_not_found(self, client):
@@ -699,11 +871,15 @@ class TestInternalEndpoints:
         assert response.status_code == 200
         assert response.json == {
             'id': 'route_id',
+            'priority': 0,
             'path': '/path',
+            'path_class': 'prefix',
+            'conditions': {},
             'method': 'GET',
             'response_selection': 'greedy',
             'used_count': 0,
             'is_active': True,
+            'quarantined': False,
             'auth': None,
             'responses': [
                 {
@@ -721,6 +897,27 @@ class TestInternalEndpoints:
         }
 
 
+    def test_match_route_with_conditions(self, client):
+        client.post('/internal/routes', json={
+            'id': 'route_id',
+            'path': '/path',
+            'conditions': {'headers': {'X-Tenant': 'acme'}, 'cookies': {'session': {'present': True}}},
+            'responses': [{'body': ''}]
+        })
+
+        response = client.post('/internal/match_route', json={
+            'method': 'GET',
+            'path': '/path',
+            'headers': {'x-tenant': 'acme'},
+            'cookies': {'session': 'id'}
+        })
+        assert response.status_code == 200
+        assert response.json['id'] == 'route_id'
+        assert response.json['conditions'] == {'headers': {'X-Tenant': 'acme'}, 'cookies': {'session': {'present': True}}}
+
+        response = client.post('/internal/match_route', json={'method': 'GET', 'path': '/path'})
+        assert response.status_code == 404
+
     def test_match_route_not_found(self, client):
         response = client.post('/internal/match_route', json={
             'method': 'GET',
@@ -774,4 +971,106 @@ class TestInternalEndpoints:
 
         response = client.get('/internal/routes')
         assert response.status_code == 200
-        assert response.json == []
\ No newline at end of file
+        assert response.json == []
+
+    def test_reset_restores_default_routes(self, tmp_path):
+        routes_path = tmp_path / 'routes.json'
+        routes_path.write_text(json.dumps([{'id': 'default', 'path': '/path', 'responses': [{'body': '', 'repeat': 1}]}]))
+        client = ApiApp(Config(routes_path=str(routes_path))).test_client()
+        client.get('/path')
+        client.delete('/internal/routes/default')
+
+        response = client.post('/internal/reset')
+        assert response.status_code == 204
+
+        response = client.get('/internal/routes')
+        assert [route['id'] for route in response.json] == ['default']
+        assert response.json[0]['used_count'] == 0
+
+    def test_save_and_restore_snapshot(self, client):
+        client.post('/internal/routes', json={
+            'id': 'route_id',
+            'path': '/path',
+            'responses': [{'body': 'response_body', 'repeat': 2}]
+        })
+        client.get('/path')
+
+        response = client.post('/internal/snapshots/checkpoint')
+        assert response.status_code == 204
+
+        client.get('/path')
+        client.delete('/internal/routes')
+
+        response = client.post('/internal/snapshots/checkpoint/restore')
+        assert response.status_code == 204
+
+        response = client.get('/internal/routes/route_id')
+        assert response.json['used_count'] == 1
+        assert client.get('/path').status_code == 200
+        assert client.get('/path').status_code == 404
+
+    def test_restore_missing_snapshot(self, client):
+        response = client.post('/internal/snapshots/missing/restore')
+        assert response.status_code == 404
+        assert response.json == {
+            'error': 'Not Found',
+            'message': 'Snapshot "missing" does not exist.'
+        }
+
+    def test_get_stats(self, client):
+        client.post('/internal/routes', json={
+            'path': '/path/\\d+',
+            'responses': [
+                {
+                    'body': 'response_body'
+                }
+            ]
+        })
+        client.get('/path/name')
+        client.get('/path/name')
+        client.get('/other_path')
+
+        response = client.get('/internal/stats')
+        assert response.status_code == 200
+        assert response.json == {
+            'routes': {
+                'total': 1,
+                'retired': 0,
+                'materialized': 1,
+                'quarantined': 0
+            },
+            'match_cache': {
+                'size': 1,
+                'max_size': 1024,
+                'hits': 1,
+                'misses': 1,
+                'evictions': 0
+            },
+            'prefix_filter': {
+                'prefixes': 1,
+                'rejections': 1
+            }
+        }
+
+    def test_exhausted_route_is_listed(self, client):
+        client.post('/internal/routes', json={
+            'id': 'route_id',
+            'path': '/path',
+            'responses': [
+                {
+                    'body': 'response_body',
+                    'repeat': 1
+                }
+            ]
+        })
+        client.get('/path')
+
+        response = client.get('/path')
+        assert response.status_code == 404
+
+        response = client.get('/internal/routes')
+        assert [route['id'] for route in response.json] == ['route_id']
+        assert response.json[0]['is_active'] is False
+
+        response = client.get('/internal/stats')
+        assert response.json['routes'] == {'total': 1, 'retired': 1, 'materialized': 1, 'quarantined': 0}
@@ -0,0 +1,147 @@
+"""Integration tests of WSGI app."""
+
+import pytest
+
+from werkzeug.test import Client
+
+from trickster.api_app import ApiApp
+from trickster.config import Config
+from trickster.wsgi_app import WsgiApp, status_line
+
+
+@pytest.fixture
+def wsgi_client(app):
+    return Client(WsgiApp(app))
+
+
+def add_route(client, route):
+    response = client.post('/internal/routes', json=route)
+    assert response.status_code == 201
+    return response.json
+
+
+@pytest.mark.integration
+class TestWsgiApp:
+    def test_call_route(self, wsgi_client):
+        add_route(wsgi_client, {
+            'path': '/path',
+            'responses': [{'body': {'key': 'value'}, 'status': 201}]
+        })
+
+        response = wsgi_client.get('/path')
+
+        assert response.status == '201 CREATED'
+        assert response.data == b'{"key": "value"}'
+        assert response.headers['Content-Type'] == 'application/json'
+        assert response.headers['Content-Length'] == '16'
+
+    def test_call_route_with_conditions(self, wsgi_client):
+        add_route(wsgi_client, {
+            'path': '/path',
+            'conditions': {'headers': {'X-Tenant': 'acme'}, 'cookies': {'session': {'regex': '\\w+$'}}},
+            'responses': [{'body': 'acme'}]
+        })
+
+        wsgi_client.set_cookie('session', 'abc')
+        assert wsgi_client.get('/path', headers={'X-Tenant': 'acme'}).data == b'acme'
+        assert wsgi_client.get('/path', headers={'X-Tenant': 'other'}).status_code == 404
+
+    def test_call_route_with_default_content_type(self, wsgi_client):
+        add_route(wsgi_client, {'path': '/path', 'responses': [{'body': 'string'}]})
+
+        response = wsgi_client.get('/path')
+
+        assert response.status_code == 200
+        assert response.data == b'string'
+        assert response.headers['Content-Type'] == 'text/html; charset=utf-8'
+
+    def test_call_route_head(self, wsgi_client):
+        add_route(wsgi_client, {'path': '/path', 'method': 'HEAD', 'responses': [{'body': 'string'}]})
+
+        response = wsgi_client.head('/path')
+
+        assert response.status_code == 200
+        assert response.data == b''
+        assert response.headers['Content-Length'] == '6'
+
+    def test_call_route_uses_response(self, wsgi_client):
+        add_route(wsgi_client, {'id': 'route_id', 'path': '/path', 'responses': [{'body': 'string', 'repeat': 1}]})
+
+        assert wsgi_client.get('/path').status_code == 200
+        assert wsgi_client.get('/path').status_code == 404
+
+        response = wsgi_client.get('/internal/routes/route_id')
+        assert response.json['responses'][0]['used_count'] == 1
+
+    def test_call_route_not_found(self, wsgi_client):
+        response = wsgi_client.get('/path')
+
+        assert response.status == '404 NOT FOUND'
+        assert response.headers['Content-Type'] == 'application/json'
+        assert response.json['error'] == 'Not Found'
+
+    def test_call_route_authentication_error(self, wsgi_client):
+        add_route(wsgi_client, {
+            'path': '/path',
+            'auth': {'method': 'token', 'token': 'secret'},
+            'responses': [{'body': 'string'}]
+        })
+
+        response = wsgi_client.get('/path', headers={'Authorization': 'wrong'})
+
+        assert response.status_code == 401
+        assert response.json['error'] == 'Unauthorized'
+
+    def test_call_route_authenticated(self, wsgi_client):
+        add_route(wsgi_client, {
+            'path': '/path',
+            'auth': {'method': 'token', 'token': 'secret'},
+            'responses': [{'body': 'string'}]
+        })
+
+        response = wsgi_client.get('/path', headers={'Authorization': 'Bearer secret'})
+
+        assert response.status_code == 200
+        assert response.data == b'string'
+
+    def test_call_internal_endpoint(self, wsgi_client):
+        response = wsgi_client.get('/internal/health')
+        assert response.status_code == 200
+
+    def test_call_route_with_internal_prefix_in_path(self, wsgi_client):
+        add_route(wsgi_client, {'path': '/internalpath', 'responses': [{'body': 'string'}]})
+        assert wsgi_client.get('/internalpath').data == b'string'
+
+    def test_root_is_handled_by_api_app(self, wsgi_client):
+        add_route(wsgi_client, {'path': '/', 'responses': [{'body': 'string'}]})
+
+        response = wsgi_client.get('/')
+
+        assert response.status_code == 404
+        assert response.json['error'] == 'Not Found'
+        assert response.data == wsgi_client.application.api_app.test_client().get('/').data
+
+    def test_unsupported_method_is_handled_by_api_app(self, wsgi_client):
+        add_route(wsgi_client, {'path': '/path', 'responses': [{'body': 'string'}]})
+
+        response = wsgi_client.open('/path', method='PROPFIND')
+
+        assert response.status_code == 405
+        assert response.json['error'] == 'Method Not Allowed'
+
+    def test_custom_internal_prefix(self):
+        client = Client(WsgiApp(ApiApp(Config(internal_prefix='/api/'))))
+        response = client.post('/api/routes', json={'path': '/internal', 'responses': [{'body': 'string'}]})
+
+        assert response.status_code == 201
+        assert client.get('/internal').data == b'string'
+
+    def test_preload(self, wsgi_client, mocker):
+        wsgi_app = wsgi_client.application
+        preload = mocker.patch.object(wsgi_app.api_app, 'preload')
+        wsgi_app.preload()
+        preload.assert_called_once_with()
+
+    def test_status_line(self):
+        assert status_line(200) == '200 OK'
+        assert status_line(299) == '299 UNKNOWN'
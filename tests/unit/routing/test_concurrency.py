@@ -0,0 +1,152 @@
+import collections
+import sys
+import threading
+import time
+
+import pytest
+
+from trickster.routing.index import RouteIndex
+from trickster.routing.input import IncomingTestRequest
+from trickster.routing.router import RouteResponse, Router
+
+
+THREADS = 16
+
+
+@pytest.fixture(autouse=True)
+def frequent_thread_switching():
+    """Switch threads as often as possible to provoke races."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    yield
+    sys.setswitchinterval(interval)
+
+
+@pytest.fixture(autouse=True)
+def slow_response_use(mocker):
+    """Yield to other threads between selection and use of a response to widen race windows."""
+    use = RouteResponse.use
+
+    def yielding_use(self):
+        time.sleep(0)
+        use(self)
+
+    mocker.patch.object(RouteResponse, 'use', yielding_use)
+
+
+def run_threads(target, count=THREADS):
+    """Run target in multiple threads at once, reraise first exception."""
+    errors = []
+    barrier = threading.Barrier(count)
+
+    def run(number):
+        try:
+            barrier.wait()
+            target(number)
+        except Exception as error:  # pragma: no cover
+            errors.append(error)
+
+    threads = [threading.Thread(target=run, args=(number,)) for number in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]  # pragma: no cover
+
+
+def serve(router, path, method='GET'):
+    """Serve requests until no route matches, return list of used response ids."""
+    request = IncomingTestRequest('http://localhost/', path, method)
+    served = []
+    while route := router.match(request):
+        if response := route.consume():
+            served.append(response.id)
+    return served
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('index', RouteIndex.names())
+class TestConcurrentConsumption:
+    @pytest.mark.parametrize('response_selection', ['greedy', 'cycle', 'random'])
+    def test_responses_are_used_exactly_repeat_times(self, index, response_selection):
+        router = Router(index)
+        router.add_route({
+            'id': 'route',
+            'path': '/path',
+            'response_selection': response_selection,
+            'responses': [{'id': f'response{i}', 'body': '', 'repeat': i + 1} for i in range(20)]
+        })
+        results = [[] for _ in range(THREADS)]
+
+        def consume(number):
+            results[number] = serve(router, '/path')
+
+        run_threads(consume)
+
+        served = collections.Counter(response_id for result in results for response_id in result)
+        assert served == {f'response{i}': i + 1 for i in range(20)}
+        route = router.get_route('route')
+        assert route.used_count == sum(range(1, 21))
+        assert [response.used_count for response in route.responses] == list(range(1, 21))
+        assert route.active_responses == 0
+        assert router.stats()['routes']['retired'] == 1
+
+    def test_single_use_responses_are_served_once(self, index):
+        router = Router(index)
+        for i in range(50):
+            router.add_route({
+                'id': f'route{i}',
+                'path': '/path',
+                'responses': [{'id': f'response{i}', 'body': '', 'repeat': 1}]
+            })
+        results = [[] for _ in range(THREADS)]
+
+        def consume(number):
+            results[number] = serve(router, '/path')
+
+        run_threads(consume)
+
+        served = [response_id for result in results for response_id in result]
+        assert sorted(served) == sorted(f'response{i}' for i in range(50))
+        assert all(route.used_count == 1 for route in router.routes)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('index', RouteIndex.names())
+class TestConcurrentChanges:
+    def test_routes_change_while_matching(self, index):
+        router = Router(index)
+        router.add_route({'id': 'permanent', 'path': '/permanent', 'responses': [{'body': ''}]})
+        request = IncomingTestRequest('http://localhost/', '/permanent', 'GET')
+
+        def change_or_match(number):
+            for i in range(100):
+                if number % 2:
+                    route_id = f'route{number}-{i}'
+                    router.add_route({'id': route_id, 'path': f'/path{i}', 'responses': [{'body': ''}]})
+                    router.update_route({'path': f'/updated{i}', 'responses': [{'body': ''}]}, route_id)
+                    router.remove_route(route_id)
+                else:
+                    assert router.match(request).id == 'permanent'
+                    router.serialize()
+
+        run_threads(change_or_match)
+
+        assert [route.id for route in router.routes] == ['permanent']
+        assert router.stats()['routes']['total'] == 1
+
+    def test_routes_are_added_from_many_threads(self, index):
+        router = Router(index)
+
+        def add(number):
+            for i in range(50):
+                route_id = f'route{number}-{i}'
+                router.add_route({'id': route_id, 'path': f'/path{number}/{i}$', 'responses': [{'body': ''}]})
+
+        run_threads(add)
+
+        assert len(router.routes) == THREADS * 50
+        for number in range(THREADS):
+            request = IncomingTestRequest('http://localhost/', f'/path{number}/49', 'GET')
+            assert router.match(request).id == f'route{number}-49'
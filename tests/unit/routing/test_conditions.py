@@ -0,0 +1,132 @@
+import pytest
+
+from trickster.routing import RouteConfigurationError
+from trickster.routing.conditions import (
+    ConditionSource, EqualsCondition, PresentCondition, RegexCondition, RequestConditions
+)
+from trickster.routing.input import IncomingTestRequest
+
+
+def request(path='/path', headers=None, cookies=None):
+    return IncomingTestRequest('http://localhost/', path, 'GET', headers=headers, cookies=cookies)
+
+
+@pytest.mark.unit
+class TestConditionSource:
+    def test_header_names_are_title_cased(self):
+        assert ConditionSource.headers.normalize('x-tenant-id') == 'X-Tenant-Id'
+        assert ConditionSource.args.normalize('tenant-id') == 'tenant-id'
+        assert ConditionSource.cookies.normalize('tenant-id') == 'tenant-id'
+
+    def test_get_blank_and_repeated_args(self):
+        incoming_request = request('/path?debug=&tenant=acme&tenant=other')
+        assert ConditionSource.args.get(incoming_request, 'debug') == ''
+        assert ConditionSource.args.get(incoming_request, 'tenant') == 'acme'
+
+    def test_get(self):
+        incoming_request = request('/path?tenant=acme', headers={'X-Tenant': 'acme'}, cookies={'tenant': 'acme'})
+        assert ConditionSource.headers.get(incoming_request, 'X-Tenant') == 'acme'
+        assert ConditionSource.args.get(incoming_request, 'tenant') == 'acme'
+        assert ConditionSource.cookies.get(incoming_request, 'tenant') == 'acme'
+        assert ConditionSource.cookies.get(incoming_request, 'missing') is None
+
+
+@pytest.mark.unit
+class TestCondition:
+    def test_equals(self):
+        condition = EqualsCondition(ConditionSource.headers, 'x-tenant', 'acme')
+        assert condition.match(request(headers={'X-Tenant': 'acme'}))
+        assert not condition.match(request(headers={'X-Tenant': 'other'}))
+        assert not condition.match(request())
+
+    @pytest.mark.parametrize('present, headers, result', [
+        (True, {'X-Debug': ''}, True),
+        (True, {}, False),
+        (False, {'X-Debug': ''}, False),
+        (False, {}, True)
+    ])
+    def test_present(self, present, headers, result):
+        condition = PresentCondition(ConditionSource.headers, 'X-Debug', present)
+        assert condition.match(request(headers=headers)) is result
+
+    def test_regex_matches_beginning_of_value(self):
+        condition = RegexCondition(ConditionSource.args, 'version', '\\d+\\.')
+        assert condition.match(request('/path?version=2.1'))
+        assert not condition.match(request('/path?version=v2.1'))
+        assert not condition.match(request('/path'))
+        assert condition.match(request('/path?version=1.0&version=v2'))
+
+    def test_invalid_regex(self):
+        with pytest.raises(RouteConfigurationError, match='not a valid regex'):
+            RegexCondition(ConditionSource.headers, 'X-Tenant', '(')
+
+    def test_unsafe_regex(self):
+        with pytest.raises(RouteConfigurationError, match='exponential time'):
+            RegexCondition(ConditionSource.headers, 'X-Tenant', '(a+)+$')
+
+    @pytest.mark.parametrize('data, condition_class', [
+        ('acme', EqualsCondition),
+        ({'equals': 'acme'}, EqualsCondition),
+        ({'present': True}, PresentCondition),
+        ({'regex': 'ac.*'}, RegexCondition)
+    ])
+    def test_deserialize(self, data, condition_class):
+        conditions = RequestConditions.deserialize({'headers': {'X-Tenant': data}})
+        assert isinstance(conditions.conditions[0], condition_class)
+
+    @pytest.mark.parametrize('data', [
+        {},
+        {'equals': 'acme', 'regex': 'acme'},
+        {'present': 'yes'},
+        {'regex': 1},
+        {'unknown': 'acme'},
+        1
+    ])
+    def test_deserialize_invalid(self, data):
+        with pytest.raises(RouteConfigurationError, match='Condition on headers "X-Tenant"'):
+            RequestConditions.deserialize({'headers': {'X-Tenant': data}})
+
+
+@pytest.mark.unit
+class TestRequestConditions:
+    def test_all_conditions_have_to_match(self):
+        conditions = RequestConditions.deserialize({
+            'headers': {'X-Tenant': 'acme'},
+            'cookies': {'session': {'present': True}}
+        })
+        assert conditions.match(request(headers={'X-Tenant': 'acme'}, cookies={'session': 'id'}))
+        assert not conditions.match(request(headers={'X-Tenant': 'acme'}))
+        assert not conditions.match(request(cookies={'session': 'id'}))
+
+    def test_empty_conditions_match_everything(self):
+        conditions = RequestConditions.deserialize(None)
+        assert not conditions
+        assert conditions.key is None
+        assert conditions.match(request())
+
+    def test_regex_is_checked_last(self):
+        conditions = RequestConditions.deserialize({
+            'headers': {'X-Tenant': {'regex': 'ac'}, 'X-Debug': {'present': False}}
+        })
+        assert [condition.name for condition in conditions.checks] == ['X-Debug', 'X-Tenant']
+
+    def test_key_is_first_exact_value(self):
+        conditions = RequestConditions.deserialize({
+            'headers': {'X-Debug': {'present': True}},
+            'args': {'tenant': {'equals': 'acme'}, 'version': '2'}
+        })
+        assert conditions.key == (ConditionSource.args, 'tenant', 'acme')
+
+    def test_serialize(self):
+        conditions = RequestConditions.deserialize({
+            'headers': {'x-tenant': {'equals': 'acme'}, 'X-Debug': {'present': True}},
+            'args': {'version': {'regex': '2\\.'}}
+        })
+        assert conditions.serialize() == {
+            'headers': {'X-Tenant': 'acme', 'X-Debug': {'present': True}},
+            'args': {'version': {'regex': '2\\.'}}
+        }
+
+    def test_unknown_source(self):
+        with pytest.raises(RouteConfigurationError, match='Unknown condition source "form"'):
+            RequestConditions.deserialize({'form': {'tenant': 'acme'}})
@@ -0,0 +1,375 @@
+import re
+
+import pytest
+
+from trickster.routing.auth import NoAuth
+from trickster import TricksterException
+from trickster.routing.conditions import RequestConditions
+from trickster.routing.index import (
+    AlternationRouteIndex, ConditionIndex, LinearRouteIndex, PrefixFilter, RouteIndex, TrieRouteIndex
+)
+from trickster.routing.input import IncomingTestRequest
+from trickster.routing.router import Delay, ResponseSelectionStrategy, Route, RouteResponse, Router
+
+
+def create_route(id, path, method='GET', repeat=None, conditions=None):
+    return Route(
+        id=id,
+        responses=[RouteResponse('response', '', Delay(), repeat=repeat)],
+        response_selection=ResponseSelectionStrategy.greedy,
+        path=re.compile(path),
+        auth=NoAuth(),
+        method=method,
+        conditions=RequestConditions.deserialize(conditions)
+    )
+
+
+@pytest.mark.unit
+class TestTrieRouteIndex:
+    def test_candidates_of_empty_index(self):
+        index = TrieRouteIndex()
+        assert list(index.candidates('GET', '/users')) == []
+
+    def test_candidates_share_literal_prefix(self):
+        index = TrieRouteIndex()
+        users = create_route('users', '/users/list')
+        orders = create_route('orders', '/orders/list')
+        index.add(users)
+        index.add(orders)
+        assert list(index.candidates('GET', '/users/list')) == [users]
+        assert list(index.candidates('GET', '/orders/list')) == [orders]
+        assert list(index.candidates('GET', '/products')) == []
+
+    def test_candidates_filtered_by_method(self):
+        index = TrieRouteIndex()
+        get = create_route('get', '/users', 'GET')
+        post = create_route('post', '/users', 'POST')
+        index.add(get)
+        index.add(post)
+        assert list(index.candidates('POST', '/users')) == [post]
+
+    def test_routes_without_method_match_any_method(self):
+        index = TrieRouteIndex()
+        route = create_route('any', '/users', None)
+        index.add(route)
+        assert list(index.candidates('DELETE', '/users')) == [route]
+
+    def test_routes_without_literal_prefix_are_always_candidates(self):
+        index = TrieRouteIndex()
+        route = create_route('regex', '.*')
+        index.add(route)
+        assert list(index.candidates('GET', '/anything/at/all')) == [route]
+
+    def test_candidates_are_in_order_of_definition(self):
+        index = TrieRouteIndex()
+        nested = create_route('nested', '/users/list')
+        catch_all = create_route('catch_all', '.*')
+        prefix = create_route('prefix', '/users')
+        index.add(nested)
+        index.add(catch_all)
+        index.add(prefix)
+        assert list(index.candidates('GET', '/users/list')) == [nested, catch_all, prefix]
+
+    def test_remove(self):
+        index = TrieRouteIndex()
+        route = create_route('route', '/users')
+        index.add(route)
+        assert index.remove('route') == (0,)
+        assert list(index.candidates('GET', '/users')) == []
+
+    def test_remove_not_present(self):
+        index = TrieRouteIndex()
+        assert index.remove('route') is None
+
+    def test_replace_keeps_order(self):
+        index = TrieRouteIndex()
+        first = create_route('first', '/users')
+        second = create_route('second', '/users')
+        index.add(first)
+        index.add(second)
+        replacement = create_route('replacement', '/users/')
+        index.replace('first', replacement)
+        assert list(index.candidates('GET', '/users/1')) == [replacement, second]
+
+    def test_literal_routes_are_looked_up_by_whole_path(self):
+        index = TrieRouteIndex()
+        route = create_route('literal', '/users/list$')
+        index.add(route)
+        assert list(index.literals['GET']['/users/list'].values()) == [route]
+        assert not index.tries
+        assert list(index.candidates('GET', '/users/list')) == [route]
+        assert list(index.candidates('GET', '/users/list\n')) == [route]
+        assert list(index.candidates('GET', '/users/list/1')) == []
+        assert list(index.candidates('POST', '/users/list')) == []
+
+    def test_literal_and_trie_candidates_are_in_order_of_definition(self):
+        index = TrieRouteIndex()
+        prefix = create_route('prefix', '/users')
+        literal = create_route('literal', '/users/list$')
+        any_method = create_route('any_method', '/users/list$', None)
+        catch_all = create_route('catch_all', '.*')
+        for route in [any_method, prefix, literal, catch_all]:
+            index.add(route)
+        assert list(index.candidates('GET', '/users/list')) == [any_method, prefix, literal, catch_all]
+
+    def test_remove_literal_route(self):
+        index = TrieRouteIndex()
+        index.add(create_route('literal', '/users$'))
+        index.remove('literal')
+        assert list(index.candidates('GET', '/users')) == []
+
+
+@pytest.mark.unit
+class TestPrefixFilter:
+    def test_empty_filter_rejects_everything(self):
+        prefix_filter = PrefixFilter()
+        assert not prefix_filter.accepts('GET', '/users')
+        assert prefix_filter.rejections == 1
+
+    def test_accepts_paths_starting_with_first_segment(self):
+        prefix_filter = PrefixFilter()
+        prefix_filter.add(create_route('users', '/users/\\d+'))
+        assert prefix_filter.accepts('GET', '/users/1')
+        assert prefix_filter.accepts('GET', '/users/list')
+        assert not prefix_filter.accepts('GET', '/users')
+        assert not prefix_filter.accepts('GET', '/orders/1')
+
+    def test_filters_by_method(self):
+        prefix_filter = PrefixFilter()
+        prefix_filter.add(create_route('users', '/users', 'POST'))
+        prefix_filter.add(create_route('orders', '/orders', None))
+        assert prefix_filter.accepts('POST', '/users')
+        assert not prefix_filter.accepts('GET', '/users')
+        assert prefix_filter.accepts('GET', '/orders')
+
+    def test_pattern_without_prefix_accepts_everything(self):
+        prefix_filter = PrefixFilter()
+        prefix_filter.add(create_route('regex', '(/users|/orders)'))
+        assert prefix_filter.accepts('GET', '/anything')
+
+    def test_remove(self):
+        prefix_filter = PrefixFilter()
+        route = create_route('users', '/users')
+        prefix_filter.add(route)
+        prefix_filter.add(create_route('users_copy', '/users'))
+        prefix_filter.remove(route)
+        assert prefix_filter.accepts('GET', '/users')
+        prefix_filter.remove(route)
+        assert not prefix_filter.accepts('GET', '/users')
+        assert prefix_filter.serialize() == {'prefixes': 0, 'rejections': 1}
+
+    def test_covers_doesnt_count_rejections(self):
+        prefix_filter = PrefixFilter()
+        prefix_filter.add(create_route('users', '/users'))
+        assert prefix_filter.covers('GET', '/users')
+        assert not prefix_filter.covers('GET', '/orders')
+        assert prefix_filter.rejections == 0
+
+
+@pytest.mark.unit
+class TestConditionIndex:
+    def request(self, path, headers=None):
+        return IncomingTestRequest('http://localhost/', path, 'GET', headers=headers)
+
+    def test_routes_without_conditions_are_in_main_index(self):
+        index = ConditionIndex(TrieRouteIndex)
+        route = create_route('users', '/users', conditions={'headers': {'X-Debug': {'present': True}}})
+        index.add(route, 0)
+        assert list(index.index.candidates('GET', '/users')) == [route]
+        assert not index.values
+
+    def test_routes_are_looked_up_by_required_value(self):
+        index = ConditionIndex(TrieRouteIndex)
+        acme = create_route('acme', '/users', conditions={'headers': {'X-Tenant': 'acme'}})
+        other = create_route('other', '/users', conditions={'headers': {'X-Tenant': 'other'}})
+        index.add(acme, 0)
+        index.add(other, 1)
+        assert list(index.candidates(self.request('/users', {'X-Tenant': 'other'}))) == [other]
+        assert list(index.candidates(self.request('/users', {'X-Tenant': 'missing'}))) == []
+        assert list(index.candidates(self.request('/users'))) == []
+
+    def test_candidates_are_merged_in_order(self):
+        index = ConditionIndex(TrieRouteIndex)
+        routes = [
+            create_route('first', '/users'),
+            create_route('acme', '/users', conditions={'headers': {'X-Tenant': 'acme'}}),
+            create_route('last', '/users'),
+            create_route('beta', '/users', conditions={'args': {'beta': '1'}})
+        ]
+        for order, route in enumerate(routes):
+            index.add(route, order)
+        request = self.request('/users?beta=1', {'X-Tenant': 'acme'})
+        assert [route.id for route in index.candidates(request)] == ['first', 'acme', 'last', 'beta']
+
+
+@pytest.mark.unit
+class TestRouteIndex:
+    def test_names(self):
+        assert set(RouteIndex.names()) == {'trie', 'linear', 'alternation'}
+
+    @pytest.mark.parametrize('name, implementation', [
+        ('trie', TrieRouteIndex),
+        ('linear', LinearRouteIndex),
+        ('alternation', AlternationRouteIndex)
+    ])
+    def test_find_implementation(self, name, implementation):
+        assert RouteIndex.find_implementation(name) is implementation
+
+    def test_find_missing_implementation(self):
+        with pytest.raises(TricksterException):
+            RouteIndex.find_implementation('missing')
+
+
+@pytest.mark.unit
+class TestLinearRouteIndex:
+    def test_candidates_are_all_routes(self):
+        index = LinearRouteIndex()
+        users = create_route('users', '/users')
+        orders = create_route('orders', '/orders', 'POST')
+        index.add(users)
+        index.add(orders)
+        index.remove('users')
+        assert list(index.candidates('GET', '/users')) == [orders]
+
+
+@pytest.mark.unit
+class TestAlternationRouteIndex:
+    def test_first_candidate_is_first_matching_route(self):
+        index = AlternationRouteIndex()
+        users = create_route('users', '/users')
+        catch_all = create_route('catch_all', '/.*')
+        index.add(users)
+        index.add(catch_all)
+        assert next(index.candidates('GET', '/orders')) is catch_all
+        assert next(index.candidates('GET', '/users')) is users
+
+    def test_no_candidates_if_nothing_matches(self):
+        index = AlternationRouteIndex()
+        index.add(create_route('users', '/users'))
+        assert list(index.candidates('GET', '/orders')) == []
+
+    def test_recompiled_after_mutation(self):
+        index = AlternationRouteIndex()
+        index.add(create_route('users', '/users'))
+        assert list(index.candidates('GET', '/orders')) == []
+        orders = create_route('orders', '/orders')
+        index.add(orders)
+        assert list(index.candidates('GET', '/orders')) == [orders]
+
+    def test_inactive_routes_are_left_out(self):
+        index = AlternationRouteIndex()
+        route = create_route('users', '/users', repeat=1)
+        index.add(route)
+        assert list(index.candidates('GET', '/users')) == [route]
+        route.use(route.select_response())
+        assert list(index.candidates('GET', '/users')) == [route]
+        assert list(index.candidates('GET', '/users')) == []
+
+    @pytest.mark.parametrize('pattern', [
+        '/(users)/\\1',
+        '/(?P<name>users)/(?P=name)',
+        '(?i)/users',
+        '/(?P<_trickster_route_0>users)'
+    ])
+    def test_unmergeable_patterns_get_own_chunk(self, pattern):
+        index = AlternationRouteIndex()
+        index.add(create_route('first', '/first'))
+        index.add(create_route('unmergeable', pattern))
+        index.add(create_route('last', '/last'))
+        chunks = index._chunks('GET')
+        assert [len(chunk.routes) for chunk in chunks] == [1, 1, 1]
+
+    def test_conflicting_group_names_split_chunks(self):
+        index = AlternationRouteIndex()
+        first = create_route('first', '/(?P<id>first)')
+        second = create_route('second', '/(?P<id>second)')
+        index.add(first)
+        index.add(second)
+        assert len(index._chunks('GET')) == 2
+        assert next(index.candidates('GET', '/second')) is second
+
+    def test_mergeable_patterns_share_chunk(self):
+        index = AlternationRouteIndex()
+        index.add(create_route('first', '/(?P<id>first)'))
+        index.add(create_route('second', '/second/(\\d+)'))
+        assert len(index._chunks('GET')) == 1
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('index', RouteIndex.names())
+class TestRouterWithIndex:
+    def match(self, router, path, method='GET'):
+        return router.match(IncomingTestRequest('http://localhost/', path, method))
+
+    def test_first_defined_route_wins(self, index):
+        router = Router(index)
+        nested = router.add_route({'path': '/users/(?P<id>\\d+)', 'responses': [{'body': ''}]})
+        catch_all = router.add_route({'path': '.*', 'responses': [{'body': ''}]})
+        assert self.match(router, '/users/1') is nested
+        assert self.match(router, '/users/list') is catch_all
+
+    def test_method_is_matched(self, index):
+        router = Router(index)
+        post = router.add_route({'path': '/users', 'method': 'POST', 'responses': [{'body': ''}]})
+        assert self.match(router, '/users') is None
+        assert self.match(router, '/users', 'POST') is post
+
+    def test_exhausted_route_is_skipped(self, index):
+        router = Router(index)
+        first = router.add_route({'path': '/users', 'responses': [{'body': '', 'repeat': 1}]})
+        second = router.add_route({'path': '/users', 'responses': [{'body': ''}]})
+        assert self.match(router, '/users') is first
+        first.use(first.select_response())
+        assert self.match(router, '/users') is second
+
+    def test_updated_route_keeps_position(self, index):
+        router = Router(index)
+        router.add_route({'id': 'first', 'path': '/orders', 'responses': [{'body': ''}]})
+        router.add_route({'id': 'second', 'path': '/users', 'responses': [{'body': ''}]})
+        updated = router.update_route({'path': '/users', 'responses': [{'body': ''}]}, 'first')
+        assert self.match(router, '/users') is updated
+
+    def test_removed_route_is_not_matched(self, index):
+        router = Router(index)
+        router.add_route({'id': 'first', 'path': '/users', 'responses': [{'body': ''}]})
+        router.remove_route('first')
+        assert self.match(router, '/users') is None
+
+    def test_higher_priority_wins(self, index):
+        router = Router(index)
+        router.add_route({'path': '.*', 'responses': [{'body': ''}]})
+        users = router.add_route({'path': '/users', 'priority': 1, 'responses': [{'body': ''}]})
+        assert self.match(router, '/users') is users
+
+    def test_most_specific_route_wins(self, index):
+        router = Router(index, route_order='specificity')
+        router.add_route({'path': '.*', 'responses': [{'body': ''}]})
+        router.add_route({'path': '/users/\\d+$', 'responses': [{'body': ''}]})
+        prefix = router.add_route({'path': '/users/', 'responses': [{'body': ''}]})
+        longer_prefix = router.add_route({'path': '/users/1', 'responses': [{'body': ''}]})
+        literal = router.add_route({'path': '/users/1$', 'responses': [{'body': ''}]})
+        assert self.match(router, '/users/1') is literal
+        assert self.match(router, '/users/10') is longer_prefix
+        assert self.match(router, '/users/2') is prefix
+
+    def test_moved_route_is_matched_first(self, index):
+        router = Router(index)
+        router.add_route({'path': '.*', 'responses': [{'body': ''}]})
+        users = router.add_route({'id': 'users', 'path': '/users', 'responses': [{'body': ''}]})
+        router.move_route('users', 0)
+        assert self.match(router, '/users') is users
+
+    def test_route_with_conditions_is_matched(self, index):
+        router = Router(index)
+        tenants = [
+            router.add_route({
+                'path': '/users',
+                'conditions': {'headers': {'X-Tenant': f'tenant{i}'}},
+                'responses': [{'body': ''}]
+            })
+            for i in range(100)
+        ]
+        default = router.add_route({'path': '/users', 'responses': [{'body': ''}]})
+        request = IncomingTestRequest('http://localhost/', '/users', 'GET', headers={'X-Tenant': 'tenant42'})
+        assert router.match(request) is tenants[42]
+        assert self.match(router, '/users') is default
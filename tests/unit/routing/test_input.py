@@ -1,8 +1,11 @@
 import pytest
 
 import flask
+from werkzeug.test import EnvironBuilder
 
-from trickster.routing.input import IncomingTestRequest, IncomingFlaskRequest, HTTP_METHODS
+from trickster.routing.input import (
+    IncomingAsgiRequest, IncomingTestRequest, IncomingFlaskRequest, IncomingWsgiRequest, HTTP_METHODS
+)
 
 
 @pytest.mark.unit
@@ -21,11 +24,21 @@ class TestIncomingTestRequest:
             full_path='/path/file.json?arg1=1&arg2=2#anchor',
             method='GET'
         )
-        assert request.args == {
+        assert request.args.to_dict() == {
             'arg1': '1',
             'arg2': '2'
         }
 
+    def test_args_keep_blank_and_repeated_values(self):
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/path?arg1=1&arg2=2&arg2=3&arg3=',
+            method='GET'
+        )
+        assert request.args['arg1'] == '1'
+        assert request.args.getlist('arg2') == ['2', '3']
+        assert request.args['arg3'] == ''
+
     def test_get_query_string_strips_path(self):
         request = IncomingTestRequest(
             base_url='http://localhost/',
@@ -161,4 +174,111 @@ class TestIncomingFlaskRequest:
             headers={'header': 'value'},
         ):
             request = IncomingFlaskRequest(flask.request)
-            assert len(request.form) == 0
\ No newline at end of file
+            assert len(request.form) == 0
+
+@pytest.mark.unit
+class TestIncomingAsgiRequest:
+    def create_request(self, headers=None, body=b'', query_string=b''):
+        scope = {
+            'type': 'http',
+            'method': 'POST',
+            'scheme': 'http',
+            'path': '/path/file.json',
+            'root_path': '',
+            'query_string': query_string,
+            'headers': headers or [],
+            'server': ('127.0.0.1', 8080)
+        }
+        return IncomingAsgiRequest(scope, body)
+
+    def test_method_and_path(self):
+        request = self.create_request()
+        assert request.method == 'POST'
+        assert request.path == '/path/file.json'
+
+    def test_headers(self):
+        request = self.create_request(headers=[
+            (b'authorization', b'Bearer token'),
+            (b'x-custom', b'1'),
+            (b'x-custom', b'2')
+        ])
+        assert request.headers == {
+            'Authorization': 'Bearer token',
+            'X-Custom': '1, 2'
+        }
+
+    def test_args(self):
+        request = self.create_request(query_string=b'arg1=1&arg2=2&arg2=3&arg3=')
+        assert request.query_string == 'arg1=1&arg2=2&arg2=3&arg3='
+        assert request.args['arg1'] == '1'
+        assert request.args.getlist('arg2') == ['2', '3']
+        assert request.args['arg3'] == ''
+
+    def test_url_uses_host_header(self):
+        request = self.create_request(headers=[(b'host', b'domain.com')], query_string=b'arg=1')
+        assert request.url == 'http://domain.com/path/file.json?arg=1'
+
+    def test_url_without_host_header(self):
+        request = self.create_request()
+        assert request.url == 'http://127.0.0.1:8080/path/file.json'
+
+    def test_form(self):
+        request = self.create_request(
+            headers=[(b'content-type', b'application/x-www-form-urlencoded')],
+            body=b'field1=value1&field2=value2'
+        )
+        assert dict(request.form) == {'field1': 'value1', 'field2': 'value2'}
+
+    def test_form_ignores_other_content(self):
+        request = self.create_request(headers=[(b'content-type', b'application/json')], body=b'{}')
+        assert request.form == {}
+
+    def test_cookies(self):
+        request = self.create_request(headers=[(b'cookie', b'cookie1=value1; cookie2=value2')])
+        assert dict(request.cookies) == {'cookie1': 'value1', 'cookie2': 'value2'}
+
+
+@pytest.mark.unit
+class TestIncomingWsgiRequest:
+    def create_request(self, path='/path/file.json', **kwargs):
+        environ = EnvironBuilder(path=path, method='POST', base_url='http://127.0.0.1:8080/', **kwargs).get_environ()
+        return IncomingWsgiRequest(environ)
+
+    def test_method_and_path(self):
+        request = self.create_request()
+        assert request.method == 'POST'
+        assert request.path == '/path/file.json'
+
+    def test_path_is_decoded(self):
+        request = self.create_request(path='/p%C3%A1th')
+        assert request.path == '/páth'
+
+    def test_headers(self):
+        request = self.create_request(headers=[('Authorization', 'Bearer token'), ('X-Custom', '1')])
+        assert request.headers['Authorization'] == 'Bearer token'
+        assert request.headers['X-Custom'] == '1'
+        assert request.headers['Host'] == '127.0.0.1:8080'
+
+    def test_args(self):
+        request = self.create_request(query_string='arg1=1&arg2=2&arg2=3&arg3=')
+        assert request.query_string == 'arg1=1&arg2=2&arg2=3&arg3='
+        assert request.args['arg1'] == '1'
+        assert request.args.getlist('arg2') == ['2', '3']
+        assert request.args['arg3'] == ''
+
+    def test_url(self):
+        request = self.create_request(query_string='arg=1')
+        assert request.url == 'http://127.0.0.1:8080/path/file.json?arg=1'
+
+    def test_form(self):
+        request = self.create_request(data={'field1': 'value1', 'field2': 'value2'})
+        assert request.headers['Content-Type'] == 'application/x-www-form-urlencoded'
+        assert dict(request.form) == {'field1': 'value1', 'field2': 'value2'}
+
+    def test_form_ignores_other_content(self):
+        request = self.create_request(data=b'{}', content_type='application/json')
+        assert request.form == {}
+
+    def test_cookies(self):
+        request = self.create_request(headers=[('Cookie', 'cookie1=value1; cookie2=value2')])
+        assert dict(request.cookies) == {'cookie1': 'value1', 'cookie2': 'value2'}
@@ -0,0 +1,148 @@
+import re
+
+import pytest
+
+from trickster.routing import RouteConfigurationError, UnsafePathError
+from trickster.routing.path import (
+    PathClass, PathPattern, classify, literal_prefix, literal_segments, nested_repeat, plain_literal
+)
+
+
+@pytest.mark.unit
+class TestLiteralPrefix:
+    @pytest.mark.parametrize('pattern, prefix', [
+        ('/users/list', '/users/list'),
+        ('/users/\\d+', '/users/'),
+        ('^/users', '/users'),
+        ('\\A/users', '/users'),
+        ('/users\\.json', '/users.json'),
+        ('/users*', '/user'),
+        ('/users|/orders', '/'),
+        ('.*', ''),
+        ('(/users)', ''),
+        ('(?i)/users', ''),
+        ('^/users/list$', '/users/list'),
+        ('/users$/list', '/users')
+    ])
+    def test_literal_prefix(self, pattern, prefix):
+        assert literal_prefix(re.compile(pattern)) == prefix
+
+    @pytest.mark.parametrize('pattern, literal', [
+        ('/users/list', '/users/list'),
+        ('^/users/list$', '/users/list'),
+        ('/users/\\d+', None),
+        ('/users.json', None),
+        ('/users\\$', None)
+    ])
+    def test_plain_literal(self, pattern, literal):
+        assert plain_literal(re.compile(pattern)) == literal
+
+    def test_verbose_pattern_is_not_plain_literal(self):
+        assert plain_literal(re.compile('/users list', re.VERBOSE)) is None
+
+    @pytest.mark.parametrize('prefix, segments', [
+        ('/users/list', ['', 'users']),
+        ('/users/', ['', 'users']),
+        ('/users', ['']),
+        ('', [])
+    ])
+    def test_literal_segments(self, prefix, segments):
+        assert literal_segments(prefix) == segments
+
+
+@pytest.mark.unit
+class TestPathPattern:
+    @pytest.mark.parametrize('pattern, path_class, literal', [
+        ('/users$', PathClass.literal, '/users'),
+        ('^/users/list$', PathClass.literal, '/users/list'),
+        ('/users', PathClass.prefix, '/users'),
+        ('/users/.*', PathClass.prefix, '/users/'),
+        ('/users/\\d+$', PathClass.parametrized, None),
+        ('/users/[^/]+/orders', PathClass.parametrized, None),
+        ('/users/(?P<id>[0-9a-f-]+)/orders/\\w*$', PathClass.parametrized, None),
+        ('/users/\\d+x', PathClass.regex, None),
+        ('/users|/orders', PathClass.regex, None),
+        ('/users/(\\d+)', PathClass.regex, None)
+    ])
+    def test_classify(self, pattern, path_class, literal):
+        assert classify(pattern) == (path_class, literal)
+
+    def test_classify_pattern_with_flags(self):
+        assert classify('/users', re.IGNORECASE) == (PathClass.regex, None)
+
+    def test_literal_is_not_compiled(self):
+        path_pattern = PathPattern('/users$')
+        assert path_pattern._regex is None
+        assert path_pattern.prefix == '/users'
+        assert path_pattern._regex is None
+
+        assert path_pattern.regex == re.compile('/users$')
+
+    def test_regex_is_compiled_on_creation(self):
+        assert PathPattern('/users/\\d+')._regex == re.compile('/users/\\d+')
+        with pytest.raises(RouteConfigurationError, match='is not a valid regex'):
+            PathPattern('/users/(')
+
+    def test_unsafe_pattern_is_rejected(self):
+        with pytest.raises(UnsafePathError):
+            PathPattern('/users/(\\w+\\s?)+$')
+
+    def test_compiled_pattern(self):
+        compiled = re.compile('/users$', re.IGNORECASE)
+        path_pattern = PathPattern(compiled)
+        assert path_pattern.text == '/users$'
+        assert path_pattern.path_class == PathClass.regex
+        assert path_pattern.regex is compiled
+
+    @pytest.mark.parametrize('pattern', [
+        '/users', '/users$', '^/users$', '/users/.*', '/users.*$', '/users/\\d+', '/users\\$', '/users\\.*', '(?i)/users'
+    ])
+    @pytest.mark.parametrize('path', [
+        '', '/users', '/users\n', '/users\n\n', '/users/', '/users/1', '/users.', '/users$', '/USERS', '/orders'
+    ])
+    def test_matcher_is_equivalent_to_pattern(self, pattern, path):
+        assert bool(PathPattern(pattern).matcher()(path)) == bool(re.compile(pattern).match(path))
+
+    @pytest.mark.parametrize('pattern, regex', [
+        ('/users$', False),
+        ('/users', False),
+        ('/users/.*', False),
+        ('/users/\\d+', True),
+        ('(?i)/users', True)
+    ])
+    def test_matcher_uses_regex_only_when_needed(self, pattern, regex):
+        path_pattern = PathPattern(pattern)
+        assert (path_pattern.matcher() == path_pattern.regex.match) is regex
+
+    def test_verbose_pattern_is_matched_by_regex(self):
+        compiled = re.compile('/users list', re.VERBOSE)
+        assert PathPattern(compiled).matcher() == compiled.match
+
+
+@pytest.mark.unit
+class TestNestedRepeat:
+    @pytest.mark.parametrize('pattern', [
+        '(a+)+$',
+        '(.*)*',
+        '/users/(\\w+\\s?)+$',
+        '(/.*)*$',
+        '(x+x+)+y',
+        '([^/]+/?)+$',
+        '((ab)*)*',
+        '(?:a*?)+'
+    ])
+    def test_unsafe(self, pattern):
+        assert nested_repeat(re.compile(pattern))
+
+    @pytest.mark.parametrize('pattern', [
+        '/users/\\d+',
+        '/users/.*',
+        '(a|b)*',
+        '(/\\w+)*$',
+        '(?:/[^/]+)+$',
+        '([a-z]+/)*end',
+        '(a{1,3})*',
+        '(?:-\\d+)+$'
+    ])
+    def test_safe(self, pattern):
+        assert not nested_repeat(re.compile(pattern))
@@ -2,9 +2,16 @@ import re
 
 import pytest
 
-from trickster.routing import DuplicateRouteError, MissingRouteError, RouteConfigurationError
+from trickster.routing import (
+    DuplicateRouteError, InvalidRoutesError, MissingRouteError, MissingSnapshotError, RouteConfigurationError,
+    UnsafePathError
+)
 from trickster.routing.auth import NoAuth
-from trickster.routing.router import Delay, RouteResponse, ResponseSelectionStrategy, Route, Router
+from trickster.routing.index import RouteIndex
+from trickster.routing.router import (
+    CycleResponseSelector, Delay, GreedyResponseSelector, RandomResponseSelector, RouteResponse,
+    LazyRoute, ResponseSelectionStrategy, Route, Router
+)
 from trickster.routing.input import IncomingTestRequest
 
 
@@ -161,6 +168,64 @@ class TestResponseSelectionStrategy:
         assert r1.used_count < r2.used_count
 
 
+@pytest.mark.unit
+class TestResponseSelectors:
+    def test_create_selector(self):
+        assert isinstance(ResponseSelectionStrategy.cycle.create_selector([]), CycleResponseSelector)
+        assert isinstance(ResponseSelectionStrategy.random.create_selector([]), RandomResponseSelector)
+        assert isinstance(ResponseSelectionStrategy.greedy.create_selector([]), GreedyResponseSelector)
+
+    def test_greedy_selector_moves_cursor(self):
+        responses = [RouteResponse(f'id{i}', '', Delay(), repeat=1) for i in range(3)]
+        selector = GreedyResponseSelector(responses)
+
+        for position, response in enumerate(responses):
+            assert selector.select() is response
+            assert selector.cursor == position
+            response.use()
+        assert selector.select() is None
+
+    def test_cycle_selector_with_responses_used_elsewhere(self):
+        r1 = RouteResponse('id1', '', Delay())
+        r2 = RouteResponse('id2', '', Delay())
+        r3 = RouteResponse('id3', '', Delay())
+        selector = CycleResponseSelector([r1, r2, r3])
+
+        r1.use()
+        r1.use()
+        r2.use()
+        assert selector.select() is r3
+        r3.use()
+        assert selector.select() is r2
+
+    def test_cycle_selector_skips_exhausted_responses(self):
+        r1 = RouteResponse('id1', '', Delay(), repeat=1)
+        r2 = RouteResponse('id2', '', Delay(), repeat=3)
+        selector = CycleResponseSelector([r1, r2])
+
+        assert selector.select() is r1
+        r1.use()
+        assert selector.select() is r2
+        r2.use()
+        assert selector.select() is r2
+        assert len(selector.heap) == 1
+
+    def test_random_selector_rebuilds_population_of_active_responses(self):
+        r1 = RouteResponse('id1', '', Delay(), repeat=1, weight=1.0)
+        r2 = RouteResponse('id2', '', Delay(), weight=0.1)
+        selector = RandomResponseSelector([r1, r2])
+        assert selector.population == [r1, r2]
+
+        r1.use()
+        for _ in range(20):
+            assert selector.select() is r2
+        assert selector.population == [r2]
+
+    def test_random_selector_without_active_responses(self):
+        selector = RandomResponseSelector([RouteResponse('id1', '', Delay(), repeat=0)])
+        assert selector.select() is None
+
+
 @pytest.mark.unit
 class TestRoute:
     def test_deserialize_complete(self):
@@ -240,13 +305,50 @@ class TestRoute:
             'id': 'id1',
             'responses': [],
             'response_selection': 'random',
+            'priority': 0,
             'path': '/test.*',
+            'path_class': 'prefix',
+            'conditions': {},
             'auth': None,
             'method': 'GET',
             'used_count': 0,
-            'is_active': False
+            'is_active': False,
+            'quarantined': False
         }
 
+    @pytest.mark.parametrize('path, path_class', [
+        ('/test$', 'literal'),
+        ('/test/.*', 'prefix'),
+        ('/test/\\d+$', 'parametrized'),
+        ('/test|/other', 'regex')
+    ])
+    def test_serialize_path_class(self, path, path_class):
+        route = Route.deserialize({'id': 'id1', 'path': path, 'responses': []})
+        assert route.serialize()['path_class'] == path_class
+
+    def test_literal_path_is_not_compiled(self):
+        route = Route.deserialize({'id': 'id1', 'path': '/test$', 'responses': [{'body': ''}]})
+        assert route.match(IncomingTestRequest('http://localhost/', '/test', 'GET'))
+        assert route.path_prefix == '/test'
+        assert route.path_pattern._regex is None
+        assert route.path == re.compile('/test$')
+
+    def test_route_with_conditions(self):
+        route = Route.deserialize({
+            'id': 'id1',
+            'path': '/test',
+            'conditions': {'headers': {'x-tenant': 'acme'}, 'args': {'debug': {'present': False}}},
+            'responses': [{'body': ''}]
+        })
+
+        assert route.match(IncomingTestRequest('http://localhost/', '/test', 'GET', headers={'X-Tenant': 'acme'}))
+        assert not route.match(IncomingTestRequest('http://localhost/', '/test', 'GET', headers={'X-Tenant': 'other'}))
+        assert not route.match(
+            IncomingTestRequest('http://localhost/', '/test?debug=1', 'GET', headers={'X-Tenant': 'acme'})
+        )
+        assert not route.match(IncomingTestRequest('http://localhost/', '/test', 'POST', headers={'X-Tenant': 'acme'}))
+        assert route.serialize()['conditions'] == {'headers': {'X-Tenant': 'acme'}, 'args': {'debug': {'present': False}}}
+
     def test_get_response_found(self):
         r1 = RouteResponse('id1', 'string', Delay())
         r2 = RouteResponse('id2', 'string', Delay())
@@ -336,6 +438,83 @@ class TestRoute:
         )
         assert route.match(request)
 
+    def test_match_method_is_checked_first(self, mocker):
+        route = Route.deserialize({'id': 'id1', 'path': '/test/\\d+', 'method': 'POST', 'responses': [{'body': ''}]})
+        request = mocker.Mock(spec=['method'], method='GET')  # Accessing path would fail
+
+        assert not route.match(request)
+
+    @pytest.mark.parametrize('method, path, matches', [
+        ('GET', '/test/1', True),
+        ('POST', '/test/1', True),
+        ('GET', '/test/a', False)
+    ])
+    def test_match_any_method(self, method, path, matches):
+        route = Route.deserialize({'id': 'id1', 'path': '/test/\\d+', 'method': None, 'responses': [{'body': ''}]})
+        request = IncomingTestRequest(base_url='http://localhost/', full_path=path, method=method)
+        assert route.match(request) is matches
+
+    def test_copy_matches_its_own_usage(self):
+        route = Route.deserialize({'id': 'id1', 'path': '/test', 'responses': [{'body': '', 'repeat': 1}]})
+        route_copy = route.copy()
+        route.consume()
+        request = IncomingTestRequest(base_url='http://localhost/', full_path='/test', method='GET')
+
+        assert not route.match(request)
+        assert route_copy.match(request)
+
+    def test_auth_required(self):
+        route = Route.deserialize({'id': 'id1', 'path': '/test', 'responses': []})
+        assert not route.auth_required
+        route = Route.deserialize({
+            'id': 'id1',
+            'path': '/test',
+            'auth': {'method': 'token', 'token': 'secret'},
+            'responses': []
+        })
+        assert route.auth_required
+
+    def test_slow_route_is_quarantined(self, mocker):
+        route = Route.deserialize({'id': 'id1', 'path': '/test|/other', 'responses': [{'body': ''}]})
+        route.match_time_budget = 0.1
+        route.on_exhausted = mocker.Mock()
+        mocker.patch('trickster.routing.router.time.thread_time', side_effect=[1.0, 1.5, 2.0, 2.5, 3.0, 3.5])
+        request = IncomingTestRequest(base_url='http://localhost/', full_path='/test', method='GET')
+
+        assert route.match(request)
+        assert route.match(request)
+        assert not route.quarantined
+        assert route.match(request)
+        assert route.quarantined
+        assert not route.is_active
+        assert not route.match(request)
+        assert route.serialize()['quarantined'] is True
+        route.on_exhausted.assert_called_once_with(route)
+
+    def test_route_in_budget_is_not_quarantined(self, mocker):
+        route = Route.deserialize({'id': 'id1', 'path': '/test|/other', 'responses': [{'body': ''}]})
+        route.match_time_budget = 0.1
+        route.slow_matches = Route.quarantine_after - 1
+        mocker.patch('trickster.routing.router.time.thread_time', side_effect=[1.0, 1.05])
+
+        assert route.match(IncomingTestRequest(base_url='http://localhost/', full_path='/test', method='GET'))
+        assert not route.quarantined
+
+    @pytest.mark.parametrize('path, budget', [('/test', 0.1), ('/test/\\d+', 0.1), ('/test|/other', None)])
+    def test_match_time_is_not_measured(self, mocker, path, budget):
+        route = Route.deserialize({'id': 'id1', 'path': path, 'responses': [{'body': ''}]})
+        route.match_time_budget = budget
+        thread_time = mocker.patch('trickster.routing.router.time.thread_time')
+
+        assert route.match(IncomingTestRequest(base_url='http://localhost/', full_path='/test/1', method='GET'))
+        thread_time.assert_not_called()
+
+    def test_quarantined_lazy_route_is_not_active(self):
+        route = LazyRoute.deserialize({'id': 'id1', 'path': '/test|/other', 'responses': [{'body': ''}]})
+        route.quarantine()
+        assert not route.is_active
+        assert not route.is_materialized
+
     def test_select_response(self):
         response = RouteResponse('id1', 'string', Delay())
         route = Route(
@@ -362,6 +541,71 @@ class TestRoute:
 
         assert route.is_active == 0
 
+    def test_use_last_response_deactivates_route(self):
+        r1 = RouteResponse('id1', 'string', Delay(), repeat=1)
+        r2 = RouteResponse('id2', 'string', Delay(), repeat=2)
+        route = Route(
+            id='id1',
+            responses=[r1, r2],
+            response_selection=ResponseSelectionStrategy.greedy,
+            path=re.compile(r'/test.*'),
+            auth=NoAuth(),
+            method='GET'
+        )
+        exhausted = []
+        route.on_exhausted = exhausted.append
+
+        assert route.active_responses == 2
+        route.use(r1)
+        assert route.active_responses == 1
+        route.use(r2)
+        route.use(r2)
+        assert route.active_responses == 0
+        assert not route.is_active
+        assert exhausted == [route]
+
+    def test_consume(self):
+        r1 = RouteResponse('id1', 'string', Delay(), repeat=1)
+        r2 = RouteResponse('id2', 'string', Delay(), repeat=1)
+        route = Route(
+            id='id1',
+            responses=[r1, r2],
+            response_selection=ResponseSelectionStrategy.greedy,
+            path=re.compile(r'/test.*'),
+            auth=NoAuth(),
+            method='GET'
+        )
+        exhausted = []
+        route.on_exhausted = exhausted.append
+
+        assert route.consume() is r1
+        assert exhausted == []
+        assert route.consume() is r2
+        assert exhausted == [route]
+        assert route.consume() is None
+        assert route.used_count == 2
+        assert r1.used_count == r2.used_count == 1
+        assert exhausted == [route]
+
+    def test_select_response_keeps_selection_state(self):
+        r1 = RouteResponse('id1', 'string', Delay())
+        r2 = RouteResponse('id2', 'string', Delay())
+        route = Route(
+            id='id1',
+            responses=[r1, r2],
+            response_selection=ResponseSelectionStrategy.cycle,
+            path=re.compile(r'/test.*'),
+            auth=NoAuth(),
+            method='GET'
+        )
+
+        selected = []
+        for _ in range(4):
+            response = route.select_response()
+            route.use(response)
+            selected.append(response)
+        assert selected == [r1, r2, r1, r2]
+
     def test_authenticate(self):
         route = Route(
             id='id1',
@@ -379,6 +623,87 @@ class TestRoute:
         route.authenticate(request)
 
 
+@pytest.mark.unit
+class TestLazyRoute:
+    def create_route(self, **data):
+        return LazyRoute.deserialize({
+            'id': 'route',
+            'path': '/test',
+            'responses': [{'id': 'response', 'body': 'body', 'repeat': 1}],
+            **data
+        })
+
+    def test_deserialize_keeps_json(self):
+        route = self.create_route(method='POST')
+        assert route.id == 'route'
+        assert route.method == 'POST'
+        assert route.path == re.compile('/test')
+        assert route.is_active
+        assert not route.is_materialized
+        assert 'responses' not in route.__dict__
+        assert 'auth' not in route.__dict__
+
+    def test_access_materializes_route(self):
+        route = self.create_route()
+        assert route.get_response('response').body == 'body'
+        assert route.is_materialized
+        assert isinstance(route.auth, NoAuth)
+        assert route.active_responses == 1
+
+    def test_consume_materializes_route(self):
+        route = self.create_route()
+        assert route.consume().id == 'response'
+        assert route.is_materialized
+        assert not route.is_active
+
+    def test_serialize(self):
+        route = self.create_route()
+        assert route.serialize() == Route.deserialize({
+            'id': 'route',
+            'path': '/test',
+            'responses': [{'id': 'response', 'body': 'body', 'repeat': 1}]
+        }).serialize()
+
+    def test_inactive_route(self):
+        route = self.create_route(responses=[{'body': 'body', 'repeat': 0}])
+        assert not route.is_active
+        assert not route.is_materialized
+
+    def test_conditions_are_deserialized(self):
+        route = self.create_route(conditions={'cookies': {'tenant': 'acme'}})
+        assert route.match(IncomingTestRequest('http://localhost/', '/test', 'GET', cookies={'tenant': 'acme'}))
+        assert not route.match(IncomingTestRequest('http://localhost/', '/test', 'GET'))
+        assert not route.is_materialized
+
+    def test_copy_shares_json(self):
+        route = self.create_route()
+        route_copy = route.copy()
+        assert route_copy.definition is route.definition
+        route_copy.consume()
+        assert not route.is_materialized
+        assert route.is_active
+
+    def test_copy_materialized_route(self):
+        route = self.create_route()
+        route.consume()
+        route_copy = route.copy()
+        assert route_copy.is_materialized
+        assert route_copy.responses.items[0] is not route.responses.items[0]
+        assert route_copy.used_count == 1
+
+    @pytest.mark.parametrize('data, error', [
+        ({'responses': [{'id': 'a', 'body': ''}, {'id': 'a', 'body': ''}]}, DuplicateRouteError),
+        ({'responses': [{'body': '', 'delay': [2, 1]}]}, RouteConfigurationError),
+        ({'auth': {'token': 'token'}}, RouteConfigurationError),
+        ({'auth': {'method': 'unknown'}}, RouteConfigurationError),
+        ({'auth': {'method': 'token', 'unauthorized_response': {'body': '', 'delay': [2, 1]}}}, RouteConfigurationError),
+        ({'conditions': {'headers': {'X-Tenant': {'regex': '('}}}}, RouteConfigurationError)
+    ])
+    def test_invalid_json_is_rejected_up_front(self, data, error):
+        with pytest.raises(error):
+            self.create_route(**data)
+
+
 @pytest.mark.unit
 class TestRouter:
     def test_initialize_empty_router(self):
@@ -615,3 +940,648 @@ class TestRouter:
         ])
         
         assert len(router.routes) == 1
+
+    def test_match_first_defined_route(self):
+        router = Router()
+        catch_all = router.add_route({
+            'id': 'id1',
+            'path': '.*',
+            'responses': [{'body': 'catch_all'}]
+        })
+        router.add_route({
+            'id': 'id2',
+            'path': '/endpoint',
+            'responses': [{'body': 'endpoint'}]
+        })
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint',
+            method='GET'
+        )
+
+        assert router.match(request) is catch_all
+
+    def test_match_updated_route_keeps_position(self):
+        router = Router()
+        router.add_route({
+            'id': 'id1',
+            'path': '/other',
+            'responses': [{'body': 'first'}]
+        })
+        router.add_route({
+            'id': 'id2',
+            'path': '/endpoint',
+            'responses': [{'body': 'second'}]
+        })
+        updated = router.update_route({
+            'path': '/endpoint',
+            'responses': [{'body': 'updated'}]
+        }, 'id1')
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint',
+            method='GET'
+        )
+
+        assert router.match(request) is updated
+
+    def test_move_route(self):
+        router = Router()
+        for route_id in ['id1', 'id2', 'id3']:
+            router.add_route({'id': route_id, 'path': '/endpoint', 'responses': [{'body': route_id}]})
+
+        moved = router.move_route('id3', 1)
+
+        assert [route.id for route in router.routes] == ['id1', 'id3', 'id2']
+        assert moved is router.get_route('id3')
+        router.move_route('id1', 10)
+        assert [route.id for route in router.routes] == ['id3', 'id2', 'id1']
+        assert router.match(IncomingTestRequest('http://localhost/', '/endpoint', 'GET')).id == 'id3'
+
+    def test_move_route_changes_copy_of_index(self, mocker):
+        router = Router()
+        for route_id in ['id1', 'id2', 'id3']:
+            router.add_route({'id': route_id, 'path': '/endpoint', 'responses': [{'body': route_id}]})
+        index = router.table.index
+        build_table = mocker.spy(router, '_build_table')
+
+        router.move_route('id3', 0)
+
+        build_table.assert_not_called()
+        assert [route.id for route in router.table.index.candidates('GET', '/endpoint')] == ['id3', 'id1', 'id2']
+        assert [route.id for route in index.candidates('GET', '/endpoint')] == ['id1', 'id2', 'id3']
+
+    @pytest.mark.parametrize('rebuild_ratio, rebuilt', [(8, False), (1000, True)])
+    def test_move_route_spreading_order_keys(self, mocker, rebuild_ratio, rebuilt):
+        router = Router()
+        router.rebuild_ratio = rebuild_ratio
+        for route_id in [*(f'route{i}' for i in range(64)), *(f'id{i}' for i in range(17))]:
+            router.add_route({'id': route_id, 'path': '/endpoint', 'responses': [{'body': route_id}]})
+        build_table = mocker.spy(router, '_build_table')
+
+        for i in range(17):
+            router.move_route(f'id{i}', 1)
+
+        assert build_table.called is rebuilt
+        assert [route.id for route in router.routes][:18] == ['route0', *(f'id{i}' for i in reversed(range(17)))]
+        assert router.match(IncomingTestRequest('http://localhost/', '/endpoint', 'GET')).id == 'route0'
+        router.move_route('id0', 0)
+        assert router.match(IncomingTestRequest('http://localhost/', '/endpoint', 'GET')).id == 'id0'
+        assert [route.id for route in router.table.index.candidates('GET', '/endpoint')] == [
+            route.id for route in router.routes
+        ]
+
+    def test_move_missing_route(self):
+        router = Router()
+        with pytest.raises(MissingRouteError):
+            router.move_route('id1', 0)
+
+    def test_route_order_keeps_definition_order_of_equal_routes(self):
+        router = Router(route_order='specificity')
+        router.add_route({'id': 'id1', 'path': '/endpoint', 'responses': [{'body': ''}]})
+        router.add_route({'id': 'id2', 'path': '/endpoint', 'responses': [{'body': ''}]})
+        router.add_route({'id': 'id3', 'path': '/endpoint', 'priority': -1, 'responses': [{'body': ''}]})
+        router.add_route({'id': 'id4', 'path': '/endpoint', 'priority': 1, 'responses': [{'body': ''}]})
+
+        candidates = router.table.index.candidates('GET', '/endpoint')
+        assert [route.id for route in candidates] == ['id4', 'id1', 'id2', 'id3']
+        assert [route.id for route in router.routes] == ['id1', 'id2', 'id3', 'id4']
+
+    def test_route_order_puts_routes_with_more_conditions_first(self):
+        router = Router(route_order='specificity')
+        router.add_route({'id': 'id1', 'path': '/endpoint', 'responses': [{'body': ''}]})
+        router.add_route({
+            'id': 'id2',
+            'path': '/endpoint',
+            'conditions': {'headers': {'X-Debug': {'present': True}}},
+            'responses': [{'body': ''}]
+        })
+        request = IncomingTestRequest('http://localhost/', '/endpoint', 'GET', headers={'X-Debug': '1'})
+
+        assert router.match(request).id == 'id2'
+        assert router.match(IncomingTestRequest('http://localhost/', '/endpoint', 'GET')).id == 'id1'
+
+    def test_invalid_route_order(self):
+        with pytest.raises(ValueError):
+            Router(route_order='random')
+
+    def test_match_skips_removed_route(self):
+        router = Router()
+        router.add_route({
+            'id': 'id1',
+            'path': '/endpoint',
+            'responses': [{'body': 'first'}]
+        })
+        route = router.add_route({
+            'id': 'id2',
+            'path': '/endpoint',
+            'responses': [{'body': 'second'}]
+        })
+        router.remove_route('id1')
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint',
+            method='GET'
+        )
+
+        assert router.match(request) is route
+
+    def test_match_is_cached(self):
+        router = Router()
+        route = router.add_route({
+            'path': '/endpoint',
+            'responses': [{'body': 'endpoint'}]
+        })
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint',
+            method='GET'
+        )
+
+        assert router.match(request) is route
+        assert router.match(request) is route
+        assert router.stats()['match_cache']['hits'] == 1
+        assert router.stats()['match_cache']['misses'] == 1
+
+    def test_missing_match_is_cached(self):
+        router = Router()
+        router.add_route({
+            'path': '/endpoint/\\d+',
+            'responses': [{'body': 'endpoint'}]
+        })
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint/name',
+            method='GET'
+        )
+
+        assert router.match(request) is None
+        assert router.match(request) is None
+        assert router.stats()['match_cache']['hits'] == 1
+
+    def test_match_cache_invalidated_by_new_route(self):
+        router = Router()
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint',
+            method='GET'
+        )
+        assert router.match(request) is None
+
+        route = router.add_route({
+            'path': '/endpoint',
+            'responses': [{'body': 'endpoint'}]
+        })
+        assert router.match(request) is route
+
+    def test_match_cache_invalidated_by_exhausted_route(self):
+        router = Router()
+        first = router.add_route({
+            'path': '/endpoint',
+            'responses': [{'body': 'first', 'repeat': 1}]
+        })
+        second = router.add_route({
+            'path': '/endpoint',
+            'responses': [{'body': 'second'}]
+        })
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint',
+            method='GET'
+        )
+        assert router.match(request) is first
+
+        first.use(first.select_response())
+        assert router.match(request) is second
+
+    def test_consume(self):
+        router = Router()
+        route = router.add_route({
+            'path': '/endpoint',
+            'responses': [{'body': 'first', 'repeat': 1}]
+        })
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint',
+            method='GET'
+        )
+        assert router.consume(request) is route.responses.items[0]
+        assert router.consume(request) is None
+
+    def test_consume_matches_again_when_route_is_exhausted_concurrently(self, mocker):
+        router = Router()
+        first = router.add_route({
+            'path': '/endpoint',
+            'responses': [{'body': 'first', 'repeat': 1}]
+        })
+        second = router.add_route({
+            'path': '/endpoint',
+            'responses': [{'body': 'second'}]
+        })
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint',
+            method='GET'
+        )
+        match = router.match
+
+        def match_and_exhaust_first(incoming_request):
+            route = match(incoming_request)
+            if route is first and first.is_active:
+                first.consume()
+            return route
+
+        mocker.patch.object(router, 'match', side_effect=match_and_exhaust_first)
+        assert router.consume(request) is second.responses.items[0]
+        assert router.match.call_count == 2
+
+    def test_consume_doesnt_retry_route_without_response(self, mocker):
+        router = Router()
+        route = router.add_route({
+            'path': '/endpoint',
+            'responses': [{'body': 'first'}]
+        })
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint',
+            method='GET'
+        )
+        mocker.patch.object(route, 'consume', return_value=None)
+        assert router.consume(request) is None
+        assert route.consume.call_count == 1
+
+    def test_match_depending_on_conditions_is_not_cached(self):
+        router = Router()
+        acme = router.add_route({
+            'path': '/endpoint',
+            'conditions': {'headers': {'X-Tenant': 'acme'}},
+            'responses': [{'body': 'acme'}]
+        })
+        default = router.add_route({'path': '/endpoint', 'responses': [{'body': 'default'}]})
+        other = router.add_route({'path': '/other', 'responses': [{'body': 'other'}]})
+
+        assert router.match(IncomingTestRequest('http://localhost/', '/endpoint', 'GET', {'X-Tenant': 'acme'})) is acme
+        assert router.match(IncomingTestRequest('http://localhost/', '/endpoint', 'GET')) is default
+        assert router.match(IncomingTestRequest('http://localhost/', '/other', 'GET')) is other
+        assert router.match(IncomingTestRequest('http://localhost/', '/other', 'GET')) is other
+        assert router.stats()['match_cache']['hits'] == 1
+        assert router.stats()['match_cache']['misses'] == 1
+
+    def test_match_cache_disabled(self):
+        router = Router(match_cache_size=0)
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint',
+            method='GET'
+        )
+        router.match(request)
+        router.match(request)
+        assert router.stats()['match_cache']['hits'] == 0
+
+    def test_match_rejected_by_prefix_filter(self):
+        router = Router()
+        router.add_route({
+            'path': '/endpoint',
+            'responses': [{'body': 'endpoint'}]
+        })
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/other',
+            method='GET'
+        )
+
+        assert router.match(request) is None
+        assert router.stats()['prefix_filter']['rejections'] == 1
+        assert router.stats()['match_cache']['misses'] == 0
+
+    def test_prefix_filter_updated_with_routes(self):
+        router = Router()
+        router.add_route({
+            'id': 'id1',
+            'path': '/endpoint',
+            'responses': [{'body': 'endpoint'}]
+        })
+        route = router.update_route({
+            'path': '/other',
+            'responses': [{'body': 'other'}]
+        }, 'id1')
+        assert router.stats()['prefix_filter']['prefixes'] == 1
+
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/other',
+            method='GET'
+        )
+        assert router.match(request) is route
+
+        router.remove_route('id1')
+        assert router.stats()['prefix_filter']['prefixes'] == 0
+
+    def test_exhausted_route_is_retired(self):
+        router = Router()
+        route = router.add_route({
+            'id': 'id1',
+            'path': '/endpoint',
+            'responses': [{'body': 'endpoint', 'repeat': 1}]
+        })
+        route.use(route.select_response())
+
+        assert router.stats()['routes']['retired'] == 1
+        assert list(router.table.index.candidates('GET', '/endpoint')) == []
+        assert router.get_route('id1') is route
+
+    def test_quarantined_route_is_retired(self, mocker):
+        router = Router(match_time_budget=0.1)
+        route = router.add_route({'id': 'id1', 'path': '/endpoint|/other', 'responses': [{'body': ''}]})
+        assert route.match_time_budget == 0.1
+        route.slow_matches = Route.quarantine_after - 1
+        mocker.patch('trickster.routing.router.time.thread_time', side_effect=[1.0, 1.5])
+
+        assert router.match(IncomingTestRequest('http://localhost/', '/endpoint', 'GET')) is route
+        assert router.match(IncomingTestRequest('http://localhost/', '/endpoint', 'GET')) is None
+        assert router.stats()['routes']['quarantined'] == 1
+        assert router.stats()['routes']['retired'] == 1
+
+    def test_route_with_invalid_path_is_rejected(self):
+        router = Router()
+        with pytest.raises(RouteConfigurationError, match='Path "/\\(" is not a valid regex'):
+            router.add_route({'id': 'id1', 'path': '/(', 'responses': [{'body': ''}]})
+        assert router.get_route('id1') is None
+
+    def test_unsafe_route_is_rejected(self):
+        router = Router()
+        with pytest.raises(UnsafePathError):
+            router.add_route({'id': 'id1', 'path': '/(a+)+$', 'responses': [{'body': ''}]})
+        assert router.get_route('id1') is None
+
+    def test_inactive_route_is_retired_when_added(self):
+        router = Router()
+        router.add_route({
+            'id': 'id1',
+            'path': '/endpoint',
+            'responses': []
+        })
+
+        assert router.stats()['routes']['retired'] == 1
+        assert list(router.table.index.candidates('GET', '/endpoint')) == []
+
+    def test_retired_route_can_be_removed(self):
+        router = Router()
+        route = router.add_route({
+            'id': 'id1',
+            'path': '/endpoint',
+            'responses': [{'body': 'endpoint', 'repeat': 1}]
+        })
+        route.use(route.select_response())
+        router.remove_route('id1')
+
+        assert router.stats()['routes']['retired'] == 0
+        assert router.get_route('id1') is None
+
+    def test_updated_retired_route_keeps_position(self):
+        router = Router()
+        route = router.add_route({
+            'id': 'id1',
+            'path': '/endpoint',
+            'responses': [{'body': 'first', 'repeat': 1}]
+        })
+        router.add_route({
+            'id': 'id2',
+            'path': '/endpoint',
+            'responses': [{'body': 'second'}]
+        })
+        route.use(route.select_response())
+        updated = router.update_route({
+            'path': '/endpoint',
+            'responses': [{'body': 'updated'}]
+        }, 'id1')
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint',
+            method='GET'
+        )
+
+        assert router.stats()['routes']['retired'] == 0
+        assert router.match(request) is updated
+
+    def test_exhausting_replaced_route_doesnt_retire_new_route(self):
+        router = Router()
+        original = router.add_route({
+            'id': 'id1',
+            'path': '/endpoint',
+            'responses': [{'body': 'first', 'repeat': 1}]
+        })
+        router.update_route({
+            'path': '/endpoint',
+            'responses': [{'body': 'updated', 'repeat': 1}]
+        }, 'id1')
+        original.use(original.select_response())
+
+        assert router.stats()['routes']['retired'] == 0
+
+    def test_change_doesnt_modify_current_table(self):
+        router = Router()
+        router.add_route({'id': 'id1', 'path': '/endpoint', 'responses': [{'body': 'first'}]})
+        table = router.table
+        router.add_route({'id': 'id2', 'path': '/other', 'responses': [{'body': 'second'}]})
+        router.remove_route('id1')
+
+        assert [route.id for route in table.routes] == ['id1']
+        assert [route.id for route in router.routes] == ['id2']
+        assert router.table is not table
+
+    def test_exhausted_route_is_removed_from_index(self):
+        router = Router()
+        routes = [
+            router.add_route({'path': f'/endpoint{i}', 'responses': [{'body': '', 'repeat': 1}]})
+            for i in range(16)
+        ]
+        table = router.table
+
+        routes[0].consume()
+        assert routes[0].id not in router.table.index.entries_by_id
+        assert routes[0].id in table.index.entries_by_id
+        assert router.table.match_cache is table.match_cache
+        assert router.stats()['routes']['retired'] == 1
+
+        router.remove_route(routes[0].id)
+        assert router.stats()['routes']['retired'] == 0
+
+    def test_change_updates_copy_of_index(self):
+        router = Router()
+        first = router.add_route({'path': '/endpoint', 'responses': [{'body': 'first'}]})
+        index = router.table.index
+        second = router.add_route({'path': '/endpoint', 'priority': 1, 'responses': [{'body': 'second'}]})
+        router.remove_route(first.id)
+        third = router.add_route({'path': '/endpoint', 'priority': 1, 'responses': [{'body': 'third'}]})
+
+        assert list(router.table.index.candidates('GET', '/endpoint')) == [second, third]
+        assert list(index.candidates('GET', '/endpoint')) == [first]
+
+    @pytest.mark.parametrize('index', RouteIndex.names())
+    def test_change_keeps_previous_table(self, index):
+        router = Router(index)
+        paths = ['/users', '/users/list$', '/users/\\d+', '/orders/list$', '.*']
+        router.add_routes([
+            {'id': f'route{i}', 'path': path, 'responses': [{'body': path}]}
+            for i, path in enumerate(paths)
+        ])
+        router.add_routes([
+            {'id': f'tenant{i}', 'path': path, 'conditions': {'headers': {'X-Tenant': 'acme'}}, 'responses': [{'body': ''}]}
+            for i, path in enumerate(paths)
+        ])
+        requests = [
+            IncomingTestRequest('http://localhost/', path, 'GET', headers=headers)
+            for path in ['/users', '/users/list', '/users/1', '/orders/list', '/other']
+            for headers in [{}, {'X-Tenant': 'acme'}]
+        ]
+        table = router.table
+        matched = [table.match(request) for request in requests]
+
+        router.remove_route('route1')
+        router.update_route({'path': '/orders', 'responses': [{'body': ''}]}, 'tenant3')
+        router.move_route('route4', 0)
+        router.add_route({'path': '/users/1$', 'priority': 1, 'responses': [{'body': ''}]})
+
+        assert [table.match(request) for request in requests] == matched
+        assert [route.id for route in table.routes] == [
+            *(f'route{i}' for i in range(5)), *(f'tenant{i}' for i in range(5))
+        ]
+        assert [router.match(request).id for request in requests[:2]] == ['route4', 'route4']
+
+    def test_new_table_keeps_statistics(self):
+        router = Router()
+        router.add_route({'id': 'id1', 'path': '/endpoint', 'responses': [{'body': ''}]})
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint',
+            method='GET'
+        )
+        router.match(request)
+        router.match(request)
+        router.add_route({'id': 'id2', 'path': '/other', 'responses': [{'body': ''}]})
+
+        assert router.stats()['match_cache']['hits'] == 1
+        assert router.stats()['match_cache']['misses'] == 1
+        assert router.stats()['match_cache']['size'] == 0
+
+    def test_compile_doesnt_change_routes(self):
+        router = Router()
+        routes = [{'path': '/endpoint', 'responses': [{'body': 'endpoint'}]}]
+        snapshot = router.compile(routes)
+
+        assert routes == [{'path': '/endpoint', 'responses': [{'body': 'endpoint'}]}]
+        assert len(snapshot.routes) == 1
+        assert len(router.routes) == 0
+
+    def test_compile_duplicate_routes_raises_exception(self):
+        router = Router()
+        with pytest.raises(DuplicateRouteError):
+            router.compile([
+                {'id': 'id1', 'path': '/endpoint', 'responses': []},
+                {'id': 'id1', 'path': '/other', 'responses': []}
+            ])
+
+    def test_lazy_router_compiles_lazy_routes(self):
+        router = Router(lazy=True)
+        snapshot = router.compile([
+            {'id': 'id1', 'path': '/endpoint1', 'responses': [{'body': '', 'repeat': 1}]},
+            {'id': 'id2', 'path': '/endpoint2', 'responses': [{'body': ''}]}
+        ])
+        router.restore(snapshot)
+        assert router.stats()['routes']['materialized'] == 0
+
+        request = IncomingTestRequest(base_url='http://localhost/', full_path='/endpoint1', method='GET')
+        assert router.match(request).consume()
+        assert router.match(request) is None
+        assert router.stats()['routes'] == {'total': 2, 'retired': 1, 'materialized': 1, 'quarantined': 0}
+        assert not any(route.is_materialized for route in snapshot.routes)
+
+    def test_lazy_router_keeps_response_ids_after_restore(self):
+        router = Router(lazy=True)
+        snapshot = router.compile([{'id': 'id1', 'path': '/endpoint', 'responses': [{'body': ''}]}])
+
+        router.restore(snapshot)
+        response_id = router.get_route('id1').responses.items[0].id
+        router.restore(snapshot)
+
+        assert router.get_route('id1').responses.items[0].id == response_id
+
+    def test_restore_snapshot_with_fresh_counters(self):
+        router = Router()
+        snapshot = router.compile([{'id': 'id1', 'path': '/endpoint', 'responses': [{'body': '', 'repeat': 1}]}])
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint',
+            method='GET'
+        )
+
+        router.restore(snapshot)
+        assert router.match(request).consume()
+        assert router.match(request) is None
+
+        router.restore(snapshot)
+        route = router.match(request)
+        assert route.used_count == 0
+        assert route is not snapshot.routes.get('id1')
+        assert snapshot.routes.get('id1').used_count == 0
+
+    def test_saved_snapshot_keeps_usage(self):
+        router = Router()
+        route = router.add_route({
+            'id': 'id1',
+            'path': '/endpoint',
+            'response_selection': 'cycle',
+            'responses': [{'id': 'response1', 'body': ''}, {'id': 'response2', 'body': '', 'repeat': 2}]
+        })
+        route.consume()
+        router.save_snapshot('checkpoint')
+        route.consume()
+        router.remove_route('id1')
+
+        router.restore_snapshot('checkpoint')
+        restored = router.get_route('id1')
+        assert restored.used_count == 1
+        assert [response.used_count for response in restored.responses] == [1, 0]
+        assert restored.consume().id == 'response2'
+        assert restored.on_exhausted == router.retire
+
+    def test_restore_missing_snapshot_raises_exception(self):
+        router = Router()
+        with pytest.raises(MissingSnapshotError):
+            router.restore_snapshot('missing')
+
+    def test_add_routes(self):
+        router = Router()
+        router.add_route({'id': 'id1', 'path': '/endpoint1', 'responses': [{'body': ''}]})
+        table = router.table
+
+        added = router.add_routes([
+            {'id': 'id2', 'path': '/endpoint2', 'responses': [{'body': ''}]},
+            {'path': '/endpoint3', 'responses': [{'body': ''}]}
+        ])
+
+        assert [route.id for route in router.routes] == ['id1', 'id2', added[1].id]
+        assert router.table is not table
+        request = IncomingTestRequest(
+            base_url='http://localhost/',
+            full_path='/endpoint3',
+            method='GET'
+        )
+        assert router.match(request) is added[1]
+
+    def test_add_routes_adds_none_if_any_is_invalid(self):
+        router = Router()
+        router.add_route({'id': 'id1', 'path': '/endpoint1', 'responses': [{'body': ''}]})
+
+        with pytest.raises(InvalidRoutesError) as error:
+            router.add_routes([
+                {'id': 'id2', 'path': '/endpoint2', 'responses': [{'body': ''}]},
+                {'id': 'id1', 'path': '/endpoint1', 'responses': [{'body': ''}]},
+                {'id': 'id2', 'path': '/endpoint2', 'responses': [{'body': ''}]},
+                {'path': '/endpoint3', 'responses': [{'body': '', 'delay': [2, 1]}]}
+            ])
+
+        assert list(error.value.errors) == [1, 2, 3]
+        assert error.value.errors[1] == 'Route id "id1" already exists.'
+        assert [route.id for route in router.routes] == ['id1']
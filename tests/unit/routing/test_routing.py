@@ -124,12 +124,12 @@ class TestResponse:
     def test_serialize_body_returns_strings_as_inserted(self):
         context = ResponseContext({})
         response = Response('string', Delay())
-        response.serialize_body(context) == 'string'
+        assert response.serialize_body(context) == 'string'
 
     def test_serialize_body_returns_json_as_string(self):
         context = ResponseContext({})
-        response = Response('id', {'key': 'value'}, Delay())
-        response.serialize_body(context) == '{"key": "value"}'
+        response = Response({'key': 'value'}, Delay())
+        assert response.serialize_body(context) == '{"key": "value"}'
 
     def test_serialize_deserialize_complete(self):
         response = Response.deserialize({
@@ -166,6 +166,31 @@ class TestResponse:
         assert flask_response.status_code == 200
         assert flask_response.data == b'{"key": "value"}'
         assert flask_response.headers['header'] == 'header_value'
+        assert flask_response.headers['content-length'] == '16'
+
+    def test_render(self):
+        response = Response({'key': 'value'}, Delay(), headers={'content-type': 'application/json'})
+        assert response.content == b'{"key": "value"}'
+        assert response.content_headers == [('content-type', 'application/json'), ('Content-Length', '16')]
+
+    def test_render_keeps_content_length_header(self):
+        response = Response('string', Delay(), headers={'content-length': 3})
+        assert response.content == b'string'
+        assert response.content_headers == [('content-length', '3')]
+
+    def test_render_encodes_unicode(self):
+        response = Response('žluťoučký', Delay())
+        assert response.content == 'žluťoučký'.encode('utf-8')
+        assert response.content_headers == [('Content-Length', str(len(response.content)))]
+
+    def test_as_flask_response_reuses_rendered_content(self):
+        context = ResponseContext({})
+        response = Response('string', Delay(), headers={'header': 'header_value'})
+
+        first = response.as_flask_response(context)
+        second = response.as_flask_response(context)
+        assert first.data == second.data == b'string'
+        assert response.content_headers == [('header', 'header_value'), ('Content-Length', '6')]
 
 
 @pytest.mark.unit
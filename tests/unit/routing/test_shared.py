@@ -0,0 +1,418 @@
+import collections
+import multiprocessing
+
+import pytest
+
+from trickster.routing import InvalidRoutesError, MissingSnapshotError, SharedStateFullError
+from trickster.routing.input import IncomingTestRequest
+from trickster.routing.shared import SharedRouter, SharedState
+
+
+def request(path, method='GET'):
+    return IncomingTestRequest('http://localhost/', path, method)
+
+
+@pytest.fixture
+def state_path(tmp_path):
+    return tmp_path / 'state'
+
+
+@pytest.fixture
+def create_router(state_path):
+    def create(size=1000):
+        router = SharedRouter(SharedState(state_path, size))
+        router.initialize()
+        return router
+    return create
+
+
+def consume_all(state_path, path, start, queue):
+    """Consume responses from separate process until no route matches."""
+    router = SharedRouter(SharedState(state_path, 10000))
+    router.initialize()
+    start.wait()
+    served = []
+    while route := router.match(request(path)):
+        if response := route.consume():
+            served.append(response.id)
+    queue.put(served)
+
+
+@pytest.mark.unit
+class TestSharedState:
+    def test_counters_are_shared(self, state_path):
+        state1 = SharedState(state_path, 10)
+        state2 = SharedState(state_path, 10)
+
+        state1.counter(3).add(5)
+        assert state2.counter(3).get() == 5
+        assert state2.counter(4).get() == 0
+
+    def test_allocate(self, state_path):
+        state = SharedState(state_path, 10)
+        assert state.allocate(4) == 0
+        assert state.allocate(6) == 4
+        with pytest.raises(SharedStateFullError):
+            state.allocate(1)
+
+        state.clear()
+        assert state.allocate(1) == 0
+
+    def test_clear_increments_epoch(self, state_path):
+        state1 = SharedState(state_path, 10)
+        state2 = SharedState(state_path, 10)
+        state1.clear()
+        assert state2.epoch.get() == 1
+
+    def test_publish_and_load(self, state_path):
+        state1 = SharedState(state_path, 10)
+        state2 = SharedState(state_path, 10)
+        assert state2.load() == []
+
+        assert state1.publish([{'slot': 0, 'route': {'id': 'id'}}]) == 1
+        assert state2.generation.get() == 1
+        assert state2.load() == [{'slot': 0, 'route': {'id': 'id'}}]
+
+    def test_publish_and_load_changes(self, state_path):
+        state1 = SharedState(state_path, 10)
+        state2 = SharedState(state_path, 10)
+        assert state2.load_changes() == ([], 0)
+
+        generation, offset = state1.publish_changes([{'action': 'remove', 'id': 'id1'}])
+        assert generation == 1
+        assert state1.publish_changes([{'action': 'remove', 'id': 'id2'}])[0] == 2
+        assert state2.load_changes() == ([{'action': 'remove', 'id': 'id1'}, {'action': 'remove', 'id': 'id2'}], offset * 2)
+        assert state2.load_changes(offset) == ([{'action': 'remove', 'id': 'id2'}], offset * 2)
+
+        assert state1.publish([]) == 3
+        assert state2.base.get() == 3
+        assert state2.load_changes() == ([], 0)
+
+    def test_remove(self, state_path):
+        state = SharedState(state_path, 10)
+        state.publish([])
+        SharedState.remove(state_path)
+
+        assert not state_path.exists()
+        assert not SharedState.get_definitions_path(state_path).exists()
+        assert not SharedState.get_changes_path(state_path).exists()
+        SharedState.remove(state_path)
+
+    def test_remove_snapshots(self, state_path):
+        state = SharedState(state_path, 10)
+        state.save_snapshot('checkpoint', [])
+        SharedState.remove(state_path)
+
+        assert not SharedState.get_snapshot_path(state_path, 'checkpoint').exists()
+
+    def test_load_missing_snapshot(self, state_path):
+        state = SharedState(state_path, 10)
+        with pytest.raises(MissingSnapshotError):
+            state.load_snapshot('missing')
+
+    def test_route_locks_share_thread_lock(self, state_path):
+        state = SharedState(state_path, 10)
+        assert state.route_lock(2).thread_lock is state.route_lock(2).thread_lock
+        assert state.route_lock(2).thread_lock is not state.route_lock(3).thread_lock
+
+        with state.route_lock(2):
+            assert not state.route_lock(2).thread_lock.acquire(blocking=False)
+
+
+@pytest.mark.unit
+class TestSharedRouter:
+    def test_added_route_is_visible_to_other_router(self, create_router):
+        router1 = create_router()
+        router2 = create_router()
+
+        router1.add_route({'id': 'route', 'path': '/path', 'responses': [{'id': 'response', 'body': ''}]})
+
+        assert router2.match(request('/path')).id == 'route'
+        assert [route['id'] for route in router2.serialize()] == ['route']
+        assert router2.get_route('route').get_response('response')
+
+    def test_usage_is_shared(self, create_router):
+        router1 = create_router()
+        router1.add_route({'id': 'route', 'path': '/path', 'responses': [{'body': '', 'repeat': 2}]})
+        router2 = create_router()
+
+        assert router1.match(request('/path')).consume()
+        assert router2.match(request('/path')).consume()
+        assert router1.match(request('/path')) is None
+        assert router2.match(request('/path')) is None
+        assert router2.get_route('route').used_count == 2
+        assert router2.get_route('route').responses.items[0].used_count == 2
+
+    def test_exhausted_cached_route_is_matched_again(self, create_router):
+        router1 = create_router()
+        router1.add_route({'id': 'route1', 'path': '/path', 'responses': [{'body': '', 'repeat': 1}]})
+        router1.add_route({'id': 'route2', 'path': '/path', 'responses': [{'body': ''}]})
+        router2 = create_router()
+        assert router2.match(request('/path')).id == 'route1'
+
+        router1.match(request('/path')).consume()
+
+        assert router2.match(request('/path')).id == 'route2'
+
+    def test_update_route_keeps_order(self, create_router):
+        router1 = create_router()
+        router1.add_route({'id': 'route1', 'path': '/path', 'responses': [{'body': ''}]})
+        router1.add_route({'id': 'route2', 'path': '/path', 'responses': [{'body': ''}]})
+        router2 = create_router()
+
+        router2.update_route({'id': 'updated', 'path': '/path', 'responses': [{'body': ''}]}, 'route1')
+
+        assert [route['id'] for route in router1.serialize()] == ['updated', 'route2']
+        assert router1.match(request('/path')).id == 'updated'
+
+    def test_added_routes_are_visible_to_other_router(self, create_router):
+        router1 = create_router()
+        router2 = create_router()
+
+        router1.add_routes([
+            {'id': 'route1', 'path': '/path1', 'responses': [{'body': ''}]},
+            {'id': 'route2', 'path': '/path2', 'responses': [{'body': ''}]}
+        ])
+
+        assert [route['id'] for route in router2.serialize()] == ['route1', 'route2']
+        assert router2.match(request('/path2')).id == 'route2'
+
+    def test_moved_route_is_visible_to_other_router(self, create_router):
+        router1 = create_router()
+        router1.add_route({'id': 'route1', 'path': '/path', 'responses': [{'body': ''}]})
+        router1.add_route({'id': 'route2', 'path': '/path', 'responses': [{'body': ''}]})
+        router2 = create_router()
+
+        router2.move_route('route2', 0)
+
+        assert [route['id'] for route in router1.serialize()] == ['route2', 'route1']
+        assert router1.match(request('/path')).id == 'route2'
+
+    def test_route_conditions_are_shared(self, create_router):
+        router1 = create_router()
+        router2 = create_router()
+
+        router1.add_route({
+            'id': 'route',
+            'path': '/path',
+            'conditions': {'headers': {'X-Tenant': 'acme'}},
+            'responses': [{'body': ''}]
+        })
+
+        assert router2.match(IncomingTestRequest('http://localhost/', '/path', 'GET', {'X-Tenant': 'acme'})).id == 'route'
+        assert router2.match(request('/path')) is None
+
+    def test_remove_route(self, create_router):
+        router1 = create_router()
+        router1.add_route({'id': 'route', 'path': '/path', 'responses': [{'body': ''}]})
+        router2 = create_router()
+
+        router2.remove_route('route')
+
+        assert router1.get_route('route') is None
+        assert router1.match(request('/path')) is None
+
+    def test_reset_releases_counters(self, create_router):
+        router = create_router(size=4)
+        router.add_route({'path': '/path', 'responses': [{'body': ''}, {'body': ''}]})
+        with pytest.raises(SharedStateFullError):
+            router.add_route({'path': '/path', 'responses': [{'body': ''}]})
+
+        router.reset([{'path': '/path', 'responses': [{'body': ''}]}])
+        assert len(router.routes) == 1
+        assert router.stats()['shared_state']['counters'] == 3
+
+    def test_other_router_applies_changes(self, create_router):
+        router1 = create_router()
+        router1.add_routes([
+            {'id': f'route{index}', 'path': f'/path{index}', 'responses': [{'body': ''}]} for index in range(4)
+        ])
+        router2 = create_router()
+        route1 = router2.get_route('route1')
+
+        router1.add_route({'id': 'route4', 'path': '/path4', 'responses': [{'body': ''}]})
+        router1.remove_route('route0')
+
+        assert router1.state.base.get() < router1.state.generation.get()
+        assert router2.get_route('route1') is route1
+        assert [route.id for route in router2.routes] == ['route1', 'route2', 'route3', 'route4']
+        assert router2.match(request('/path4')).id == 'route4'
+        assert router2.match(request('/path0')) is None
+
+    def test_definitions_are_published_when_there_are_more_changes_than_routes(self, create_router):
+        router1 = create_router()
+        router1.add_route({'id': 'route', 'path': '/path', 'responses': [{'body': ''}]})
+        router2 = create_router()
+
+        router1.move_route('route', 0)
+        assert router1.state.base.get() == router1.state.generation.get()
+        router1.move_route('route', 0)
+        assert router1.state.base.get() == router1.state.generation.get() - 1
+        assert len(router1.state.load_changes()[0]) == 1
+        router1.move_route('route', 0)
+        assert router1.state.base.get() == router1.state.generation.get()
+        assert router1.state.load_changes() == ([], 0)
+        assert router2.get_route('route').id == 'route'
+
+    def test_stale_route_doesnt_use_released_counters(self, create_router):
+        router1 = create_router()
+        router1.add_route({'id': 'route', 'path': '/path', 'responses': [{'body': 'old', 'repeat': 2}]})
+        router2 = create_router()
+        stale = router2.match(request('/path'))
+
+        router1.reset([{'id': 'new', 'path': '/path', 'responses': [{'body': 'new', 'repeat': 1}]}])
+
+        assert stale.consume() is None
+        assert router1.get_route('new').used_count == 0
+        assert router2.consume(request('/path')).body == 'new'
+        assert router1.consume(request('/path')) is None
+
+    def test_failed_change_is_not_published(self, create_router):
+        router1 = create_router()
+        router1.add_route({'id': 'route', 'path': '/path', 'responses': [{'body': ''}]})
+        router2 = create_router()
+        generation = router1.state.generation.get()
+
+        with pytest.raises(Exception):
+            router1.add_route({'id': 'route', 'path': '/path', 'responses': [{'body': ''}]})
+
+        assert router1.state.generation.get() == generation
+        assert router1.state.next_slot.get() == 3
+        assert [route['id'] for route in router1.serialize()] == ['route']
+        assert [route['id'] for route in router2.serialize()] == ['route']
+
+    def test_invalid_routes_dont_allocate_counters(self, create_router):
+        router = create_router()
+
+        with pytest.raises(InvalidRoutesError):
+            router.add_routes([
+                {'id': 'valid', 'path': '/path', 'responses': [{'body': ''}]},
+                {'id': 'invalid', 'path': '/path', 'responses': [{'body': '', 'delay': [2, 1]}]}
+            ])
+        route = router.add_route({'id': 'route', 'path': '/path', 'responses': [{'body': ''}]})
+
+        assert router.state.next_slot.get() == 3
+        assert router.slots == {'route': 0}
+        assert [route.id for route in router.routes] == ['route']
+        assert router.consume(request('/path')) is route.responses.items[0]
+
+    def test_routes_that_dont_fit_are_not_added(self, create_router):
+        router = create_router(size=8)
+
+        with pytest.raises(SharedStateFullError):
+            router.add_routes([{'path': f'/path{index}', 'responses': [{'body': ''}]} for index in range(3)])
+        router.add_routes([{'path': f'/path{index}', 'responses': [{'body': ''}]} for index in range(2)])
+
+        assert len(router.routes) == 2
+        assert router.state.next_slot.get() == 6
+
+    def test_failed_change_restores_routes(self, create_router, monkeypatch):
+        router1 = create_router()
+        router1.add_route({'id': 'route', 'path': '/path', 'responses': [{'body': ''}]})
+        router2 = create_router()
+
+        def fail(changes):
+            raise OSError('Disk full')
+
+        with monkeypatch.context() as patch:
+            patch.setattr(router1.state, 'publish', fail)
+            patch.setattr(router1.state, 'publish_changes', fail)
+            with pytest.raises(OSError):
+                router1.update_route({'id': 'updated', 'path': '/updated', 'responses': [{'body': ''}]}, 'route')
+            with pytest.raises(OSError):
+                router1.remove_route('route')
+
+        assert [route.id for route in router1.routes] == ['route']
+        assert router1.match(request('/path')).id == 'route'
+        assert router1.match(request('/updated')) is None
+        assert list(router1.definitions) == list(router1.slots) == ['route']
+        router1.add_route({'id': 'other', 'path': '/other', 'responses': [{'body': ''}]})
+        assert [route['id'] for route in router2.serialize()] == ['route', 'other']
+
+    def test_reset_that_doesnt_fit_keeps_routes(self, create_router):
+        router1 = create_router(size=4)
+        router1.add_route({'id': 'route', 'path': '/path', 'responses': [{'body': 'old'}]})
+        router2 = create_router(size=4)
+
+        with pytest.raises(SharedStateFullError):
+            router1.reset([{'path': '/path', 'responses': [{'body': ''}, {'body': ''}, {'body': ''}]}])
+
+        assert router1.consume(request('/path')).body == 'old'
+        assert [route['id'] for route in router2.serialize()] == ['route']
+
+    def test_initialize_keeps_existing_routes(self, state_path):
+        default_routes = [{'id': 'default', 'path': '/default', 'responses': [{'body': ''}]}]
+        router1 = SharedRouter(SharedState(state_path, 1000))
+        router1.initialize(router1.compile(default_routes))
+        router1.add_route({'id': 'route', 'path': '/path', 'responses': [{'body': ''}]})
+        router1.match(request('/path')).consume()
+
+        router2 = SharedRouter(SharedState(state_path, 1000))
+        router2.initialize(router2.compile(default_routes))
+
+        assert [route.id for route in router2.routes] == ['default', 'route']
+        assert router2.get_route('route').used_count == 1
+
+    def test_restore_compiled_routes(self, create_router):
+        router1 = create_router()
+        router2 = create_router()
+        snapshot = router1.compile([{'id': 'route', 'path': '/path', 'responses': [{'body': '', 'repeat': 1}]}])
+
+        router1.restore(snapshot)
+        assert router2.match(request('/path')).consume()
+        router1.restore(snapshot)
+
+        assert router2.get_route('route').used_count == 0
+        assert router2.match(request('/path')).consume()
+
+    def test_snapshot_saved_by_other_router_is_restored(self, create_router):
+        router1 = create_router()
+        router1.add_route({'id': 'route', 'path': '/path', 'responses': [{'id': 'response', 'body': '', 'repeat': 2}]})
+        router1.match(request('/path')).consume()
+        router1.save_snapshot('checkpoint')
+        router1.match(request('/path')).consume()
+        router1.reset()
+        router2 = create_router()
+
+        router2.restore_snapshot('checkpoint')
+
+        route = router1.get_route('route')
+        assert route.used_count == 1
+        assert route.get_response('response').used_count == 1
+        assert router1.match(request('/path')).consume()
+        assert router2.match(request('/path')) is None
+
+    def test_stats(self, create_router):
+        router = create_router()
+        router.add_route({'path': '/path', 'responses': [{'body': ''}, {'body': ''}]})
+
+        assert router.stats()['shared_state'] == {
+            'generation': router.state.generation.get(),
+            'counters': 4,
+            'max_counters': 1000
+        }
+
+    def test_processes_use_responses_exactly_repeat_times(self, state_path, create_router):
+        router = create_router(size=10000)
+        for i in range(20):
+            router.add_route({
+                'id': f'route{i}',
+                'path': '/path',
+                'response_selection': 'cycle',
+                'responses': [{'id': f'route{i}-response{j}', 'body': '', 'repeat': j + 1} for j in range(20)]
+            })
+
+        context = multiprocessing.get_context('fork')
+        start = context.Event()
+        queue = context.Queue()
+        processes = [context.Process(target=consume_all, args=(state_path, '/path', start, queue)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        start.set()
+        results = [queue.get(timeout=60) for _ in processes]
+        for process in processes:
+            process.join()
+
+        served = collections.Counter(response_id for result in results for response_id in result)
+        assert served == {f'route{i}-response{j}': j + 1 for i in range(20) for j in range(20)}
+        assert all(route.used_count == 210 for route in router.routes)
@@ -1,8 +1,15 @@
+import json
+
 import pytest
 
-from werkzeug.exceptions import BadRequest
+from werkzeug.exceptions import BadRequest, HTTPException
 
+from trickster import loader
 from trickster.api_app import http_error_handler, ApiApp
+from trickster.compiled import compile_routes
+from trickster.config import Config
+from trickster.routing.router import LazyRoute, RouteOrder, Router
+from trickster.routing.shared import SharedRouter
 
 
 @pytest.mark.unit
@@ -17,4 +24,111 @@ class TestHttpErrorHandler:
             assert response.get_json() == {
                 'error': 'Bad Request',
                 'message': 'Received invalid request.'
-            }
\ No newline at end of file
+            }
+
+@pytest.mark.unit
+class TestApiApp:
+    def test_creates_local_router(self, app):
+        assert type(app.user_router) is Router
+
+    def test_creates_lazy_router(self):
+        app = ApiApp(Config(lazy_routes=True))
+        assert app.user_router.route_type is LazyRoute
+
+    @pytest.mark.parametrize('budget, seconds', [(250, 0.25), (0, None)])
+    def test_router_match_time_budget(self, budget, seconds):
+        app = ApiApp(Config(match_time_budget=budget))
+        assert app.user_router.match_time_budget == seconds
+
+    def test_router_route_order(self):
+        app = ApiApp(Config(route_order='specificity'))
+        assert app.user_router.route_order is RouteOrder.specificity
+
+    def test_creates_shared_router(self, tmp_path):
+        app = ApiApp(Config(shared_state_path=str(tmp_path / 'state'), shared_state_size=10))
+        assert isinstance(app.user_router, SharedRouter)
+        assert app.user_router.state.size == 10
+
+    @pytest.mark.parametrize('path, method, external', [
+        ('/path', 'GET', True),
+        ('/path/with//slashes/', 'DELETE', True),
+        ('/internal/health', 'GET', False),
+        ('/internal/custom', 'GET', True),
+        ('/internal', 'GET', True),
+        ('/internal/routes', 'PUT', True),
+        ('/', 'GET', False),
+        ('/path', 'PROPFIND', False),
+        ('/static/file.txt', 'GET', False)
+    ])
+    def test_is_external_matches_url_map(self, app, path, method, external):
+        try:
+            endpoint, _ = app.url_adapter.match(path, method)
+        except HTTPException:
+            endpoint = None
+
+        assert app.is_external(path, method) is external
+        assert (endpoint == 'external_api.respond') is external
+
+    def test_is_external_with_variable_first_segment(self, app):
+        app.add_url_rule('/<tenant>/health', 'tenant_health', lambda tenant: 'ok')
+        app.url_adapter = app.url_map.bind('localhost')
+        app.reserved_segments = app._reserved_segments()
+
+        assert app.reserved_segments is None
+        assert not app.is_external('/tenant/health', 'GET')
+        assert app.is_external('/tenant/other', 'GET')
+
+    def test_preload(self, app, mocker):
+        compile_json_schemas = mocker.patch('trickster.api_app.compile_json_schemas')
+        app.preload()
+        compile_json_schemas.assert_called_once_with()
+
+    def test_default_routes_are_compiled_once(self, tmp_path, mocker):
+        routes_path = tmp_path / 'routes.json'
+        routes_path.write_text(json.dumps([{'id': 'route', 'path': '/path', 'responses': [{'body': ''}]}]))
+        app = ApiApp(Config(routes_path=str(routes_path)))
+        spy = mocker.spy(loader, 'read_documents')
+
+        app.user_router.remove_route('route')
+        app.load_routes()
+
+        assert [route.id for route in app.user_router.routes] == ['route']
+        assert app.user_router.routes.get('route') is not app.default_routes.routes.get('route')
+        spy.assert_not_called()
+
+    def test_default_routes_are_loaded_from_fresh_snapshot(self, tmp_path, mocker):
+        routes_path = tmp_path / 'routes.json'
+        routes_path.write_text(json.dumps([{'id': 'route', 'path': '/path', 'responses': [{'body': ''}]}]))
+        snapshot_path = tmp_path / 'routes.snapshot'
+        compile_routes(str(routes_path), snapshot_path)
+        spy = mocker.spy(loader, 'read_documents')
+
+        app = ApiApp(Config(routes_path=str(routes_path), routes_snapshot_path=str(snapshot_path)))
+
+        assert [route.id for route in app.user_router.routes] == ['route']
+        spy.assert_not_called()
+
+    def test_default_routes_are_loaded_from_files_if_snapshot_is_stale(self, tmp_path):
+        routes_path = tmp_path / 'routes.json'
+        routes_path.write_text(json.dumps([{'id': 'route', 'path': '/path', 'responses': [{'body': ''}]}]))
+        snapshot_path = tmp_path / 'routes.snapshot'
+        compile_routes(str(routes_path), snapshot_path)
+        routes_path.write_text(json.dumps([{'id': 'changed', 'path': '/path', 'responses': [{'body': ''}]}]))
+
+        app = ApiApp(Config(routes_path=str(routes_path), routes_snapshot_path=str(snapshot_path)))
+
+        assert [route.id for route in app.user_router.routes] == ['changed']
+
+    def test_shared_router_loads_snapshot(self, tmp_path):
+        routes_path = tmp_path / 'routes.json'
+        routes_path.write_text(json.dumps([{'id': 'route', 'path': '/path', 'responses': [{'body': ''}]}]))
+        snapshot_path = tmp_path / 'routes.snapshot'
+        compile_routes(str(routes_path), snapshot_path)
+
+        app = ApiApp(Config(
+            routes_path=str(routes_path),
+            routes_snapshot_path=str(snapshot_path),
+            shared_state_path=str(tmp_path / 'state')
+        ))
+
+        assert [entry['route']['id'] for entry in app.user_router.state.load()] == ['route']
@@ -1,6 +1,8 @@
+import pickle
+
 import pytest
 
-from trickster.collections import IdItem, IdList
+from trickster.collections import CopyOnWriteDict, CopyOnWriteSortedDict, IdItem, IdList, LruCache, UsageCounter
 
 
 class Item(IdItem):
@@ -114,3 +116,314 @@ class TestIdList:
         item_list = IdList()
         with pytest.raises(KeyError):
             item_list.replace('id_doesnt_exist', Item('id1'))
+
+    def test_replace_with_existing_id_raises_exception(self):
+        item_list = IdList()
+        item_list.add(Item('id1'))
+        item_list.add(Item('id2'))
+        with pytest.raises(KeyError):
+            item_list.replace('id1', Item('id2'))
+
+    def test_replaced_item_can_be_found_by_new_id(self):
+        item_list = IdList()
+        item_list.add(Item('id1'))
+        item = Item('id2')
+        item_list.replace('id1', item)
+        assert 'id1' not in item_list
+        assert item_list.get('id2') is item
+        assert item_list.index('id2') == 0
+
+    def test_insert_item(self):
+        item_list = IdList()
+        item1 = Item('id1')
+        item2 = Item('id2')
+        item3 = Item('id3')
+        item_list.add(item1)
+        item_list.add(item3)
+        item_list.insert(1, item2)
+        assert item_list.items == [item1, item2, item3]
+        assert item_list.index('id2') == 1
+
+    def test_insert_item_to_beginning(self):
+        item_list = IdList()
+        item1 = Item('id1')
+        item2 = Item('id2')
+        item_list.add(item2)
+        item_list.insert(0, item1)
+        assert item_list.items == [item1, item2]
+
+    def test_insert_item_out_of_range(self):
+        item_list = IdList()
+        item1 = Item('id1')
+        item2 = Item('id2')
+        item_list.insert(-5, item1)
+        item_list.insert(10, item2)
+        assert item_list.items == [item1, item2]
+
+    def test_insert_duplicate_item_raises_exception(self):
+        item_list = IdList()
+        item_list.add(Item('id1'))
+        with pytest.raises(KeyError):
+            item_list.insert(0, Item('id1'))
+
+    def test_repeated_insert_to_same_position_preserves_order(self):
+        item_list = IdList()
+        item_list.add(Item('first'))
+        item_list.add(Item('last'))
+        items = [Item(f'id{i}') for i in range(50)]
+        for item in reversed(items):
+            item_list.insert(1, item)
+        assert item_list.items[1:-1] == items
+        assert [item_list.index(item.id) for item in items] == list(range(1, 51))
+
+    def test_move_item(self):
+        item_list = IdList()
+        item1 = Item('id1')
+        item2 = Item('id2')
+        item3 = Item('id3')
+        item_list.add(item1)
+        item_list.add(item2)
+        item_list.add(item3)
+        item_list.move('id3', 0)
+        assert item_list.items == [item3, item1, item2]
+        item_list.move('id3', 2)
+        assert item_list.items == [item1, item2, item3]
+
+    def test_order_keys_follow_order_of_items(self):
+        item_list = IdList()
+        for item_id in ['id1', 'id2', 'id3']:
+            item_list.add(Item(item_id))
+        item_list.move('id3', 1)
+        assert item_list.order_key('id1') < item_list.order_key('id3') < item_list.order_key('id2')
+        assert item_list.order_key('missing') is None
+
+    def test_insert_spreads_keys_of_items_around_full_gap(self):
+        item_list = IdList()
+        items = [Item(f'id{i}') for i in range(64)]
+        for item in items:
+            item_list.add(item)
+        for i in range(16):
+            assert item_list.insert(32, Item(f'new{i}')) == []
+        spread = item_list.insert(32, Item('new16'))
+
+        assert 0 < len(spread) < len(item_list) // 2
+        assert item_list.items[:32] == items[:32]
+        assert item_list.items[-32:] == items[32:]
+        keys = [item_list.order_key(item.id) for item in item_list]
+        assert keys == sorted(set(keys))
+        assert [item_list.index(item.id) for item in item_list] == list(range(len(item_list)))
+
+    def test_move_not_present_item_raises_exception(self):
+        item_list = IdList()
+        with pytest.raises(KeyError):
+            item_list.move('id1', 0)
+
+    def test_copy_is_independent(self):
+        item_list = IdList()
+        items = [Item(f'id{i}') for i in range(100)]
+        for item in items:
+            item_list.add(item)
+        copy = item_list.copy()
+        copy.remove('id0')
+        copy.move('id99', 0)
+        item_list.replace('id1', Item('replaced'))
+        assert item_list.items == [items[0], item_list.get('replaced'), *items[2:]]
+        assert copy.items == [items[99], *items[1:99]]
+        assert 'id0' not in copy
+        assert copy.index('id2') == 2
+        assert item_list.index('id99') == 99
+
+    def test_move_in_copy_shares_unchanged_chunks(self):
+        item_list = IdList()
+        for i in range(10000):
+            item_list.add(Item(f'id{i}'))
+        copy = item_list.copy()
+        copy.move('id9999', 5000)
+        shared = [chunk for chunk in copy._order.chunks if chunk in item_list._order.chunks]
+        assert len(shared) >= len(copy._order.chunks) - 2
+        assert copy.index('id9999') == 5000
+        assert item_list.index('id9999') == 9999
+
+    def test_delete_item_keeps_order(self):
+        item_list = IdList()
+        item1 = Item('id1')
+        item2 = Item('id2')
+        item3 = Item('id3')
+        item_list.add(item1)
+        item_list.add(item2)
+        item_list.add(item3)
+        item_list.remove('id2')
+        assert item_list.items == [item1, item3]
+        assert item_list.index('id3') == 1
+
+
+@pytest.mark.unit
+class TestCopyOnWriteDict:
+    def test_items(self):
+        owner = object()
+        items = CopyOnWriteDict(owner)
+        for i in range(100):
+            items[f'key{i}'] = i
+        del items['key0']
+        assert len(items) == 99
+        assert len(items.shards) == 16
+        assert items['key1'] == 1
+        assert items.get('key0') is None
+        assert 'key99' in items
+        assert sorted(items.values()) == list(range(1, 100))
+        assert dict(items.items()) == {f'key{i}': i for i in range(1, 100)}
+        with pytest.raises(KeyError):
+            del items['key0']
+
+    def test_edit_by_owner_changes_dictionary(self):
+        owner = object()
+        items = CopyOnWriteDict(owner)
+        assert items.edit(owner) is items
+
+    def test_edit_by_other_owner_copies_changed_shards(self):
+        items = CopyOnWriteDict(object())
+        for i in range(100):
+            items[i] = i
+        edited = items.edit(object())
+        edited[0] = 'changed'
+        del edited[1]
+        edited['new'] = 'new'
+        assert items[0] == 0 and 1 in items and 'new' not in items
+        assert edited[0] == 'changed' and 1 not in edited and edited['new'] == 'new'
+        assert sum(a is b for a, b in zip(items.shards, edited.shards)) >= len(items.shards) - 3
+
+    def test_edit_item(self):
+        owner = object()
+        items = CopyOnWriteDict(owner)
+        nested = items.edit_item('nested', CopyOnWriteDict)
+        nested['key'] = 'value'
+        edited = items.edit(object())
+        edited.edit_item('nested', CopyOnWriteDict)['key'] = 'changed'
+        assert items['nested'] is nested
+        assert nested['key'] == 'value'
+        assert edited['nested']['key'] == 'changed'
+
+    def test_pickle(self):
+        items = CopyOnWriteDict(object())
+        for i in range(100):
+            items[f'key{i}'] = i
+        items.shards.reverse()  # Keys hash differently in another process
+        items = pickle.loads(pickle.dumps(items))
+        assert all(items[f'key{i}'] == i for i in range(100))
+
+
+@pytest.mark.unit
+class TestCopyOnWriteSortedDict:
+    def test_items_are_sorted(self):
+        items = CopyOnWriteSortedDict(object())
+        for i in reversed(range(200)):
+            items[i] = str(i)
+        assert len(items) == 200
+        assert len(items.chunks) > 1
+        assert list(items) == list(range(200))
+        assert list(items.values()) == [str(i) for i in range(200)]
+        assert items.get(10) == '10'
+        assert items.get(1000) is None
+        assert 199 in items and -1 not in items
+
+    def test_delete_merges_chunks(self):
+        items = CopyOnWriteSortedDict(object())
+        for i in range(200):
+            items[i] = i
+        for i in range(0, 200, 3):
+            del items[i]
+        for i in range(1, 200, 3):
+            del items[i]
+        assert list(items.items()) == [(i, i) for i in range(2, 200, 3)]
+        assert items.maxes == [chunk.keys[-1] for chunk in items.chunks]
+        assert all(len(chunk.keys) >= items.min_chunk_size // 2 for chunk in items.chunks[:-1])
+        with pytest.raises(KeyError):
+            del items[0]
+
+    def test_positions(self):
+        items = CopyOnWriteSortedDict(object())
+        for i in range(200):
+            items[2 * i] = i
+        assert items.index(100) == 50
+        assert items.index(101) == 51
+        assert items.key_at(50) == 100
+        assert items.key_at(-1) == 398
+        assert items.keys_between(48, 52) == [96, 98, 100, 102]
+        with pytest.raises(IndexError):
+            items.key_at(200)
+
+    def test_edit_by_other_owner_copies_changed_chunks(self):
+        items = CopyOnWriteSortedDict(object())
+        for i in range(200):
+            items[i] = i
+        edited = items.edit(object())
+        edited[1000] = 1000
+        del edited[0]
+        assert list(items) == list(range(200))
+        assert list(edited) == [*range(1, 200), 1000]
+        assert edited.chunks[1:-1] == items.chunks[1:-1]
+
+
+@pytest.mark.unit
+class TestLruCache:
+    def test_get_missing_item(self):
+        cache = LruCache(2)
+        assert cache.get('key') is None
+        assert cache.get('key', 'default') == 'default'
+        assert cache.misses == 2
+
+    def test_get_present_item(self):
+        cache = LruCache(2)
+        cache.put('key', 'value')
+        assert cache.get('key') == 'value'
+        assert cache.hits == 1
+
+    def test_least_recently_used_item_is_evicted(self):
+        cache = LruCache(2)
+        cache.put('key1', 'value1')
+        cache.put('key2', 'value2')
+        cache.get('key1')
+        cache.put('key3', 'value3')
+        assert cache.get('key2') is None
+        assert cache.get('key1') == 'value1'
+        assert cache.get('key3') == 'value3'
+        assert cache.evictions == 1
+
+    def test_cache_with_zero_size_is_disabled(self):
+        cache = LruCache(0)
+        cache.put('key', 'value')
+        assert len(cache) == 0
+        assert cache.get('key') is None
+
+    def test_clear(self):
+        cache = LruCache(2)
+        cache.put('key', 'value')
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_serialize(self):
+        cache = LruCache(1)
+        cache.put('key1', 'value1')
+        cache.put('key2', 'value2')
+        cache.get('key1')
+        cache.get('key2')
+        assert cache.serialize() == {
+            'size': 1,
+            'max_size': 1,
+            'hits': 1,
+            'misses': 1,
+            'evictions': 1
+        }
+
+
+@pytest.mark.unit
+class TestUsageCounter:
+    def test_add(self):
+        counter = UsageCounter()
+        assert counter.get() == 0
+        assert counter.add() == 1
+        assert counter.add(-2) == -1
+        assert counter.get() == -1
+
+    def test_initial_value(self):
+        assert UsageCounter(5).get() == 5
@@ -0,0 +1,92 @@
+import json
+import pickle
+
+import pytest
+
+from trickster import compiled
+from trickster.compiled import compile_routes, hash_file, load_compiled_routes
+
+
+@pytest.fixture
+def routes_path(tmp_path):
+    path = tmp_path / 'routes.json'
+    path.write_text(json.dumps([
+        {'id': 'route1', 'path': '/path1', 'responses': [{'body': 'response1'}]},
+        {'id': 'route2', 'path': '/path2', 'responses': [{'body': 'response2'}]}
+    ]))
+    return path
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return tmp_path / 'routes.snapshot'
+
+
+@pytest.mark.unit
+class TestCompiledRoutes:
+    def test_hash_file(self, tmp_path):
+        path = tmp_path / 'file'
+        path.write_bytes(b'content')
+        assert hash_file(path) == 'ed7002b439e9ac845f22357d822bac1444730fbdb6016d3ec9432297b9ec9f73'
+
+    def test_load_compiled_routes(self, routes_path, snapshot_path):
+        compile_routes(str(routes_path), snapshot_path)
+
+        snapshot = load_compiled_routes(snapshot_path, str(routes_path))
+
+        assert [route.id for route in snapshot.routes] == ['route1', 'route2']
+        assert snapshot.routes.get('route2').select_response().content == b'response2'
+        assert snapshot.definitions['route1']['path'] == '/path1'
+
+    def test_compiled_routes_keep_conditions(self, tmp_path, snapshot_path):
+        routes_path = tmp_path / 'routes.json'
+        routes_path.write_text(json.dumps([
+            {'id': 'route', 'path': '/path', 'conditions': {'args': {'tenant': 'acme'}}, 'responses': [{'body': ''}]}
+        ]))
+        compile_routes(str(routes_path), snapshot_path)
+
+        route = load_compiled_routes(snapshot_path, str(routes_path)).routes.get('route')
+
+        assert route.serialize()['conditions'] == {'args': {'tenant': 'acme'}}
+        assert route.conditions.key is not None
+
+    def test_load_without_pattern_checks_compiled_files(self, routes_path, snapshot_path):
+        compile_routes(str(routes_path), snapshot_path)
+        assert load_compiled_routes(snapshot_path)
+
+        routes_path.write_text('[]')
+        assert load_compiled_routes(snapshot_path) is None
+
+    def test_changed_routes_file_makes_snapshot_stale(self, routes_path, snapshot_path):
+        compile_routes(str(routes_path), snapshot_path)
+        routes_path.write_text('[]')
+
+        assert load_compiled_routes(snapshot_path, str(routes_path)) is None
+
+    def test_other_pattern_makes_snapshot_stale(self, routes_path, snapshot_path):
+        compile_routes(str(routes_path), snapshot_path)
+
+        assert load_compiled_routes(snapshot_path, str(routes_path.parent)) is None
+
+    def test_other_format_makes_snapshot_stale(self, routes_path, snapshot_path, monkeypatch):
+        compile_routes(str(routes_path), snapshot_path)
+        monkeypatch.setattr(compiled, 'FORMAT_VERSION', compiled.FORMAT_VERSION + 1)
+
+        assert load_compiled_routes(snapshot_path, str(routes_path)) is None
+
+    def test_invalid_snapshot_is_not_loaded(self, snapshot_path):
+        snapshot_path.write_bytes(b'invalid')
+        assert load_compiled_routes(snapshot_path) is None
+
+    def test_missing_snapshot_is_not_loaded(self, snapshot_path):
+        assert load_compiled_routes(snapshot_path) is None
+
+    def test_unpickled_route_has_own_lock(self, routes_path, snapshot_path):
+        route = compile_routes(str(routes_path), snapshot_path).routes.get('route1')
+        route.on_exhausted = print
+
+        unpickled = pickle.loads(pickle.dumps(route))
+
+        assert unpickled.lock is not route.lock
+        assert unpickled.on_exhausted is None
+        assert unpickled.consume().id == unpickled.responses.items[0].id
@@ -62,6 +62,115 @@ class TestConfig:
         config = Config(routes_path='/test2.json')
         assert config.ROUTES_PATH == Path('/test2.json')
 
+    def test_default_route_index(self):
+        config = Config()
+        assert config.ROUTE_INDEX == Config.DEFAULT_ROUTE_INDEX
+
+    def test_user_defined_route_index(self):
+        config = Config(route_index='alternation')
+        assert config.ROUTE_INDEX == 'alternation'
+
+    def test_route_index_from_env(self, monkeypatch):
+        monkeypatch.setenv('TRICKSTER_ROUTE_INDEX', 'linear')
+        config = Config()
+        assert config.ROUTE_INDEX == 'linear'
+
+    def test_user_defined_route_index_takes_precedence(self, monkeypatch):
+        monkeypatch.setenv('TRICKSTER_ROUTE_INDEX', 'linear')
+        config = Config(route_index='alternation')
+        assert config.ROUTE_INDEX == 'alternation'
+
+    def test_default_route_order(self):
+        assert Config().ROUTE_ORDER == Config.DEFAULT_ROUTE_ORDER
+
+    def test_route_order_from_env(self, monkeypatch):
+        monkeypatch.setenv('TRICKSTER_ROUTE_ORDER', 'specificity')
+        assert Config().ROUTE_ORDER == 'specificity'
+
+    def test_user_defined_route_order_takes_precedence(self, monkeypatch):
+        monkeypatch.setenv('TRICKSTER_ROUTE_ORDER', 'specificity')
+        assert Config(route_order='definition').ROUTE_ORDER == 'definition'
+
+    def test_default_match_cache_size(self):
+        config = Config()
+        assert config.MATCH_CACHE_SIZE == Config.DEFAULT_MATCH_CACHE_SIZE
+
+    def test_user_defined_match_cache_size(self):
+        config = Config(match_cache_size=10)
+        assert config.MATCH_CACHE_SIZE == 10
+
+    def test_match_cache_size_from_env(self, monkeypatch):
+        monkeypatch.setenv('TRICKSTER_MATCH_CACHE_SIZE', '20')
+        config = Config()
+        assert config.MATCH_CACHE_SIZE == 20
+
+    def test_user_defined_match_cache_size_takes_precedence(self, monkeypatch):
+        monkeypatch.setenv('TRICKSTER_MATCH_CACHE_SIZE', '20')
+        config = Config(match_cache_size=0)
+        assert config.MATCH_CACHE_SIZE == 0
+
+    def test_default_match_time_budget(self):
+        assert Config().MATCH_TIME_BUDGET == Config.DEFAULT_MATCH_TIME_BUDGET
+
+    def test_match_time_budget_from_env(self, monkeypatch):
+        monkeypatch.setenv('TRICKSTER_MATCH_TIME_BUDGET', '2.5')
+        assert Config().MATCH_TIME_BUDGET == 2.5
+
+    def test_user_defined_match_time_budget_takes_precedence(self, monkeypatch):
+        monkeypatch.setenv('TRICKSTER_MATCH_TIME_BUDGET', '20')
+        assert Config(match_time_budget=0).MATCH_TIME_BUDGET == 0
+
+    def test_default_lazy_routes(self):
+        assert Config().LAZY_ROUTES is False
+
+    def test_user_defined_lazy_routes(self):
+        assert Config(lazy_routes=True).LAZY_ROUTES is True
+
+    @pytest.mark.parametrize('value, expected', [('1', True), ('True', True), ('yes', True), ('0', False), ('', False)])
+    def test_lazy_routes_from_env(self, monkeypatch, value, expected):
+        monkeypatch.setenv('TRICKSTER_LAZY_ROUTES', value)
+        assert Config().LAZY_ROUTES is expected
+
+    def test_default_workers(self):
+        config = Config()
+        assert config.WORKERS == 1
+
+    def test_user_defined_workers(self):
+        config = Config(workers=4)
+        assert config.WORKERS == 4
+
+    def test_workers_from_env(self, monkeypatch):
+        monkeypatch.setenv('TRICKSTER_WORKERS', '8')
+        config = Config()
+        assert config.WORKERS == 8
+
+    def test_default_preload(self):
+        assert Config().PRELOAD is False
+
+    def test_user_defined_preload(self):
+        assert Config(preload=True).PRELOAD is True
+
+    def test_preload_from_env(self, monkeypatch):
+        monkeypatch.setenv('TRICKSTER_PRELOAD', 'true')
+        assert Config().PRELOAD is True
+
+    def test_default_shared_state(self):
+        config = Config()
+        assert config.SHARED_STATE is None
+        assert config.SHARED_STATE_SIZE == 1 << 20
+
+    def test_user_defined_shared_state(self):
+        config = Config(shared_state_path='/tmp/state', shared_state_size=100)
+        assert config.SHARED_STATE == Path('/tmp/state')
+        assert config.SHARED_STATE_SIZE == 100
+
+    def test_shared_state_from_env(self, monkeypatch):
+        monkeypatch.setenv('TRICKSTER_SHARED_STATE', '/tmp/state')
+        monkeypatch.setenv('TRICKSTER_SHARED_STATE_SIZE', '100')
+        config = Config()
+        assert config.SHARED_STATE == Path('/tmp/state')
+        assert config.SHARED_STATE_SIZE == 100
+
     def test_default_routes_empty(self):
         config = Config()
         assert config.DEFAULT_ROUTES == []
@@ -88,7 +197,33 @@ class TestConfig:
         routes_file = tmpdir.join('test.json')
         routes_file.write(json.dumps(routes))
         config = Config(routes_path=routes_file)
-        assert config.DEFAULT_ROUTES == routes
+        assert list(config.DEFAULT_ROUTES) == routes
+
+    def test_default_routes_from_ndjson(self, tmpdir):
+        routes = [
+            {'path': '/route1', 'responses': [{'body': 'response1'}]},
+            {'path': '/route2', 'responses': [{'body': 'response2'}]}
+        ]
+        routes_file = tmpdir.join('test.ndjson')
+        routes_file.write('\n'.join(json.dumps(route) for route in routes))
+        config = Config(routes_path=routes_file)
+        assert list(config.DEFAULT_ROUTES) == routes
+
+    def test_default_routes_from_directory(self, tmp_path):
+        (tmp_path / 'b.json').write_text(json.dumps([{'path': '/route2', 'responses': []}]))
+        (tmp_path / 'a.json').write_text(json.dumps([{'path': '/route1', 'responses': []}]))
+        config = Config(routes_path=str(tmp_path))
+        assert [route['path'] for route in config.DEFAULT_ROUTES] == ['/route1', '/route2']
+
+    def test_default_routes_snapshot(self):
+        assert Config().ROUTES_SNAPSHOT is None
+
+    def test_user_defined_routes_snapshot(self):
+        assert Config(routes_snapshot_path='/routes.snapshot').ROUTES_SNAPSHOT == Path('/routes.snapshot')
+
+    def test_routes_snapshot_from_env(self, monkeypatch):
+        monkeypatch.setenv('TRICKSTER_ROUTES_SNAPSHOT', '/routes.snapshot')
+        assert Config().ROUTES_SNAPSHOT == Path('/routes.snapshot')
 
     def test_coalesce(self):
         config = Config()
@@ -0,0 +1,255 @@
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+
+import pytest
+
+from trickster import loader
+from trickster.loader import (
+    RoutesFile, RoutesFiles, decompress, parse_routes, read_documents, stream_routes_files, validate_routes
+)
+from trickster.routing import DuplicateRouteError, InvalidRoutesError
+
+
+@pytest.mark.unit
+class TestDecompress:
+    def test_decompress_gzip(self):
+        assert decompress(gzip.compress(b'[]'), 'gzip') == b'[]'
+
+    def test_plain_data_is_not_changed(self):
+        assert decompress(b'[]') == b'[]'
+
+    def test_invalid_gzip(self):
+        with pytest.raises(InvalidRoutesError):
+            decompress(b'[]', 'gzip')
+
+    def test_truncated_gzip(self):
+        with pytest.raises(InvalidRoutesError, match='end-of-stream'):
+            decompress(gzip.compress(b'[]')[:-10], 'gzip')
+
+    def test_decompress_multiple_members(self):
+        assert decompress(gzip.compress(b'[1,') + gzip.compress(b'2]'), 'gzip') == b'[1,2]'
+
+    def test_decompressed_size_is_limited(self):
+        data = gzip.compress(b' ' * 1000)
+        assert decompress(data, 'gzip', max_size=1000) == b' ' * 1000
+        with pytest.raises(InvalidRoutesError, match='bigger than 999 bytes'):
+            decompress(data, 'gzip', max_size=999)
+        with pytest.raises(InvalidRoutesError, match='bigger than 999 bytes'):
+            decompress(gzip.compress(b' ' * 500) + gzip.compress(b' ' * 500), 'gzip', max_size=999)
+
+
+@pytest.mark.unit
+class TestParseRoutes:
+    def test_parse_json_array(self):
+        assert parse_routes(b' [{"path": "/a"}, {"path": "/b"}]') == [{'path': '/a'}, {'path': '/b'}]
+
+    def test_parse_ndjson(self):
+        assert parse_routes(b'{"path": "/a"}\n\n{"path": "/b"}\n') == [{'path': '/a'}, {'path': '/b'}]
+
+    def test_parse_empty_document(self):
+        assert parse_routes(b'') == []
+
+    def test_invalid_json_array(self):
+        with pytest.raises(InvalidRoutesError) as error:
+            parse_routes(b'[{"path": "/a"}')
+        assert str(error.value).startswith('Invalid JSON')
+
+    def test_invalid_ndjson_lines(self):
+        with pytest.raises(InvalidRoutesError) as error:
+            parse_routes(b'{"path": "/a"}\n\n{"path": \n{"path": "/b"}\n{')
+        assert str(error.value) == '2 of 4 lines are not valid JSON.'
+        assert list(error.value.errors) == [1, 3]
+        assert error.value.errors[1].startswith('Line 3: ')
+        assert error.value.errors[3].startswith('Line 5: ')
+
+    def test_invalid_utf8(self):
+        with pytest.raises(InvalidRoutesError):
+            parse_routes(b'\xff')
+
+
+@pytest.mark.unit
+class TestValidateRoutes:
+    def test_valid_routes(self):
+        validate_routes([{'path': '/a', 'responses': [{'body': ''}]}])
+
+    def test_reports_all_invalid_routes(self):
+        with pytest.raises(InvalidRoutesError) as error:
+            validate_routes([
+                {'responses': []},
+                {'path': '/a', 'responses': [{'body': ''}]},
+                json.loads('{"path": 1, "responses": []}')
+            ])
+        assert str(error.value) == '2 of 3 Routes are invalid.'
+        assert list(error.value.errors) == [0, 2]
+
+
+def read(text):
+    return list(read_documents(io.StringIO(text)))
+
+
+@pytest.mark.unit
+class TestReadDocuments:
+    def test_read_ndjson(self):
+        assert read('\n{"a": 1}\n\n{"b": 2}\n') == [(2, {'a': 1}), (4, {'b': 2})]
+
+    def test_read_empty_file(self):
+        assert read('\n \n') == []
+
+    def test_read_json_array(self):
+        assert read('\n[\n  {"a": 1},\n  {"b": [\n2]}, {"c": 3}\n]\n') == [
+            (3, {'a': 1}),
+            (4, {'b': [2]}),
+            (5, {'c': 3})
+        ]
+
+    def test_read_empty_json_array(self):
+        assert read(' [ ] ') == []
+
+    def test_read_json_array_in_chunks(self, monkeypatch):
+        monkeypatch.setattr(loader, 'READ_SIZE', 3)
+        items = [{'id': f'route{i}', 'values': list(range(i))} for i in range(20)]
+        text = '[\n' + ',\n'.join(json.dumps(item) for item in items) + '\n]'
+
+        assert read(text) == [(line, item) for line, item in enumerate(items, 2)]
+
+    def test_big_item_is_parsed_few_times(self, monkeypatch, mocker):
+        monkeypatch.setattr(loader, 'READ_SIZE', 16)
+        item = {'body': 'x' * 100000}
+        raw_decode = mocker.spy(json.JSONDecoder, 'raw_decode')
+
+        assert read(f'[{json.dumps(item)}]') == [(1, item)]
+        assert raw_decode.call_count < 20
+
+    def test_read_json_array_of_numbers_in_chunks(self, monkeypatch):
+        monkeypatch.setattr(loader, 'READ_SIZE', 2)
+        assert read('[12345, 678]') == [(1, 12345), (1, 678)]
+
+    @pytest.mark.parametrize('text, message', [
+        ('{"a": 1}\n{"a": ', 'Line 2: '),
+        ('[\n{"a": 1},\n{"a": }\n]', 'Line 3: '),
+        ('[\n{"a": 1}\n{"a": 2}\n]', 'Line 3: Expecting one of ",]".'),
+        ('[\n{"a": 1}', 'Line 2: Expecting one of ",]".'),
+        ('[{"a": 1}]\n[]', 'Line 2: Unexpected data after the end of array.')
+    ])
+    def test_invalid_documents(self, text, message):
+        with pytest.raises(InvalidRoutesError) as error:
+            read(text)
+        assert str(error.value).startswith(message)
+
+
+@pytest.mark.unit
+class TestRoutesFile:
+    def test_routes_are_read_again_when_iterated(self, tmp_path):
+        path = tmp_path / 'routes.json'
+        path.write_text('[{"path": "/a", "responses": []}]')
+        routes_file = RoutesFile(path)
+
+        assert list(routes_file) == [{'path': '/a', 'responses': []}]
+        assert list(routes_file) == [{'path': '/a', 'responses': []}]
+
+    def test_invalid_route_reports_line(self, tmp_path):
+        path = tmp_path / 'routes.ndjson'
+        path.write_text('{"path": "/a", "responses": []}\n{"path": "/b"}\n')
+
+        with pytest.raises(InvalidRoutesError) as error:
+            list(RoutesFile(path))
+        assert str(error.value).startswith(f'Invalid routes file {path}. Line 2: ')
+
+    def test_progress_is_logged(self, tmp_path, monkeypatch, caplog):
+        monkeypatch.setattr(loader, 'PROGRESS_INTERVAL', 2)
+        path = tmp_path / 'routes.ndjson'
+        path.write_text('{"path": "/a", "responses": []}\n' * 5)
+
+        with caplog.at_level(logging.INFO, logger='trickster.loader'):
+            assert len(list(RoutesFile(path))) == 5
+
+        assert caplog.messages == [
+            f'Loaded 2 routes from {path}.',
+            f'Loaded 4 routes from {path}.',
+            f'Loaded all 5 routes from {path}.'
+        ]
+
+
+def write_routes(path, *route_ids):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps([{'id': route_id, 'path': '/path', 'responses': []} for route_id in route_ids]))
+
+
+@pytest.mark.unit
+class TestRoutesFiles:
+    def test_find_paths(self, tmp_path):
+        write_routes(tmp_path / 'teams' / 'b.json')
+        write_routes(tmp_path / 'teams' / 'a.ndjson')
+        write_routes(tmp_path / 'teams' / 'readme.md')
+        write_routes(tmp_path / 'other' / 'c.json')
+        write_routes(tmp_path / 'single.json')
+        patterns = os.pathsep.join([str(tmp_path / 'single.json'), str(tmp_path / 'teams'), str(tmp_path / '*' / '*.json')])
+
+        assert RoutesFiles(patterns).find_paths() == [
+            tmp_path / 'single.json',
+            tmp_path / 'teams' / 'a.ndjson',
+            tmp_path / 'teams' / 'b.json',
+            tmp_path / 'other' / 'c.json'
+        ]
+
+    def test_pattern_without_files(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            RoutesFiles(str(tmp_path / '*.json')).find_paths()
+
+    def test_routes_are_merged_in_order_of_files(self, tmp_path):
+        write_routes(tmp_path / 'b.json', 'route3')
+        write_routes(tmp_path / 'a.json', 'route1', 'route2')
+        write_routes(tmp_path / 'c.json', 'route4')
+
+        routes = list(RoutesFiles(str(tmp_path / '*.json'), max_workers=2))
+
+        assert [route['id'] for route in routes] == ['route1', 'route2', 'route3', 'route4']
+
+    def test_files_are_streamed_by_workers_in_bounded_chunks(self, tmp_path, mocker):
+        mocker.patch.object(loader, 'CHUNK_SIZE', 2)
+        route_ids = [f'route{index}' for index in range(15)]
+        for index in range(5):
+            write_routes(tmp_path / f'{index}.json', *route_ids[index * 3:index * 3 + 3])
+
+        routes = list(RoutesFiles(str(tmp_path), max_workers=3))
+
+        assert [route['id'] for route in routes] == route_ids
+
+    def test_stream_routes_files(self, tmp_path, mocker):
+        mocker.patch.object(loader, 'CHUNK_SIZE', 2)
+        write_routes(tmp_path / 'a.json', 'route1', 'route2', 'route3')
+        write_routes(tmp_path / 'b.json', 'route4')
+        chunks = queue.Queue()
+
+        stream_routes_files([tmp_path / 'a.json', tmp_path / 'b.json'], chunks)
+
+        assert [chunk and [route['id'] for route in chunk] for chunk in chunks.queue] == [
+            ['route1', 'route2'], ['route3'], None, ['route4'], None
+        ]
+
+    def test_single_file_is_streamed(self, tmp_path, mocker):
+        write_routes(tmp_path / 'a.json', 'route1')
+        process = mocker.patch.object(loader, 'Process')
+
+        assert [route['id'] for route in RoutesFiles(str(tmp_path), max_workers=2)] == ['route1']
+        process.assert_not_called()
+
+    def test_duplicate_route_id_in_other_file(self, tmp_path):
+        write_routes(tmp_path / 'a.json', 'route1')
+        write_routes(tmp_path / 'b.json', 'route2', 'route1')
+
+        with pytest.raises(DuplicateRouteError) as error:
+            list(RoutesFiles(str(tmp_path), max_workers=2))
+        assert str(error.value) == f'Route id "route1" in {tmp_path / "b.json"} is already defined in {tmp_path / "a.json"}.'
+
+    def test_invalid_file_error_is_raised(self, tmp_path):
+        write_routes(tmp_path / 'a.json', 'route1')
+        (tmp_path / 'b.json').write_text('[{"id": "route2"}]')
+
+        with pytest.raises(InvalidRoutesError) as error:
+            list(RoutesFiles(str(tmp_path), max_workers=2))
+        assert str(error.value).startswith(f'Invalid routes file {tmp_path / "b.json"}. Line 1: ')
@@ -4,7 +4,7 @@ from pathlib import Path
 import flask
 from fastjsonschema.exceptions import JsonSchemaValueException
 
-from trickster.validation import request_schema, compile_json_schema, get_schema_path
+from trickster.validation import request_schema, compile_json_schema, compile_json_schemas, get_schema_path
 
 
 @pytest.mark.unit
@@ -20,6 +20,14 @@ class TestJsonSchemaValidation:
         validator2 = compile_json_schema(get_schema_path('route.schema.json'))
         assert validator1 is validator2
 
+    def test_compile_all_json_schemas(self):
+        compile_json_schema.cache_clear()
+        compile_json_schemas()
+        assert compile_json_schema.cache_info().currsize == 3
+
+        compile_json_schema(get_schema_path('route.schema.json'))
+        assert compile_json_schema.cache_info().hits == 1
+
     def test_compile_valid_json_schema(self, tmpdir):
         schema = tmpdir.join('test.schema.json')
         schema.write('''{
@@ -2,17 +2,24 @@
 
 from __future__ import annotations
 
-from typing import Any, Optional, Tuple
+from typing import Any, Optional, Set, Tuple
 
 from flask import Flask, jsonify
 
+from trickster.compiled import load_compiled_routes
 from trickster.config import Config
 from trickster.endpoints import external, internal, utility
-from trickster.routing.router import Router
+from trickster.routing.router import Router, RouterSnapshot
+from trickster.routing.shared import SharedRouter, SharedState
+from trickster.validation import compile_json_schemas
 
 from werkzeug.exceptions import HTTPException
 
 
+# Endpoint serving requests by user Routes.
+EXTERNAL_ENDPOINT = 'external_api.respond'
+
+
 def http_error_handler(error: HTTPException) -> Tuple[Any, Optional[int]]:
     """Handler for error pages."""
     return jsonify({
@@ -27,14 +34,69 @@ class ApiApp(Flask):
     def __init__(self, config: Config) -> None:
         super().__init__(__name__)
         self.config.from_object(config)
-        self.user_router = Router()
-        self.load_routes()
+        self.user_router = self._create_router()
+        self.default_routes = self._compile_default_routes()
+        self.user_router.initialize(self.default_routes)
         self._register_handlers()
         self._register_blueprints()
+        self.url_adapter = self.url_map.bind('localhost')
+        self.external_methods = self._external_methods()
+        self.reserved_segments = self._reserved_segments()
+
+    def _create_router(self) -> Router:
+        """Create router, share it with other worker processes if shared state is configured."""
+        index = self.config['ROUTE_INDEX']
+        match_cache_size = self.config['MATCH_CACHE_SIZE']
+        match_time_budget = budget / 1000 if (budget := self.config['MATCH_TIME_BUDGET']) else None
+        route_order = self.config['ROUTE_ORDER']
+        if path := self.config['SHARED_STATE']:
+            state = SharedState(path, self.config['SHARED_STATE_SIZE'])
+            return SharedRouter(state, index, match_cache_size, match_time_budget, route_order)
+        return Router(index, match_cache_size, self.config['LAZY_ROUTES'], match_time_budget, route_order)
+
+    def _compile_default_routes(self) -> RouterSnapshot:
+        """Load compiled default routes if their snapshot is fresh, compile them from routes files otherwise."""
+        if path := self.config['ROUTES_SNAPSHOT']:
+            pattern = str(routes_path) if (routes_path := self.config['ROUTES_PATH']) else None
+            if snapshot := load_compiled_routes(path, pattern):
+                return snapshot
+        return self.user_router.compile(self.config['DEFAULT_ROUTES'])
 
     def load_routes(self) -> None:
-        """Load configured default routes."""
-        self.user_router.reset(self.config['DEFAULT_ROUTES'])
+        """Restore configured default routes compiled when the app started."""
+        self.user_router.restore(self.default_routes)
+
+    def preload(self) -> None:
+        """Build everything created lazily on first use, so worker processes forked later share it."""
+        compile_json_schemas()
+        self.url_map.update()
+
+    def _external_methods(self) -> Set[str]:
+        """Get methods accepted by external endpoint."""
+        return {method for rule in self.url_map.iter_rules(EXTERNAL_ENDPOINT) for method in rule.methods or ()}
+
+    def _reserved_segments(self) -> Optional[Set[str]]:
+        """Get first segments of paths of other endpoints than external, None if some of them is variable."""
+        segments = {
+            rule.rule.lstrip('/').split('/', 1)[0] for rule in self.url_map.iter_rules()
+            if rule.endpoint != EXTERNAL_ENDPOINT
+        }
+        return None if any('<' in segment for segment in segments) else segments
+
+    def is_external(self, path: str, method: str) -> bool:
+        """Return True if URL map of the app routes request to external endpoint, so a Route may serve it.
+
+        Paths whose first segment isn't used by any other endpoint are routed to
+        external endpoint without matching the whole URL map.
+        """
+        segment = path.lstrip('/').split('/', 1)[0]
+        if segment and self.reserved_segments is not None and segment not in self.reserved_segments:
+            return method in self.external_methods
+        try:
+            endpoint, _ = self.url_adapter.match(path, method)
+        except HTTPException:
+            return False
+        return endpoint == EXTERNAL_ENDPOINT
 
     def _register_handlers(self) -> None:
         """Register error page handlers."""
@@ -0,0 +1,156 @@
+"""Initialization of ASGI app."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, MutableMapping, Tuple
+
+from trickster.api_app import ApiApp
+from trickster.endpoints.external import DEFAULT_CONTENT_TYPE, NOT_FOUND_BODY, NOT_FOUND_HEADERS
+from trickster.routing.auth import AuthenticationError
+from trickster.routing.input import IncomingAsgiRequest
+
+from werkzeug.exceptions import Unauthorized
+
+
+Scope = MutableMapping[str, Any]
+Message = Dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+Headers = Iterable[Tuple[str, str]]
+
+
+def wsgi_environ(scope: Scope, body: bytes) -> Dict[str, Any]:
+    """Convert ASGI connection scope and request body to WSGI environment."""
+    server = scope.get('server') or ('localhost', 80)
+    environ: Dict[str, Any] = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    for raw_name, raw_value in scope['headers']:
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        value = raw_value.decode('latin-1')
+        environ[name] = f'{environ[name]},{value}' if name in environ else value
+    environ['CONTENT_LENGTH'] = str(len(body))  # Body is already read completely, even if it was chunked
+    return environ
+
+
+async def read_body(receive: Receive) -> bytes:
+    """Read complete body of a request."""
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        more_body = message.get('more_body', False)
+    return b''.join(chunks)
+
+
+async def send_response(send: Send, status: int, headers: Headers, body: bytes) -> None:
+    """Send complete response to a client."""
+    raw_headers = [(name.lower().encode('latin-1'), str(value).encode('latin-1')) for name, value in headers]
+    if not any(name == b'content-type' for name, _ in raw_headers):
+        raw_headers.append((b'content-type', DEFAULT_CONTENT_TYPE.encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class AsgiApp:
+    """ASGI application serving Routes of an ApiApp.
+
+    Requests to user Routes are served without blocking, delays of responses
+    are awaited so one process can keep many slow responses open at once.
+    All other requests, eg. to internal endpoints, are passed to the wrapped
+    Flask app. It runs in a single worker thread, so a slow internal request
+    doesn't block the event loop and internal requests never interleave.
+    Routes are matched in the thread of the event loop against the current
+    routing table, which is never changed, changes of Routes are serialized
+    by the lock of the router.
+    """
+
+    def __init__(self, api_app: ApiApp) -> None:
+        self.api_app = api_app
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='api-app')
+
+    def preload(self) -> None:
+        """Build everything created lazily on first use, so worker processes forked later share it."""
+        self.api_app.preload()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle ASGI connection."""
+        if scope['type'] == 'http':
+            body = await read_body(receive)
+            if self.api_app.is_external(scope['path'], scope['method']):
+                await self.respond(IncomingAsgiRequest(scope, body), send)
+            else:
+                await self.call_api_app(scope, body, send)
+        elif scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+
+    async def respond(self, request: IncomingAsgiRequest, send: Send) -> None:
+        """Match request againts defined routes and send appropriet response."""
+        try:
+            if response := self.api_app.user_router.consume(request):
+                await response.wait_async()
+                body = b'' if request.method == 'HEAD' else response.content
+                await send_response(send, response.status, response.content_headers, body)
+                return
+            await send_response(send, 404, NOT_FOUND_HEADERS, NOT_FOUND_BODY)
+        except AuthenticationError as error:
+            body = json.dumps({'error': Unauthorized().name, 'message': str(error)}).encode('utf-8')
+            await send_response(send, 401, [('Content-Type', 'application/json')], body)
+
+    async def call_api_app(self, scope: Scope, body: bytes, send: Send) -> None:
+        """Pass request to the Flask app in its worker thread and send its response."""
+        loop = asyncio.get_running_loop()
+        environ = wsgi_environ(scope, body)
+        status, headers, content = await loop.run_in_executor(self.executor, self.run_api_app, environ)
+        await send_response(send, status, headers, content)
+
+    def run_api_app(self, environ: Dict[str, Any]) -> Tuple[int, List[Tuple[str, str]], bytes]:
+        """Handle request by the Flask app, return status, headers and body of its response."""
+        started: Dict[str, Any] = {}
+        chunks: List[bytes] = []
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info: Any = None) -> Callable[[bytes], Any]:
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = headers
+            return chunks.append
+
+        result = self.api_app(environ, start_response)
+        try:
+            chunks.extend(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return started['status'], started['headers'], b''.join(chunks)
+
+    async def lifespan(self, receive: Receive, send: Send) -> None:
+        """Acknowledge startup and shutdown of the server."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -1,7 +1,13 @@
 """Usefull collections."""
 
 import abc
-from typing import Any, Dict, Generic, Iterator, List, Optional, TypeVar
+import bisect
+import collections
+import itertools
+import math
+from typing import (
+    Any, Callable, Dict, Generic, Hashable, Iterable, Iterator, List, Optional, OrderedDict, Set, Tuple, TypeVar
+)
 
 
 class IdItem(abc.ABC):
@@ -16,60 +22,594 @@ class IdItem(abc.ABC):
 
 
 IdItemType = TypeVar('IdItemType', bound=IdItem)
+KeyType = TypeVar('KeyType', bound=Hashable)
+ValueType = TypeVar('ValueType')
+CopyOnWriteType = TypeVar('CopyOnWriteType', bound='CopyOnWrite')
+
+
+class CopyOnWrite:
+    """Structure shared by copies of a collection until one of them changes it.
+
+    Every structure has an owner, only the owner changes the structure in place.
+    Anyone else gets a shallow copy owned by them from `edit` and changes the copy,
+    parts of the copy are copied again when they are changed for the first time.
+    Structures that aren't owned by any writer never change, so other threads can
+    read them without locking.
+    """
+
+    __slots__ = ('owner',)
+
+    def __init__(self, owner: object) -> None:
+        self.owner = owner
+
+    def edit(self: CopyOnWriteType, owner: object) -> CopyOnWriteType:
+        """Get the structure itself for its owner, its shallow copy owned by the given owner otherwise."""
+        if self.owner is owner:
+            return self
+        edited = self._copy()
+        edited.owner = owner
+        return edited
+
+    def _copy(self: CopyOnWriteType) -> CopyOnWriteType:
+        """Create shallow copy of the structure, parts changed in place by the owner are copied as well."""
+        edited = object.__new__(type(self))
+        edited.__dict__.update(self.__dict__)
+        return edited
+
+
+class CopyOnWriteDict(CopyOnWrite, Generic[KeyType, ValueType]):
+    """Dictionary sharing its items with its copies until they are changed.
+
+    Items are split to shards by hash of their keys, the number of shards grows
+    with square root of the number of items. Copy shares all shards, it copies
+    list of shards and a shard before it changes the shard for the first time,
+    so a change of a copy takes O(√n).
+    """
+
+    __slots__ = ('shards', 'owned', 'mask', 'size')
+
+    def __init__(self, owner: object) -> None:
+        super().__init__(owner)
+        self.shards: List[Dict[KeyType, ValueType]] = [{}]
+        self.owned: Optional[Set[int]] = None  # Indexes of shards owned by the dictionary, None if it owns all of them
+        self.mask = 0
+        self.size = 0
+
+    def _copy(self) -> 'CopyOnWriteDict[KeyType, ValueType]':
+        """Create copy sharing all shards, shards are copied when they are changed."""
+        edited: CopyOnWriteDict[KeyType, ValueType] = CopyOnWriteDict(self.owner)
+        edited.shards = list(self.shards)
+        edited.owned = set()
+        edited.mask = self.mask
+        edited.size = self.size
+        return edited
+
+    def _shard(self, key: KeyType) -> Dict[KeyType, ValueType]:
+        """Get shard of the key owned by the dictionary, copy it if it's shared."""
+        index = hash(key) & self.mask
+        if self.owned is None or index in self.owned:
+            return self.shards[index]
+        shard = self.shards[index] = dict(self.shards[index])
+        self.owned.add(index)
+        return shard
+
+    def _reshard(self, count: int, items: Iterable[Tuple[KeyType, ValueType]]) -> None:
+        """Split items to given number of shards."""
+        shards: List[Dict[KeyType, ValueType]] = [{} for _ in range(count)]
+        self.mask = count - 1
+        for key, value in items:
+            shards[hash(key) & self.mask][key] = value
+        self.shards = shards
+        self.owned = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Get state of the dictionary to pickle."""
+        return {'owner': self.owner, 'shards': len(self.shards), 'items': dict(self.items())}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore pickled dictionary, keys may have different hashes in another process, so shards are built again."""
+        self.owner = state['owner']
+        self.size = len(state['items'])
+        self._reshard(state['shards'], state['items'].items())
+
+    def get(self, key: KeyType, default: Any = None) -> Any:
+        """Get item with given key or default if it's not present."""
+        return self.shards[hash(key) & self.mask].get(key, default)
+
+    def __getitem__(self, key: KeyType) -> ValueType:
+        """Get item with given key, raise KeyError if it's not present."""
+        return self.shards[hash(key) & self.mask][key]
+
+    def __contains__(self, key: KeyType) -> bool:
+        """Return True if item with given key is present."""
+        return key in self.shards[hash(key) & self.mask]
+
+    def __setitem__(self, key: KeyType, value: ValueType) -> None:
+        """Set item with given key, the dictionary must be owned by the writer."""
+        shard = self._shard(key)
+        if key in shard:
+            shard[key] = value
+            return
+        shard[key] = value
+        self.size += 1
+        if self.size > len(self.shards) ** 2:
+            self._reshard(2 * len(self.shards), list(self.items()))
+
+    def __delitem__(self, key: KeyType) -> None:
+        """Delete item with given key, the dictionary must be owned by the writer."""
+        if key not in self:
+            raise KeyError(key)
+        del self._shard(key)[key]
+        self.size -= 1
+
+    def edit_item(self, key: KeyType, create: Callable[[object], ValueType]) -> ValueType:
+        """Get copy-on-write value owned by owner of the dictionary, create it or copy it if it's missing or shared.
+
+        The dictionary must be owned by the writer.
+        """
+        value = self.get(key)
+        edited = create(self.owner) if value is None else value.edit(self.owner)
+        if edited is not value:
+            self[key] = edited
+        return edited
+
+    def __len__(self) -> int:
+        """Get number of items."""
+        return self.size
+
+    def __iter__(self) -> Iterator[KeyType]:
+        """Iterate over keys of all items."""
+        return itertools.chain.from_iterable(self.shards)
+
+    def items(self) -> Iterator[Tuple[KeyType, ValueType]]:
+        """Iterate over keys and values of all items."""
+        return itertools.chain.from_iterable(shard.items() for shard in self.shards)
+
+    def values(self) -> Iterator[ValueType]:
+        """Iterate over values of all items."""
+        return itertools.chain.from_iterable(shard.values() for shard in self.shards)
+
+
+class SortedChunk(CopyOnWrite, Generic[KeyType, ValueType]):
+    """Consecutive items of a sorted dictionary."""
+
+    __slots__ = ('keys', 'values')
+
+    def __init__(self, owner: object, keys: List[KeyType], values: List[ValueType]) -> None:
+        super().__init__(owner)
+        self.keys = keys
+        self.values = values
+
+    def _copy(self) -> 'SortedChunk[KeyType, ValueType]':
+        """Create copy of keys and values."""
+        return SortedChunk(self.owner, list(self.keys), list(self.values))
+
+
+class CopyOnWriteSortedDict(CopyOnWrite, Generic[KeyType, ValueType]):
+    """Dictionary iterated in order of its keys, sharing its items with its copies until they are changed.
+
+    Items are split to chunks of consecutive items, size of chunks grows with
+    square root of the number of items. Items are looked up by binary search
+    in the last keys of chunks and then in the chunk. Copy shares all chunks,
+    it copies list of chunks and a chunk before it changes the chunk for the
+    first time, so a change of a copy takes O(√n). Positions of items are
+    counted by lengths of chunks, which takes O(√n) as well.
+    """
+
+    __slots__ = ('chunks', 'maxes', 'size')
+
+    min_chunk_size = 16
+
+    def __init__(self, owner: object) -> None:
+        super().__init__(owner)
+        self.chunks: List[SortedChunk[KeyType, ValueType]] = []
+        self.maxes: List[KeyType] = []
+        self.size = 0
+
+    def _copy(self) -> 'CopyOnWriteSortedDict[KeyType, ValueType]':
+        """Create copy sharing all chunks, chunks are copied when they are changed."""
+        edited: CopyOnWriteSortedDict[KeyType, ValueType] = CopyOnWriteSortedDict(self.owner)
+        edited.chunks = list(self.chunks)
+        edited.maxes = list(self.maxes)
+        edited.size = self.size
+        return edited
+
+    def _chunk_size(self) -> int:
+        """Get size of chunks, chunks are split when they are twice as big and merged when they are half as big."""
+        return max(self.min_chunk_size, math.isqrt(self.size))
+
+    def _locate(self, key: KeyType) -> Tuple[int, int]:
+        """Get index of chunk that contains the key or should contain it and position of the key in the chunk."""
+        chunk_index = min(bisect.bisect_left(self.maxes, key), len(self.maxes) - 1)  # type: ignore
+        return chunk_index, bisect.bisect_left(self.chunks[chunk_index].keys, key)  # type: ignore
+
+    def _find(self, key: KeyType) -> Optional[Tuple[int, int]]:
+        """Get index of chunk that contains the key and position of the key in the chunk, None if it's missing."""
+        if self.chunks:
+            chunk_index, position = self._locate(key)
+            keys = self.chunks[chunk_index].keys
+            if position < len(keys) and keys[position] == key:
+                return chunk_index, position
+        return None
+
+    def _chunk(self, chunk_index: int) -> SortedChunk[KeyType, ValueType]:
+        """Get chunk owned by the dictionary, copy it if it's shared."""
+        chunk = self.chunks[chunk_index] = self.chunks[chunk_index].edit(self.owner)
+        return chunk
+
+    def _split(self, chunk_index: int) -> None:
+        """Split chunk to two halves."""
+        chunk = self.chunks[chunk_index]
+        half = len(chunk.keys) // 2
+        self.chunks.insert(chunk_index + 1, SortedChunk(self.owner, chunk.keys[half:], chunk.values[half:]))
+        self.maxes.insert(chunk_index + 1, chunk.keys[-1])
+        del chunk.keys[half:]
+        del chunk.values[half:]
+        self.maxes[chunk_index] = chunk.keys[-1]
+
+    def _merge(self, chunk_index: int) -> None:
+        """Merge chunk with the next one or with the previous one if it's the last chunk."""
+        chunk_index = min(chunk_index, len(self.chunks) - 2)
+        chunk, following = self._chunk(chunk_index), self.chunks.pop(chunk_index + 1)
+        chunk.keys.extend(following.keys)
+        chunk.values.extend(following.values)
+        self.maxes[chunk_index] = self.maxes.pop(chunk_index + 1)
+        if len(chunk.keys) > 2 * self._chunk_size():
+            self._split(chunk_index)
+
+    def get(self, key: KeyType, default: Any = None) -> Any:
+        """Get item with given key or default if it's not present."""
+        if (found := self._find(key)) is None:
+            return default
+        return self.chunks[found[0]].values[found[1]]
+
+    def __contains__(self, key: KeyType) -> bool:
+        """Return True if item with given key is present."""
+        return self._find(key) is not None
+
+    def __setitem__(self, key: KeyType, value: ValueType) -> None:
+        """Set item with given key, the dictionary must be owned by the writer."""
+        if not self.chunks:
+            self.chunks.append(SortedChunk(self.owner, [], []))
+            self.maxes.append(key)
+        if key > self.maxes[-1]:  # type: ignore
+            chunk_index = len(self.chunks) - 1
+            chunk = self._chunk(chunk_index)
+            chunk.keys.append(key)
+            chunk.values.append(value)
+        else:
+            chunk_index, position = self._locate(key)
+            chunk = self._chunk(chunk_index)
+            if position < len(chunk.keys) and chunk.keys[position] == key:
+                chunk.values[position] = value
+                return
+            chunk.keys.insert(position, key)
+            chunk.values.insert(position, value)
+        self.maxes[chunk_index] = chunk.keys[-1]
+        self.size += 1
+        if len(chunk.keys) > 2 * self.min_chunk_size and len(chunk.keys) > 2 * self._chunk_size():
+            self._split(chunk_index)
+
+    def __delitem__(self, key: KeyType) -> None:
+        """Delete item with given key, the dictionary must be owned by the writer."""
+        if (found := self._find(key)) is None:
+            raise KeyError(key)
+        chunk_index, position = found
+        chunk = self._chunk(chunk_index)
+        del chunk.keys[position]
+        del chunk.values[position]
+        self.size -= 1
+        if not chunk.keys:
+            del self.chunks[chunk_index]
+            del self.maxes[chunk_index]
+            return
+        self.maxes[chunk_index] = chunk.keys[-1]
+        if 2 * len(chunk.keys) < self._chunk_size() and len(self.chunks) > 1:
+            self._merge(chunk_index)
+
+    def __len__(self) -> int:
+        """Get number of items."""
+        return self.size
+
+    def __iter__(self) -> Iterator[KeyType]:
+        """Iterate over keys of all items in order."""
+        return itertools.chain.from_iterable(chunk.keys for chunk in self.chunks)
+
+    def items(self) -> Iterator[Tuple[KeyType, ValueType]]:
+        """Iterate over keys and values of all items in order."""
+        if len(self.chunks) == 1:
+            return zip(self.chunks[0].keys, self.chunks[0].values)
+        return itertools.chain.from_iterable(zip(chunk.keys, chunk.values) for chunk in self.chunks)
+
+    def values(self) -> Iterator[ValueType]:
+        """Iterate over values of all items in order."""
+        if len(self.chunks) == 1:
+            return iter(self.chunks[0].values)
+        return itertools.chain.from_iterable(chunk.values for chunk in self.chunks)
+
+    def index(self, key: KeyType) -> int:
+        """Get position of the key, number of keys lower than the key."""
+        if not self.chunks:
+            return 0
+        chunk_index, position = self._locate(key)
+        return sum(len(chunk.keys) for chunk in itertools.islice(self.chunks, chunk_index)) + position
+
+    def keys_between(self, start: int, end: int) -> List[KeyType]:
+        """Get keys on positions from start to end."""
+        keys: List[KeyType] = []
+        for chunk in self.chunks:
+            if end <= 0:
+                break
+            if start < len(chunk.keys):
+                keys.extend(chunk.keys[max(0, start):end])
+            start, end = start - len(chunk.keys), end - len(chunk.keys)
+        return keys
+
+    def key_at(self, position: int) -> KeyType:
+        """Get key on given position, negative positions are counted from the end."""
+        if position < 0:
+            position += self.size
+        if position == self.size - 1:
+            return self.maxes[-1]
+        if not 0 <= position < self.size:
+            raise IndexError(position)
+        return self.keys_between(position, position + 1)[0]
 
 
 class IdList(Generic[IdItemType]):
-    """List of items with ID."""
+    """List of items with ID.
+
+    Items and their order keys are stored in a dictionary by item id, items are
+    stored in a sorted dictionary by their order key as well. Order keys define
+    order of items. Keys are spread with gaps, so an item can be
+    inserted to any position without changing keys of other items. When there's
+    no gap left, keys of items around the position are spread again, the range
+    is doubled until it has enough room.
+
+    Dictionaries are copy-on-write, copy of the list shares them until either
+    list changes them, so the copy takes constant time. Lookups by id are O(1),
+    adding, removing and moving an item and positional operations are O(√n).
+    """
+
+    __slots__ = ('owner', '_entries', '_order')
+
+    key_gap = 1 << 16
 
     def __init__(self) -> None:
-        self.items: List[IdItemType] = []
+        self.owner = object()
+        self._entries: CopyOnWriteDict[str, Tuple[int, IdItemType]] = CopyOnWriteDict(self.owner)
+        self._order: CopyOnWriteSortedDict[int, IdItemType] = CopyOnWriteSortedDict(self.owner)
+
+    @property
+    def items(self) -> List[IdItemType]:
+        """Get all items in list."""
+        return list(self)
 
     def get(self, key: str) -> Optional[IdItemType]:
         """Get item with given key or None."""
-        for item in self.items:
-            if item.id == key:
-                return item
+        if entry := self._entries.get(key):
+            return entry[1]
         return None
 
     def __iter__(self) -> Iterator[IdItemType]:
         """Iterate over all items in list."""
-        yield from self.items
+        return self._order.values()
 
     def serialize(self) -> List[Dict[str, Any]]:
         """Convert list to json."""
         return [item.serialize() for item in self]
 
+    def copy(self) -> 'IdList[IdItemType]':
+        """Create shallow copy of the list, neither list changes dictionaries shared with the other one."""
+        copy: IdList[IdItemType] = IdList()
+        copy._entries, copy._order = self._entries, self._order
+        self.owner = object()
+        return copy
+
+    def _edit(self) -> None:
+        """Get dictionaries owned by the list, copy those shared with other lists."""
+        self._entries = self._entries.edit(self.owner)
+        self._order = self._order.edit(self.owner)
+
     def __contains__(self, key: str) -> bool:
         """Return True if item with given key is present in list."""
-        for item in self:
-            if item.id == key:
-                return True
-        return False
+        return key in self._entries
 
     def __len__(self) -> int:
         """Get number of elements in list."""
-        return len(self.items)
+        return self._entries.size
 
     def index(self, item_id: str) -> Optional[int]:
         """Get index of item in list of None."""
-        for index, present_item in enumerate(self.items):
-            if present_item.id == item_id:
-                return index
+        if entry := self._entries.get(item_id):
+            return self._order.index(entry[0])
+        return None
+
+    def order_key(self, item_id: str) -> Optional[int]:
+        """Get order key of item, keys of items are ordered the same way as the items, None if item is missing."""
+        if entry := self._entries.get(item_id):
+            return entry[0]
         return None
 
+    def _new_key(self, index: int) -> int:
+        """Get order key for an item inserted before item on given index."""
+        if not self._order:
+            return 0
+        if index >= len(self._order):
+            return self._order.key_at(-1) + self.key_gap
+        if index == 0:
+            return self._order.key_at(0) - self.key_gap
+        previous, following = self._order.keys_between(index - 1, index + 1)
+        return (previous + following) // 2
+
+    def _is_full(self, index: int) -> bool:
+        """Return True if there's no order key left between item on given index and the previous one."""
+        if not 0 < index < len(self._order):
+            return False
+        previous, following = self._order.keys_between(index - 1, index + 1)
+        return following - previous < 2
+
+    def _key_range(self, start: int, end: int, gap: int) -> Tuple[int, int]:
+        """Get range of keys available to items between start and end, open ends can have given gaps."""
+        count = end - start
+        if start == 0 and end == len(self._order):
+            return -gap, count * gap
+        if start == 0:
+            return self._order.key_at(end) - (count + 1) * gap, self._order.key_at(end)
+        if end == len(self._order):
+            return self._order.key_at(start - 1), self._order.key_at(start - 1) + (count + 1) * gap
+        return self._order.key_at(start - 1), self._order.key_at(end)
+
+    def _spread(self, index: int) -> List[IdItemType]:
+        """Spread order keys of items around given index evenly, return the items.
+
+        Range of items is doubled until the average gap between keys is at least
+        `key_gap` divided by the number of items, whole list always has room.
+        """
+        size = 2
+        while True:
+            start, end = max(0, index - size // 2), min(len(self._order), index + size // 2)
+            gap = max(2, self.key_gap // size)
+            low, high = self._key_range(start, end, gap)
+            if (step := (high - low) // (end - start + 1)) >= gap:
+                break
+            size *= 2
+        items = [self._pop(order_key) for order_key in self._order.keys_between(start, end)]
+        for position, item in enumerate(items):
+            self._set(low + step * (position + 1), item)
+        return items
+
+    def _set(self, order_key: int, item: IdItemType) -> None:
+        """Set item with given order key."""
+        self._order[order_key] = item
+        self._entries[item.id] = (order_key, item)
+
+    def _pop(self, order_key: int) -> IdItemType:
+        """Remove item with given order key, return the item."""
+        item = self._order.get(order_key)
+        del self._order[order_key]
+        del self._entries[item.id]
+        return item
+
+    def insert(self, index: int, item: IdItemType) -> List[IdItemType]:
+        """Insert item before item on given index, return items that got new order keys to make room for it."""
+        if item.id in self._entries:
+            raise KeyError(f'Cannot insert item "{item.id}", key already exists.')
+        self._edit()
+        index = max(0, min(index, self._order.size))
+        spread = self._spread(index) if self._is_full(index) else []
+        self._set(self._new_key(index), item)
+        return spread
+
     def add(self, item: IdItemType) -> None:
-        """Add item to list."""
-        if item.id in self:
+        """Add item to the end of list."""
+        if item.id in self._entries:
             raise KeyError(f'Cannot insert item "{item.id}", key already exists.')
-        self.items.append(item)
+        self._edit()
+        self._set(self._order.key_at(-1) + self.key_gap if self._order.size else 0, item)
 
     def remove(self, item_id: str) -> None:
         """Remove item from list."""
-        if (index := self.index(item_id)) is not None:
-            del self.items[index]
+        if entry := self._entries.get(item_id):
+            self._edit()
+            self._pop(entry[0])
+
+    def move(self, item_id: str, index: int) -> List[IdItemType]:
+        """Move item to given index, return other items that got new order keys to make room for it.
+
+        Move takes O(√n) and O(√n) for each returned item, order keys are spread
+        only around the new position.
+        """
+        if (item := self.get(item_id)) is None:
+            raise KeyError(f'Item id "{item_id}" does\'t exist.')
+        self.remove(item_id)
+        return self.insert(index, item)
 
     def replace(self, item_id: str, item: IdItemType) -> None:
         """Replace item on given index with new item."""
-        if (index := self.index(item_id)) is None:
+        if item_id not in self:
             raise KeyError(f'Item id "{item_id}" does\'t exist.')
-        self.items[index] = item
+        if item.id != item_id and item.id in self:
+            raise KeyError(f'Cannot insert item "{item.id}", key already exists.')
+        self._edit()
+        order_key = self._entries[item_id][0]
+        self._pop(order_key)
+        self._set(order_key, item)
+
+
+class LruCache(Generic[KeyType, ValueType]):
+    """Mapping with limited size discarding the least recently used items."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.items: OrderedDict[KeyType, ValueType] = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: KeyType, default: Any = None) -> Any:
+        """Get item with given key and mark it as recently used. Return default if it's not present."""
+        try:
+            value = self.items[key]
+            self.items.move_to_end(key)
+        except KeyError:  # Item is missing or it was evicted by another thread
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key: KeyType, value: ValueType) -> None:
+        """Insert item, discard the least recently used item if cache is full."""
+        if self.max_size > 0:
+            self.items[key] = value
+            try:
+                self.items.move_to_end(key)
+                if len(self.items) > self.max_size:
+                    self.items.popitem(last=False)
+                    self.evictions += 1
+            except KeyError:  # Item was evicted by another thread
+                pass
+
+    def clear(self) -> None:
+        """Remove all items from cache."""
+        self.items.clear()
+
+    def __len__(self) -> int:
+        """Get number of items in cache."""
+        return len(self.items)
+
+    def serialize(self) -> Dict[str, int]:
+        """Convert cache statistics to json."""
+        return {
+            'size': len(self),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+class UsageCounter:
+    """Counter of uses of an object.
+
+    Counter lives in memory of the process. Subclasses may keep the value elsewhere,
+    eg. in memory shared by multiple processes.
+    """
+
+    __slots__ = ('count',)
+
+    def __init__(self, count: int = 0) -> None:
+        self.count = count
+
+    def get(self) -> int:
+        """Get current value of the counter."""
+        return self.count
+
+    def set(self, value: int) -> None:
+        """Set value of the counter."""
+        self.count = value
+
+    def add(self, delta: int = 1) -> int:
+        """Add delta to the counter, return the new value."""
+        self.count += delta
+        return self.count
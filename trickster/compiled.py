@@ -0,0 +1,70 @@
+"""Routes compiled to a binary snapshot loaded without parsing and validating them again."""
+
+import hashlib
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from trickster.loader import RoutesFiles
+from trickster.routing.router import Router, RouterSnapshot
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'TRICKSTER-ROUTES\n'
+
+# Version of the snapshot format, it has to be increased whenever pickled classes change.
+FORMAT_VERSION = 3
+
+
+def hash_file(path: Path) -> str:
+    """Get SHA-256 hash of file content."""
+    digest = hashlib.sha256()
+    with path.open('rb') as source_file:
+        while chunk := source_file.read(1 << 16):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_sources(pattern: str) -> List[Tuple[str, str]]:
+    """Get paths and hashes of all routes files matching the pattern."""
+    return [(str(path), hash_file(path)) for path in RoutesFiles(pattern).find_paths()]
+
+
+def compile_routes(pattern: str, output: Path) -> RouterSnapshot:
+    """Validate and compile Routes from files, save them to a binary snapshot."""
+    header = {'format': FORMAT_VERSION, 'pattern': pattern, 'sources': hash_sources(pattern)}
+    snapshot = Router().compile(RoutesFiles(pattern), keep_definitions=True)
+    temp_path = output.with_name(f'{output.name}.{os.getpid()}')
+    with temp_path.open('wb') as snapshot_file:
+        snapshot_file.write(MAGIC)
+        pickle.dump(header, snapshot_file, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(snapshot, snapshot_file, pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, output)
+    return snapshot
+
+
+def is_fresh(header: Dict[str, Any], pattern: Optional[str]) -> bool:
+    """Return True if snapshot was compiled from current version of the routes files."""
+    return all([
+        header.get('format') == FORMAT_VERSION,
+        pattern is None or header.get('pattern') == pattern,
+        header.get('sources') == hash_sources(header['pattern'])
+    ])
+
+
+def load_compiled_routes(path: Path, pattern: Optional[str] = None) -> Optional[RouterSnapshot]:
+    """Load snapshot of Routes, return None if it's missing, invalid or compiled from other routes files."""
+    try:
+        with path.open('rb') as snapshot_file:
+            if snapshot_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError('File is not a routes snapshot.')
+            if not is_fresh(pickle.load(snapshot_file), pattern):
+                logger.warning('Routes snapshot %s is stale, loading routes files.', path)
+                return None
+            return pickle.load(snapshot_file)
+    except Exception as error:
+        logger.warning('Routes snapshot %s cannot be loaded, loading routes files: %s', path, error)
+        return None
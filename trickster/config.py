@@ -1,11 +1,10 @@
 """Functionality for handling configuration."""
 
-import json
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Optional
 
+from trickster.loader import RoutesFiles
 from trickster.sys import get_env
-from trickster.validation import validate_json
 
 
 class Config:
@@ -22,16 +21,42 @@ class Config:
     TESTING = False
     DEFAULT_INTERNAL_PREFIX = '/internal'
     DEFAULT_PORT = 8080
+    DEFAULT_ROUTE_INDEX = 'trie'
+    DEFAULT_ROUTE_ORDER = 'definition'
+    DEFAULT_MATCH_CACHE_SIZE = 1024
+    DEFAULT_MATCH_TIME_BUDGET = 0
+    DEFAULT_WORKERS = 1
+    DEFAULT_SHARED_STATE_SIZE = 1 << 20
 
     def __init__(
         self,
         internal_prefix: Optional[str] = None,
         port: Optional[int] = None,
-        routes_path: Optional[str] = None
+        routes_path: Optional[str] = None,
+        routes_snapshot_path: Optional[str] = None,
+        route_index: Optional[str] = None,
+        route_order: Optional[str] = None,
+        match_cache_size: Optional[int] = None,
+        match_time_budget: Optional[float] = None,
+        lazy_routes: Optional[bool] = None,
+        workers: Optional[int] = None,
+        preload: Optional[bool] = None,
+        shared_state_path: Optional[str] = None,
+        shared_state_size: Optional[int] = None
     ):
         self._internal_prefix = internal_prefix
         self._port = port
         self._routes_path = routes_path
+        self._routes_snapshot_path = routes_snapshot_path
+        self._route_index = route_index
+        self._route_order = route_order
+        self._match_cache_size = match_cache_size
+        self._match_time_budget = match_time_budget
+        self._lazy_routes = lazy_routes
+        self._workers = workers
+        self._preload = preload
+        self._shared_state_path = shared_state_path
+        self._shared_state_size = shared_state_size
 
     def _coalesce(self, *values: Any) -> Any:
         """Return first value from all arguments that doesn't evaluate to None."""
@@ -39,6 +64,10 @@ class Config:
             if value is not None:
                 return value
 
+    def _to_bool(self, value: Any) -> bool:
+        """Convert flag from environment variable to bool."""
+        return value if isinstance(value, bool) else value.lower() in ('1', 'true', 'yes', 'on')
+
     @property
     def INTERNAL_PREFIX(self) -> str:  # noqa: N802
         """Get url prefix for configuration routes."""
@@ -59,22 +88,92 @@ class Config:
 
     @property
     def ROUTES_PATH(self) -> Optional[Path]:  # noqa: N802
-        """Get path to json file containing default routes."""
+        """Get path, directory or glob pattern of files containing default routes."""
         if str_path := self._coalesce(self._routes_path, get_env('TRICKSTER_ROUTES')):
             return Path(str_path)
         return None
 
     @property
-    def DEFAULT_ROUTES(self) -> List[Dict[str, Any]]:
-        """Get default routes."""
+    def ROUTES_SNAPSHOT(self) -> Optional[Path]:  # noqa: N802
+        """Get path to binary snapshot of compiled default routes."""
+        if str_path := self._coalesce(self._routes_snapshot_path, get_env('TRICKSTER_ROUTES_SNAPSHOT')):
+            return Path(str_path)
+        return None
+
+    @property
+    def ROUTE_INDEX(self) -> str:  # noqa: N802
+        """Get name of the index used to match routes."""
+        return self._coalesce(
+            self._route_index,
+            get_env('TRICKSTER_ROUTE_INDEX'),
+            self.DEFAULT_ROUTE_INDEX
+        )
+
+    @property
+    def ROUTE_ORDER(self) -> str:  # noqa: N802
+        """Get order in which Routes with the same priority are matched."""
+        return self._coalesce(
+            self._route_order,
+            get_env('TRICKSTER_ROUTE_ORDER'),
+            self.DEFAULT_ROUTE_ORDER
+        )
+
+    @property
+    def MATCH_CACHE_SIZE(self) -> int:  # noqa: N802
+        """Get maximal number of cached results of route matching."""
+        return int(self._coalesce(
+            self._match_cache_size,
+            get_env('TRICKSTER_MATCH_CACHE_SIZE'),
+            self.DEFAULT_MATCH_CACHE_SIZE
+        ))
+
+    @property
+    def MATCH_TIME_BUDGET(self) -> float:  # noqa: N802
+        """Get maximal time in milliseconds matching path of a route may take, 0 disables timing of matches."""
+        return float(self._coalesce(
+            self._match_time_budget,
+            get_env('TRICKSTER_MATCH_TIME_BUDGET'),
+            self.DEFAULT_MATCH_TIME_BUDGET
+        ))
+
+    @property
+    def LAZY_ROUTES(self) -> bool:  # noqa: N802
+        """Get whether responses and auth of default routes are deserialized only when they are needed."""
+        return self._to_bool(self._coalesce(self._lazy_routes, get_env('TRICKSTER_LAZY_ROUTES'), False))
+
+    @property
+    def WORKERS(self) -> int:  # noqa: N802
+        """Get number of worker processes serving requests."""
+        return int(self._coalesce(
+            self._workers,
+            get_env('TRICKSTER_WORKERS'),
+            self.DEFAULT_WORKERS
+        ))
+
+    @property
+    def PRELOAD(self) -> bool:  # noqa: N802
+        """Get whether the app is loaded once before worker processes are forked."""
+        return self._to_bool(self._coalesce(self._preload, get_env('TRICKSTER_PRELOAD'), False))
+
+    @property
+    def SHARED_STATE(self) -> Optional[Path]:  # noqa: N802
+        """Get path to file with state of Routes shared by worker processes."""
+        if str_path := self._coalesce(self._shared_state_path, get_env('TRICKSTER_SHARED_STATE')):
+            return Path(str_path)
+        return None
+
+    @property
+    def SHARED_STATE_SIZE(self) -> int:  # noqa: N802
+        """Get maximal number of usage counters in shared state."""
+        return int(self._coalesce(
+            self._shared_state_size,
+            get_env('TRICKSTER_SHARED_STATE_SIZE'),
+            self.DEFAULT_SHARED_STATE_SIZE
+        ))
+
+    @property
+    def DEFAULT_ROUTES(self) -> Iterable[Dict[str, Any]]:
+        """Get default routes, routes from file are read and validated one by one when iterated."""
         if path := self.ROUTES_PATH:
-            with path.open() as json_file:
-                routes = json.load(json_file)
-                self._validate_routes(routes)
-                return routes
+            return RoutesFiles(str(path))
         return []
-
-    def _validate_routes(self, routes: List[Dict[str, Any]]) -> None:
-        """Validate default routes."""
-        for route in routes:
-            validate_json(route, 'route.schema.json')
@@ -2,28 +2,47 @@
 
 from __future__ import annotations
 
+import json
+
 from flask import Blueprint, Response, abort, current_app, request
 
 from trickster.routing import ResponseContext
 from trickster.routing.auth import AuthenticationError
 from trickster.routing.input import HTTP_METHODS, IncomingFlaskRequest
 
+from werkzeug.exceptions import NotFound
+
 
 endpoints = Blueprint('external_api', __name__)
 
+# Body of response returned when no Route matches, rendered in advance
+# so unmatched requests don't have to go through error handlers.
+NOT_FOUND_BODY = json.dumps({
+    'error': NotFound().name,
+    'message': NotFound.description
+}).encode('utf-8')
+
+
+NOT_FOUND_HEADERS = [('Content-Type', 'application/json'), ('Content-Length', str(len(NOT_FOUND_BODY)))]
+
+# Content type of Responses without Content-Type header, the same as Flask uses.
+DEFAULT_CONTENT_TYPE = 'text/html; charset=utf-8'
+
+
+def not_found() -> Response:
+    """Create response returned when no Route matches the request."""
+    return Response(NOT_FOUND_BODY, status=404, content_type='application/json')
+
 
 @endpoints.route('/<path:path>', methods=HTTP_METHODS)
 def respond(path: str) -> Response:
     """Match request againts defined routes and return appropriet response."""
     incomming_request = IncomingFlaskRequest(request)
     try:
-        if route := current_app.user_router.match(incomming_request):
-            route.authenticate(incomming_request)
-            response = route.select_response()
-            route.use(response)
+        if response := current_app.user_router.consume(incomming_request):
             response.wait()
             context = ResponseContext({})
             return response.as_flask_response(context)
-        abort(404)
+        return not_found()
     except AuthenticationError as error:
         abort(401, str(error))
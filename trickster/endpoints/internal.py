@@ -4,10 +4,13 @@ from __future__ import annotations
 
 from flask import Blueprint, Response, abort, current_app, jsonify, make_response, request
 
-from trickster.routing import RouteConfigurationError
+from trickster.loader import decompress, parse_routes, validate_routes
+from trickster.routing import InvalidRoutesError, RouteConfigurationError
 from trickster.routing.input import IncomingTestRequest
 from trickster.validation import request_schema
 
+from werkzeug.exceptions import BadRequest
+
 
 endpoints = Blueprint('internal_api', __name__)
 
@@ -19,10 +22,27 @@ def reset() -> Response:
     return make_response('', 204)
 
 
+@endpoints.route('/snapshots/<string:name>', methods=['POST'])
+def save_snapshot(name: str) -> Response:
+    """Save current Routes and their usage under given name."""
+    current_app.user_router.save_snapshot(name)
+    return make_response('', 204)
+
+
+@endpoints.route('/snapshots/<string:name>/restore', methods=['POST'])
+def restore_snapshot(name: str) -> Response:
+    """Restore Routes and their usage saved under given name."""
+    try:
+        current_app.user_router.restore_snapshot(name)
+        return make_response('', 204)
+    except RouteConfigurationError as error:
+        abort(error.http_code, str(error))
+
+
 @endpoints.route('/routes', methods=['GET'])
 def get_all_routes() -> Response:
     """Get list of configured Routes."""
-    return jsonify(current_app.user_router.routes.serialize())
+    return jsonify(current_app.user_router.serialize())
 
 
 @endpoints.route('/routes', methods=['POST'])
@@ -36,6 +56,24 @@ def add_route() -> Response:
         abort(error.http_code, str(error))
 
 
+@endpoints.route('/routes/bulk', methods=['POST'])
+def add_routes() -> Response:
+    """Create multiple routes at once, either all of them or none."""
+    try:
+        routes = parse_routes(decompress(request.get_data(), request.headers.get('Content-Encoding')))
+        validate_routes(routes)
+        added = current_app.user_router.add_routes(routes)
+        return make_response(jsonify([route.id for route in added]), 201)
+    except InvalidRoutesError as error:
+        return make_response(jsonify({
+            'error': BadRequest().name,
+            'message': str(error),
+            'errors': [{'index': index, 'message': message} for index, message in error.errors.items()]
+        }), 400)
+    except RouteConfigurationError as error:
+        abort(error.http_code, str(error))
+
+
 @endpoints.route('/routes', methods=['DELETE'])
 def remove_all_routes() -> Response:
     """Reset router configuration."""
@@ -62,6 +100,17 @@ def replace_route(route_id: str) -> Response:
         abort(error.http_code, str(error))
 
 
+@endpoints.route('/routes/<string:route_id>/move', methods=['POST'])
+@request_schema('move.schema.json')
+def move_route(route_id: str) -> Response:
+    """Move route to given position."""
+    try:
+        current_app.user_router.move_route(route_id, request.get_json()['position'])
+        return make_response('', 204)
+    except RouteConfigurationError as error:
+        abort(error.http_code, str(error))
+
+
 @endpoints.route('/routes/<string:route_id>', methods=['DELETE'])
 def remove_route(route_id: str) -> Response:
     """Remove route by id."""
@@ -79,7 +128,9 @@ def match_route() -> Response:
     incoming_request = IncomingTestRequest(
         base_url=request.host_url,
         full_path=payload['path'],
-        method=payload['method']
+        method=payload['method'],
+        headers={name.title(): value for name, value in payload.get('headers', {}).items()},
+        cookies=payload.get('cookies')
     )
 
     if route := current_app.user_router.match(incoming_request):
@@ -87,6 +138,12 @@ def match_route() -> Response:
     abort(404, 'No route was matched.')
 
 
+@endpoints.route('/stats', methods=['GET'])
+def get_stats() -> Response:
+    """Get statistics of the router."""
+    return jsonify(current_app.user_router.stats())
+
+
 @endpoints.route('/routes/<string:route_id>/responses', methods=['GET'])
 def get_all_responses(route_id: str) -> Response:
     """Get all responses from given route."""
@@ -0,0 +1,369 @@
+"""Loading of Routes from JSON and NDJSON documents."""
+
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import zlib
+from multiprocessing import Process, Queue
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+import fastjsonschema
+
+from trickster.routing import DuplicateRouteError, InvalidRoutesError
+from trickster.sys import multi_glob
+from trickster.validation import compile_json_schema, get_schema_path
+
+
+logger = logging.getLogger(__name__)
+
+# Number of characters read from a file at once.
+READ_SIZE = 1 << 16
+
+# Maximal size of decompressed request body in bytes.
+MAX_DECOMPRESSED_SIZE = 1 << 28
+
+# Window bits of zlib decompressor expecting gzip header.
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+# Number of Routes loaded from a file between two progress messages.
+PROGRESS_INTERVAL = 10000
+
+# Number of Routes a worker process sends at once and number of such chunks waiting for the main process.
+CHUNK_SIZE = 1000
+CHUNKS_IN_FLIGHT = 4
+
+# Seconds between checks whether a worker process loading routes files is still alive.
+WORKER_POLL_INTERVAL = 1.0
+
+# Suffixes of files loaded from a directory of routes files.
+ROUTES_FILE_SUFFIXES = ('.json', '.ndjson', '.jsonl')
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def decompress(data: bytes, content_encoding: Optional[str] = None, max_size: Optional[int] = None) -> bytes:
+    """Decompress gzip encoded data, reject data bigger than `max_size` bytes when decompressed.
+
+    Size is limited by `MAX_DECOMPRESSED_SIZE` by default.
+    """
+    if content_encoding != 'gzip':
+        return data
+    max_size = max_size or MAX_DECOMPRESSED_SIZE
+    chunks = []
+    size = 0
+    try:
+        while data:
+            chunk, data = _decompress_member(data, max_size - size + 1)
+            size += len(chunk)
+            if size > max_size:
+                raise InvalidRoutesError(f'Decompressed data are bigger than {max_size} bytes.')
+            chunks.append(chunk)
+    except zlib.error as error:
+        raise InvalidRoutesError(f'Invalid gzip data: {error}')
+    return b''.join(chunks)
+
+
+def _decompress_member(data: bytes, max_length: int) -> Tuple[bytes, bytes]:
+    """Decompress at most `max_length` bytes of the first member of gzip data, return them and the rest of input."""
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    chunk = decompressor.decompress(data, max_length)
+    if len(chunk) >= max_length:
+        return chunk, b''
+    if not decompressor.eof:
+        raise InvalidRoutesError('Invalid gzip data: Compressed data ended before the end-of-stream marker.')
+    return chunk, decompressor.unused_data
+
+
+def parse_routes(data: bytes) -> List[Any]:
+    """Parse JSON array or NDJSON document containing one Route per line."""
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError as error:
+        raise InvalidRoutesError(f'Invalid UTF-8 data: {error}')
+    if text.lstrip().startswith('['):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as error:
+            raise InvalidRoutesError(f'Invalid JSON: {error}')
+    return parse_ndjson(text)
+
+
+def parse_ndjson(text: str) -> List[Any]:
+    """Parse NDJSON document, empty lines are skipped."""
+    routes = []
+    errors: Dict[int, str] = {}
+    for number, line in enumerate(text.splitlines(), 1):
+        if line.strip():
+            try:
+                routes.append(json.loads(line))
+            except json.JSONDecodeError as error:
+                errors[len(routes)] = f'Line {number}: {error}'
+                routes.append(None)
+    if errors:
+        raise InvalidRoutesError(f'{len(errors)} of {len(routes)} lines are not valid JSON.', errors)
+    return routes
+
+
+def validate_routes(routes: List[Any]) -> None:
+    """Validate all Routes, report errors of every invalid Route."""
+    validator = compile_json_schema(get_schema_path('route.schema.json'))
+    errors: Dict[int, str] = {}
+    for index, route in enumerate(routes):
+        try:
+            validator(route)
+        except fastjsonschema.JsonSchemaException as error:
+            errors[index] = error.message
+    if errors:
+        raise InvalidRoutesError(f'{len(errors)} of {len(routes)} Routes are invalid.', errors)
+
+
+class JsonArrayReader:
+    """Reads items of a JSON array from a file one by one.
+
+    File is read in chunks, only the chunk containing the current item is kept
+    in memory, so arrays much bigger than available memory can be read.
+    """
+
+    def __init__(self, routes_file: TextIO, buffer: str = '', line: int = 1) -> None:
+        self.file = routes_file
+        self.decoder = json.JSONDecoder()
+        self.buffer = buffer
+        self.position = 0
+        self.line = line
+        self.counted = 0
+        self.eof = False
+
+    def _read(self, size: int = 0) -> bool:
+        """Read next chunk of at least READ_SIZE characters, drop the part of buffer that was already parsed."""
+        chunk = self.file.read(max(size, READ_SIZE))
+        self.eof = not chunk
+        self._count_lines()
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        self.counted = 0
+        return not self.eof
+
+    def _count_lines(self) -> int:
+        """Get number of line at current position."""
+        self.line += self.buffer.count('\n', self.counted, self.position)
+        self.counted = self.position
+        return self.line
+
+    def _error(self, message: str, position: Optional[int] = None) -> InvalidRoutesError:
+        """Create error of invalid JSON at given position of buffer."""
+        line = self._count_lines() + self.buffer.count('\n', self.position, position or self.position)
+        return InvalidRoutesError(f'Line {line}: {message}')
+
+    def _peek(self) -> str:
+        """Skip whitespace and get next character, return empty string at the end of file."""
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()  # type: ignore
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._read():
+                return ''
+
+    def _expect(self, characters: str) -> str:
+        """Consume one of given characters."""
+        character = self._peek()
+        if not character or character not in characters:
+            raise self._error(f'Expecting one of "{characters}".')
+        self.position += 1
+        return character
+
+    def _item(self) -> Any:
+        """Consume next item of the array, read more of the file if the item is not complete.
+
+        Every read at least doubles the unparsed part of the buffer, so an item
+        spanning many chunks is parsed only a few times, not once per chunk.
+        """
+        while True:
+            try:
+                item, end = self.decoder.raw_decode(self.buffer, self.position)
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return item
+            except json.JSONDecodeError as error:
+                if self.eof:
+                    raise self._error(error.msg, error.pos)
+            self._read(len(self.buffer) - self.position)
+
+    def __iter__(self) -> Iterator[Tuple[int, Any]]:
+        """Iterate over items of the array with numbers of lines where they start."""
+        self._expect('[')
+        if self._peek() == ']':
+            self.position += 1
+        else:
+            while True:
+                self._peek()
+                yield self._count_lines(), self._item()
+                if self._expect(',]') == ']':
+                    break
+        if self._peek():
+            raise self._error('Unexpected data after the end of array.')
+
+
+def read_ndjson(lines: Iterable[str], first_line: int = 1) -> Iterator[Tuple[int, Any]]:
+    """Read NDJSON lines one by one, yield items with numbers of their lines."""
+    for number, line in enumerate(lines, first_line):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as error:
+                raise InvalidRoutesError(f'Line {number}: {error}')
+
+
+def read_documents(routes_file: TextIO) -> Iterator[Tuple[int, Any]]:
+    """Read items of a JSON array or NDJSON file one by one, yield them with numbers of lines where they start."""
+    for number, line in enumerate(routes_file, 1):
+        if line.strip():
+            break
+    else:
+        return
+    if line.lstrip().startswith('['):
+        yield from JsonArrayReader(routes_file, line, number)
+    else:
+        yield from read_ndjson(itertools.chain([line], routes_file), number)
+
+
+class RoutesFile:
+    """Routes stored in a JSON array or NDJSON file.
+
+    Routes are read and validated one by one every time the file is iterated,
+    the whole document is never loaded to memory.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over valid Routes, raise error on the first invalid one."""
+        count = 0
+        with self.path.open() as routes_file:
+            try:
+                for route in self._validate(read_documents(routes_file)):
+                    yield route
+                    count += 1
+                    if not count % PROGRESS_INTERVAL:
+                        logger.info('Loaded %d routes from %s.', count, self.path)
+            except InvalidRoutesError as error:
+                raise InvalidRoutesError(f'Invalid routes file {self.path}. {error}')
+        logger.info('Loaded all %d routes from %s.', count, self.path)
+
+    @staticmethod
+    def _validate(documents: Iterable[Tuple[int, Any]]) -> Iterator[Dict[str, Any]]:
+        """Validate Routes one by one."""
+        validator = compile_json_schema(get_schema_path('route.schema.json'))
+        for line, route in documents:
+            try:
+                validator(route)
+            except fastjsonschema.JsonSchemaException as error:
+                raise InvalidRoutesError(f'Line {line}: {error.message}')
+            yield route
+
+
+def stream_routes_files(paths: List[Path], chunks: 'Queue[Union[List[Dict[str, Any]], Exception, None]]') -> None:
+    """Read and validate Routes of files one by one, put them to the queue in chunks of at most CHUNK_SIZE Routes.
+
+    End of every file is marked by None, reading stops at the first error, which is put to the queue instead.
+    """
+    for path in paths:
+        routes = iter(RoutesFile(path))
+        try:
+            while chunk := list(itertools.islice(routes, CHUNK_SIZE)):
+                chunks.put(chunk)
+        except Exception as error:
+            chunks.put(error)
+            return
+        chunks.put(None)
+
+
+class RoutesFiles:
+    """Routes stored in files matched by glob patterns or directories.
+
+    Multiple patterns are separated by `os.pathsep`. Directories are searched
+    for files with routes suffixes, files are loaded in order of patterns and
+    sorted paths. Multiple files are parsed and validated in parallel by worker
+    processes, a single file is streamed in the current process.
+
+    Every worker reads every n-th file and sends its Routes in bounded chunks
+    through its own queue of limited size, so the main process holds at most a
+    few chunks per worker no matter how big the files are. Routes are yielded
+    in order of the files as soon as their chunk arrives.
+    """
+
+    def __init__(self, patterns: str, max_workers: Optional[int] = None) -> None:
+        self.patterns = patterns
+        self.max_workers = max_workers
+
+    def find_paths(self) -> List[Path]:
+        """Find all routes files, raise error if some pattern doesn't match any."""
+        paths: Dict[Path, None] = {}
+        for pattern in self.patterns.split(os.pathsep):
+            if not (matches := sorted(multi_glob(pattern))):
+                raise FileNotFoundError(f'No routes files match "{pattern}".')
+            for match in map(Path, matches):
+                paths.update(dict.fromkeys(self._expand(match)))
+        return list(paths)
+
+    @staticmethod
+    def _expand(path: Path) -> List[Path]:
+        """Get routes files in a directory, or the path itself if it's a file."""
+        if path.is_dir():
+            return sorted(child for child in path.iterdir() if child.suffix in ROUTES_FILE_SUFFIXES)
+        return [path]
+
+    def _load(self, paths: List[Path]) -> Iterator[Tuple[Path, Iterable[Dict[str, Any]]]]:
+        """Load Routes of all files, yield them in order of the files."""
+        workers = min(self.max_workers or os.cpu_count() or 1, len(paths))
+        if workers <= 1:
+            yield from ((path, RoutesFile(path)) for path in paths)
+            return
+        queues: List[Queue] = [Queue(CHUNKS_IN_FLIGHT) for _ in range(workers)]
+        processes = [
+            Process(target=stream_routes_files, args=(paths[index::workers], queues[index]), daemon=True)
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for index, path in enumerate(paths):
+                yield path, self._receive(path, queues[index % workers], processes[index % workers])
+        finally:
+            for process in processes:
+                process.terminate()
+                process.join()
+
+    @staticmethod
+    def _get(path: Path, chunks: Queue, process: Process) -> Union[List[Dict[str, Any]], Exception, None]:
+        """Wait for next chunk of a file from worker process, raise error if the worker died."""
+        while True:
+            try:
+                return chunks.get(timeout=WORKER_POLL_INTERVAL)
+            except queue.Empty:
+                if not process.is_alive() and chunks.empty():
+                    raise ChildProcessError(f'Process loading {path} exited unexpectedly.')
+
+    def _receive(self, path: Path, chunks: Queue, process: Process) -> Iterator[Dict[str, Any]]:
+        """Receive Routes of a file from worker process, raise error the worker put to the queue instead."""
+        while (chunk := self._get(path, chunks, process)) is not None:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield from chunk
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over Routes of all files, raise error if the same Route id is defined twice."""
+        defined_in: Dict[str, Path] = {}
+        for path, routes in self._load(self.find_paths()):
+            for route in routes:
+                if (route_id := route.get('id')) is not None:
+                    if route_id in defined_in:
+                        raise DuplicateRouteError(
+                            f'Route id "{route_id}" in {path} is already defined in {defined_in[route_id]}.'
+                        )
+                    defined_in[route_id] = path
+                yield route
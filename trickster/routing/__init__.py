@@ -2,14 +2,16 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import random
 import time
-from typing import Any, Dict, List, Optional, Type, TypeVar, Union
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar, Union
 
 import flask
 
 from trickster import TricksterException
+from trickster.collections import UsageCounter
 
 
 class RouteConfigurationError(TricksterException, ValueError):
@@ -30,6 +32,30 @@ class MissingRouteError(RouteConfigurationError):
     http_code: int = 404
 
 
+class MissingSnapshotError(RouteConfigurationError):
+    """Raised when routes could not be restored because the snapshot doesn't exist."""
+
+    http_code: int = 404
+
+
+class InvalidRoutesError(RouteConfigurationError):
+    """Raised when some of Routes configured at once are invalid, none of them is configured."""
+
+    def __init__(self, message: str, errors: Optional[Dict[int, str]] = None) -> None:
+        super().__init__(message)
+        self.errors = errors or {}
+
+
+class SharedStateFullError(RouteConfigurationError):
+    """Raised when route could not be configured because there is no space left for its counters."""
+
+    http_code: int = 507
+
+
+class UnsafePathError(RouteConfigurationError):
+    """Raised when route could not be configured because matching its path may take exponential time."""
+
+
 class AuthenticationError(TricksterException):
     """Exception raised when user could not be authenticated."""
 
@@ -51,10 +77,17 @@ class Delay:
             return self.min_delay  # Express delay as one number
         return [self.min_delay, self.max_delay]
 
+    def duration(self) -> float:
+        """Get random amount of time withing the specified range."""
+        return random.uniform(self.min_delay, self.max_delay)
+
     def wait(self) -> None:
         """Put program to sleep for random amount of time withing the specified range."""
-        wait_time = random.uniform(self.min_delay, self.max_delay)
-        time.sleep(wait_time)
+        time.sleep(self.duration())
+
+    async def wait_async(self) -> None:
+        """Suspend coroutine for random amount of time withing the specified range."""
+        await asyncio.sleep(self.duration())
 
     @classmethod
     def deserialize(cls, data: Union[Optional[List[float]], float]) -> Delay:
@@ -85,7 +118,18 @@ class Response:
         self.delay = delay
         self.headers = headers or {}
         self.status = status
-        self.used_count = 0
+        self.counter = UsageCounter()
+        self.render()
+
+    def render(self) -> None:
+        """Encode body and headers of the response in advance so it can be returned repeatedly.
+
+        Body of a response doesn't depend on the request, so it is serialized only once.
+        """
+        self.content = self.serialize_body(ResponseContext({})).encode('utf-8')
+        self.content_headers: List[Tuple[str, str]] = [(str(key), str(value)) for key, value in self.headers.items()]
+        if not any(key.lower() == 'content-length' for key, _ in self.content_headers):
+            self.content_headers.append(('Content-Length', str(len(self.content))))
 
     def serialize_body(self, context: ResponseContext) -> str:
         """Convert specified response body to string."""
@@ -97,9 +141,9 @@ class Response:
     def as_flask_response(self, context: ResponseContext) -> flask.Response:
         """Convert Request to flask.Response suitable to return from an endpoint."""
         return flask.Response(
-            response=self.serialize_body(context),
+            response=[self.content],
             status=self.status,
-            headers=self.headers
+            headers=self.content_headers
         )
 
     def serialize(self) -> Dict[str, Any]:
@@ -112,14 +156,23 @@ class Response:
             'body': self.body
         }
 
+    @property
+    def used_count(self) -> int:
+        """Number of times the Response was used."""
+        return self.counter.get()
+
     def use(self) -> None:
         """Increases usage counter of Response."""
-        self.used_count += 1
+        self.counter.add()
 
     def wait(self) -> None:
         """Sleep for time specified in the response."""
         self.delay.wait()
 
+    async def wait_async(self) -> None:
+        """Suspend coroutine for time specified in the response."""
+        await self.delay.wait_async()
+
     @classmethod
     def deserialize(cls: Type[ResponseType], data: Dict[str, Any]) -> ResponseType:
         """Convert json to Response."""
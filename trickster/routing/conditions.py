@@ -0,0 +1,180 @@
+"""Conditions on headers, query arguments and cookies of requests matched by Routes."""
+
+from __future__ import annotations
+
+import abc
+import enum
+import re
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from trickster.routing import RouteConfigurationError
+from trickster.routing.input import IncomingRequest
+from trickster.routing.path import nested_repeat
+
+
+class ConditionSource(enum.Enum):
+    """Part of a request containing values tested by Conditions."""
+
+    headers = 'headers'
+    args = 'args'
+    cookies = 'cookies'
+
+    def normalize(self, name: str) -> str:
+        """Get name of the value as incoming requests have it, header names are case insensitive."""
+        return name.title() if self is ConditionSource.headers else name
+
+    def get(self, request: IncomingRequest, name: str) -> Any:
+        """Get value with given normalized name from the request, None if the request doesn't have it."""
+        return getattr(request, self.value).get(name)
+
+
+class Condition(abc.ABC):
+    """Condition on a single header, query argument or cookie of a request."""
+
+    kind: str = ''
+    value_type: Type = object
+
+    def __init__(self, source: ConditionSource, name: str) -> None:
+        self.source = source
+        self.name = source.normalize(name)
+
+    def match(self, request: IncomingRequest) -> bool:
+        """Return True if the request meets the condition."""
+        return self.test(self.source.get(request, self.name))
+
+    @abc.abstractmethod
+    def test(self, value: Any) -> bool:
+        """Return True if the value meets the condition, value is None if the request doesn't have it."""
+
+    @abc.abstractmethod
+    def serialize(self) -> Any:
+        """Convert Condition to json value."""
+
+    @classmethod
+    def deserialize(cls, source: ConditionSource, name: str, data: Any) -> Condition:
+        """Convert json value to Condition, plain string is the exact value."""
+        if isinstance(data, str):
+            return EqualsCondition(source, name, data)
+        if isinstance(data, dict) and len(data) == 1:
+            kind, value = next(iter(data.items()))
+            for subclass in cls.__subclasses__():
+                if subclass.kind == kind and isinstance(value, subclass.value_type):
+                    return subclass(source, name, value)  # type: ignore
+        raise RouteConfigurationError(
+            f'Condition on {source.value} "{name}" has to be a string or an object with one of fields '
+            '"equals" (string), "present" (boolean) or "regex" (string).'
+        )
+
+
+class EqualsCondition(Condition):
+    """Value has to be equal to the given string."""
+
+    kind = 'equals'
+    value_type = str
+
+    def __init__(self, source: ConditionSource, name: str, value: str) -> None:
+        super().__init__(source, name)
+        self.value = value
+
+    def test(self, value: Any) -> bool:
+        """Return True if the value is equal to the expected one."""
+        return value == self.value
+
+    def serialize(self) -> str:
+        """Convert Condition to json value."""
+        return self.value
+
+
+class PresentCondition(Condition):
+    """Request has to contain the value, or it mustn't contain it."""
+
+    kind = 'present'
+    value_type = bool
+
+    def __init__(self, source: ConditionSource, name: str, present: bool) -> None:
+        super().__init__(source, name)
+        self.present = present
+
+    def test(self, value: Any) -> bool:
+        """Return True if the value is present or missing as expected."""
+        return (value is not None) is self.present
+
+    def serialize(self) -> Dict[str, bool]:
+        """Convert Condition to json value."""
+        return {'present': self.present}
+
+
+class RegexCondition(Condition):
+    """Beginning of the value has to match a regular expression, the same way path does."""
+
+    kind = 'regex'
+    value_type = str
+
+    def __init__(self, source: ConditionSource, name: str, pattern: str) -> None:
+        super().__init__(source, name)
+        try:
+            self.regex = re.compile(pattern)
+        except re.error as error:
+            raise RouteConfigurationError(f'Condition on {source.value} "{name}" is not a valid regex: {error}.')
+        if nested_repeat(self.regex):
+            raise RouteConfigurationError(
+                f'Condition on {source.value} "{name}" repeats a part that has its own unlimited repeat, '
+                'matching it may take exponential time.'
+            )
+
+    def test(self, value: Any) -> bool:
+        """Return True if the value matches the regular expression."""
+        return isinstance(value, str) and self.regex.match(value) is not None
+
+    def serialize(self) -> Dict[str, str]:
+        """Convert Condition to json value."""
+        return {'regex': self.regex.pattern}
+
+
+class RequestConditions:
+    """Conditions a request has to meet all at once to match a Route.
+
+    Conditions are tested from the cheapest, regular expressions go last. The
+    first condition requiring an exact value is the key router indexes the
+    Route by.
+    """
+
+    def __init__(self, conditions: Optional[List[Condition]] = None) -> None:
+        self.conditions = conditions or []
+        self.checks = sorted(self.conditions, key=lambda condition: isinstance(condition, RegexCondition))
+        self.key: Optional[Tuple[ConditionSource, str, str]] = next((
+            (condition.source, condition.name, condition.value)
+            for condition in self.conditions if isinstance(condition, EqualsCondition)
+        ), None)
+
+    def __len__(self) -> int:
+        """Get number of conditions."""
+        return len(self.conditions)
+
+    def match(self, request: IncomingRequest) -> bool:
+        """Return True if the request meets all conditions."""
+        for condition in self.checks:
+            if not condition.match(request):
+                return False
+        return True
+
+    def serialize(self) -> Dict[str, Dict[str, Any]]:
+        """Convert conditions to json, grouped by part of the request."""
+        data: Dict[str, Dict[str, Any]] = {}
+        for condition in self.conditions:
+            data.setdefault(condition.source.value, {})[condition.name] = condition.serialize()
+        return data
+
+    @classmethod
+    def deserialize(cls, data: Optional[Dict[str, Dict[str, Any]]] = None) -> RequestConditions:
+        """Convert json to conditions."""
+        conditions: List[Condition] = []
+        for source, values in (data or {}).items():
+            try:
+                condition_source = ConditionSource(source)
+            except ValueError:
+                raise RouteConfigurationError(
+                    f'Unknown condition source "{source}", use "headers", "args" or "cookies".'
+                )
+            conditions.extend(Condition.deserialize(condition_source, name, value) for name, value in values.items())
+        return cls(conditions)
@@ -0,0 +1,522 @@
+"""Index of Routes used to find candidates for matching a request."""
+
+from __future__ import annotations
+
+import abc
+import collections
+import copy
+import heapq
+import itertools
+import operator
+import re
+from typing import Any, Counter, Dict, Iterator, List, Optional, Set, TYPE_CHECKING, Tuple, Type
+
+from trickster import TricksterException
+from trickster.collections import CopyOnWrite, CopyOnWriteDict, CopyOnWriteSortedDict
+from trickster.routing.path import PathClass, literal_segments
+
+if TYPE_CHECKING:  # pragma: no cover
+    from trickster.routing.conditions import ConditionSource
+    from trickster.routing.input import IncomingRequest
+    from trickster.routing.router import Route
+
+
+# Routes are ordered by tuples, router orders them by priority and other parts of the route order first.
+Order = Tuple[int, ...]
+
+Entry = Tuple[Order, 'Route']
+
+# Routes sorted by their order.
+Entries = CopyOnWriteSortedDict[Order, 'Route']
+
+# Patterns referencing groups by number or name cannot be merged with other patterns.
+GROUP_REFERENCE = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+
+class TrieNode(CopyOnWrite):
+    """Node of a trie keyed by literal path segments, contains Routes sorted by their order."""
+
+    def __init__(self, owner: object) -> None:
+        super().__init__(owner)
+        self.entries: CopyOnWriteSortedDict[Order, Route] = CopyOnWriteSortedDict(owner)
+        self.children: CopyOnWriteDict[str, TrieNode] = CopyOnWriteDict(owner)
+
+    def child(self, segment: str) -> TrieNode:
+        """Get child node for given segment owned by owner of this node, create or copy it if needed."""
+        self.children = self.children.edit(self.owner)
+        return self.children.edit_item(segment, TrieNode)
+
+
+class PrefixFilter:
+    """Filter rejecting paths that cannot match any Route.
+
+    Filter remembers literal prefixes of path patterns up to the end of the first
+    path segment, eg. `/users/` for `/users/list`. Path can be matched only if
+    it starts with one of the prefixes. Prefixes are grouped by length, so the
+    test needs one set lookup per distinct length. Copy of the filter shares
+    prefixes with it, they are copied when either filter changes them.
+    """
+
+    def __init__(self) -> None:
+        self.owner = object()
+        self.prefixes: Dict[Optional[str], CopyOnWriteDict[str, int]] = {}
+        self.lengths: Dict[Optional[str], Counter[int]] = {}
+        self.rejections = 0
+
+    def copy(self) -> PrefixFilter:
+        """Create copy of the filter, neither filter changes prefixes shared with the other one."""
+        prefix_filter = copy.copy(self)
+        prefix_filter.owner, self.owner = object(), object()
+        prefix_filter.prefixes = dict(self.prefixes)
+        prefix_filter.lengths = dict(self.lengths)
+        return prefix_filter
+
+    @staticmethod
+    def _prefix(route: Route) -> str:
+        """Get prefix of the Route path pattern up to the end of the first segment."""
+        prefix = route.path_prefix
+        return prefix[:prefix.find('/', 1) + 1 or len(prefix)]
+
+    def _edit(self, method: Optional[str]) -> CopyOnWriteDict[str, int]:
+        """Get prefixes of Routes with given method owned by the filter, create or copy them if needed."""
+        prefixes = self.prefixes[method] = (self.prefixes.get(method) or CopyOnWriteDict(self.owner)).edit(self.owner)
+        return prefixes
+
+    def add(self, route: Route) -> None:
+        """Add prefix of Route to the filter."""
+        prefix = self._prefix(route)
+        lengths = collections.Counter(self.lengths.get(route.method))
+        lengths[len(prefix)] += 1
+        self.lengths[route.method] = lengths
+        prefixes = self._edit(route.method)
+        prefixes[prefix] = prefixes.get(prefix, 0) + 1
+
+    @staticmethod
+    def _decrement(counter: Any, key: Any) -> None:
+        """Decrement count of key, remove the key when it reaches zero."""
+        counter[key] -= 1
+        if not counter[key]:
+            del counter[key]
+
+    def remove(self, route: Route) -> None:
+        """Remove prefix of Route from the filter."""
+        prefix = self._prefix(route)
+        self._decrement(self._edit(route.method), prefix)
+        lengths = collections.Counter(self.lengths[route.method])
+        self._decrement(lengths, len(prefix))
+        self.lengths[route.method] = lengths
+
+    def _accepts(self, method: Optional[str], path: str) -> bool:
+        """Return True if path starts with any prefix of Routes with given method."""
+        if prefixes := self.prefixes.get(method):
+            for length in self.lengths[method]:
+                if path[:length] in prefixes:
+                    return True
+        return False
+
+    def covers(self, method: str, path: str) -> bool:
+        """Return True if any Route can match given method and path, without counting rejections."""
+        return self._accepts(method, path) or self._accepts(None, path)
+
+    def accepts(self, method: str, path: str) -> bool:
+        """Return True if any Route can match given method and path."""
+        if self.covers(method, path):
+            return True
+        self.rejections += 1
+        return False
+
+    def serialize(self) -> Dict[str, int]:
+        """Convert filter statistics to json."""
+        return {
+            'prefixes': sum(len(prefixes) for prefixes in self.prefixes.values()),
+            'rejections': self.rejections
+        }
+
+
+class RouteIndex(CopyOnWrite, abc.ABC):
+    """Index of Routes providing candidates for matching a request.
+
+    Every Route gets an order when it's added. Candidates are always returned
+    in this order so the first defined Route wins.
+
+    Index is copy-on-write, its owner changes it in place, `edit` creates copy
+    owned by someone else that shares all structures with the index until the
+    copy changes them. Changes of a copy take O(√n).
+    """
+
+    name: str = ''
+
+    def __init__(self, owner: Optional[object] = None) -> None:
+        super().__init__(object() if owner is None else owner)
+        self.order = itertools.count()
+        self.entries_by_id: CopyOnWriteDict[str, Entry] = CopyOnWriteDict(self.owner)
+
+    def add(self, route: Route, order: Optional[Order] = None) -> None:
+        """Add Route to the index.
+
+        Routes without explicit order are ordered after all previously added Routes.
+        """
+        if order is None:
+            order = (next(self.order),)
+        self.entries_by_id = self.entries_by_id.edit(self.owner)
+        self.entries_by_id[route.id] = (order, route)
+        self._insert(order, route)
+
+    def remove(self, route_id: str) -> Optional[Order]:
+        """Remove Route from the index. Return its order or None if it wasn't present."""
+        if (entry := self.entries_by_id.get(route_id)) is None:
+            return None
+        self.entries_by_id = self.entries_by_id.edit(self.owner)
+        del self.entries_by_id[route_id]
+        self._delete(*entry)
+        return entry[0]
+
+    def replace(self, route_id: str, route: Route) -> None:
+        """Replace Route with given id keeping its order."""
+        self.add(route, self.remove(route_id))
+
+    @abc.abstractmethod
+    def _insert(self, order: Order, route: Route) -> None:
+        """Insert Route with given order to the index."""
+
+    @abc.abstractmethod
+    def _delete(self, order: Order, route: Route) -> None:
+        """Delete Route with given order from the index."""
+
+    @abc.abstractmethod
+    def candidates(self, method: str, path: str) -> Iterator[Route]:
+        """Get Routes that could match given method and path, in order of definition."""
+
+    @classmethod
+    def names(cls) -> List[str]:
+        """Get names of all implementations."""
+        return [subclass.name for subclass in cls.__subclasses__()]
+
+    @classmethod
+    def find_implementation(cls, name: str) -> Type[RouteIndex]:
+        """Find implementation of index with given name."""
+        for subclass in cls.__subclasses__():
+            if subclass.name == name:
+                return subclass
+        raise TricksterException(f'Route index "{name}" doesn\'t exist.')
+
+
+class TrieRouteIndex(RouteIndex):
+    """Index of Routes by HTTP method and literal path segments.
+
+    Routes are split to buckets by HTTP method. Every bucket is a trie keyed
+    by complete literal segments at the beginning of the path pattern. Routes
+    without any literal prefix are stored in the root of the trie, so they are
+    candidates for any path. Routes with exact literal paths are not in the
+    trie at all, they are looked up by the whole path in a hash map.
+
+    Copy of the index copies only trie nodes on the path to the changed node.
+    """
+
+    name = 'trie'
+
+    def __init__(self, owner: Optional[object] = None) -> None:
+        super().__init__(owner)
+        self.tries: CopyOnWriteDict[Optional[str], TrieNode] = CopyOnWriteDict(self.owner)
+        self.literals: CopyOnWriteDict[Optional[str], CopyOnWriteDict[str, Entries]] = CopyOnWriteDict(self.owner)
+
+    def _insert(self, order: Order, route: Route) -> None:
+        """Insert Route to the literal map or the trie of its method."""
+        self._entries(route)[order] = route
+
+    def _entries(self, route: Route) -> Entries:
+        """Get entries of the literal path or the trie node of the Route owned by the index."""
+        if route.path_pattern.path_class is PathClass.literal:
+            return self._literal_entries(route.method, route.path_prefix)
+        node = self._trie_node(route.method, route.path_prefix)
+        node.entries = node.entries.edit(self.owner)
+        return node.entries
+
+    def _literal_entries(self, method: Optional[str], literal: str) -> Entries:
+        """Get entries of Routes with given method and literal path, create or copy them if needed."""
+        self.literals = self.literals.edit(self.owner)
+        return self.literals.edit_item(method, CopyOnWriteDict).edit_item(literal, CopyOnWriteSortedDict)
+
+    def _trie_node(self, method: Optional[str], prefix: str) -> TrieNode:
+        """Get trie node of Routes with given method and literal prefix, create or copy nodes on the path if needed."""
+        self.tries = self.tries.edit(self.owner)
+        node = self.tries.edit_item(method, TrieNode)
+        for segment in literal_segments(prefix):
+            node = node.child(segment)
+        return node
+
+    def _delete(self, order: Order, route: Route) -> None:
+        """Delete Route from the literal map or the trie node containing it."""
+        del self._entries(route)[order]
+
+    def _buckets(self, method: str, path: str) -> Iterator[Entries]:
+        """Get entries of all trie nodes on the given path."""
+        segments = path.split('/')
+        for trie_method in [method, None]:
+            node = self.tries.get(trie_method)
+            for segment in segments:
+                if node is None:
+                    break
+                yield node.entries
+                node = node.children.get(segment)
+            if node is not None:
+                yield node.entries
+        yield from self._literal_buckets(method, path)
+
+    def _literal_buckets(self, method: str, path: str) -> Iterator[Entries]:
+        """Get entries with literal paths matching the given path."""
+        for literal_method in [method, None]:
+            if literals := self.literals.get(literal_method):
+                if entries := literals.get(path):
+                    yield entries
+                if path.endswith('\n') and (entries := literals.get(path[:-1])):  # `$` matches before final newline
+                    yield entries
+
+    def candidates(self, method: str, path: str) -> Iterator[Route]:
+        """Get Routes from trie nodes on the given path and with the same literal path, in order of definition."""
+        buckets = [bucket for bucket in self._buckets(method, path) if bucket]
+        if len(buckets) == 1:
+            yield from buckets[0].values()
+            return
+        for _, route in heapq.merge(*[bucket.items() for bucket in buckets], key=operator.itemgetter(0)):
+            yield route
+
+
+class LinearRouteIndex(RouteIndex):
+    """Index returning all Routes as candidates."""
+
+    name = 'linear'
+
+    def __init__(self, owner: Optional[object] = None) -> None:
+        super().__init__(owner)
+        self.entries: Entries = CopyOnWriteSortedDict(self.owner)
+
+    def _insert(self, order: Order, route: Route) -> None:
+        """Insert Route to the list of all Routes."""
+        self.entries = self.entries.edit(self.owner)
+        self.entries[order] = route
+
+    def _delete(self, order: Order, route: Route) -> None:
+        """Delete Route from the list of all Routes."""
+        self.entries = self.entries.edit(self.owner)
+        del self.entries[order]
+
+    def candidates(self, method: str, path: str) -> Iterator[Route]:
+        """Get all Routes in order of definition."""
+        yield from self.entries.values()
+
+
+class AlternationChunk:
+    """Consecutive Routes with path patterns merged to a single regular expression.
+
+    Every pattern is wrapped in a named group. Regular expressions try alternatives
+    from left to right, so the matched group identifies the first Route with
+    matching pattern.
+    """
+
+    group_prefix = '_trickster_route_'
+
+    def __init__(self) -> None:
+        self.routes: List[Route] = []
+        self.group_names: Set[str] = set()
+        self.positions: Dict[Optional[str], int] = {}
+        self.pattern: Optional[re.Pattern] = None
+        self.mergeable = True
+
+    @staticmethod
+    def is_mergeable(pattern: re.Pattern) -> bool:
+        """Return True if pattern can be merged with other patterns."""
+        return all([
+            not pattern.flags & ~re.UNICODE,
+            not GROUP_REFERENCE.search(pattern.pattern)
+        ])
+
+    def accepts(self, route: Route) -> bool:
+        """Return True if pattern of given Route can be merged to this chunk."""
+        return all([
+            self.mergeable,
+            self.is_mergeable(route.path),
+            not self.group_names.intersection(route.path.groupindex),
+            not any(name.startswith(self.group_prefix) for name in route.path.groupindex)
+        ])
+
+    def append(self, route: Route) -> None:
+        """Append Route to the chunk."""
+        self.mergeable = self.accepts(route)
+        self.positions[f'{self.group_prefix}{len(self.routes)}'] = len(self.routes)
+        self.routes.append(route)
+        self.group_names.update(route.path.groupindex)
+
+    def compile(self) -> List[AlternationChunk]:
+        """Compile merged regular expression.
+
+        Returns list of chunks to be used instead of this one. If the merged
+        expression cannot be compiled, every Route gets its own chunk.
+        """
+        if len(self.routes) == 1:
+            self.pattern = self.routes[0].path
+            return [self]
+        try:
+            self.pattern = re.compile('|'.join(
+                f'(?P<{name}>{route.path.pattern})'
+                for name, route in zip(self.positions, self.routes)
+            ))
+        except re.error:
+            return [chunk for route in self.routes for chunk in AlternationChunk.single(route).compile()]
+        return [self]
+
+    def candidates(self, path: str) -> Iterator[Route]:
+        """Get the first Route with pattern matching the path followed by the rest of the chunk."""
+        assert self.pattern is not None
+        if match := self.pattern.match(path):
+            yield from self.routes[self.positions.get(match.lastgroup, 0):]
+
+    @classmethod
+    def single(cls, route: Route) -> AlternationChunk:
+        """Create chunk containing only the given Route."""
+        chunk = cls()
+        chunk.append(route)
+        return chunk
+
+
+class AlternationRouteIndex(RouteIndex):
+    """Index merging path patterns of all active Routes to regular expressions.
+
+    Patterns of Routes with the same method are joined to a single alternation,
+    so the regular expression engine finds the first matching Route in one pass.
+    Patterns that cannot be merged (group references, global flags or conflicting
+    group names) are split to separate chunks that are tried in order of definition.
+
+    The expressions are compiled lazily when generation of the index changes.
+    """
+
+    name = 'alternation'
+
+    def __init__(self, owner: Optional[object] = None) -> None:
+        super().__init__(owner)
+        self.entries: Entries = CopyOnWriteSortedDict(self.owner)
+        self.generation = 0
+        self.compiled: Dict[str, Tuple[int, List[AlternationChunk]]] = {}
+
+    def _copy(self) -> AlternationRouteIndex:
+        """Create copy of the index with copy of compiled expressions, they are compiled again when the copy changes."""
+        index = super()._copy()
+        index.compiled = dict(self.compiled)
+        return index
+
+    def _insert(self, order: Order, route: Route) -> None:
+        """Insert Route and invalidate compiled expressions."""
+        self.entries = self.entries.edit(self.owner)
+        self.entries[order] = route
+        self.generation += 1
+
+    def _delete(self, order: Order, route: Route) -> None:
+        """Delete Route and invalidate compiled expressions."""
+        self.entries = self.entries.edit(self.owner)
+        del self.entries[order]
+        self.generation += 1
+
+    def _build_chunks(self, method: str) -> List[AlternationChunk]:
+        """Split active Routes with given method to chunks of mergeable patterns."""
+        chunks: List[AlternationChunk] = []
+        for route in self.entries.values():
+            if route.method in [None, method] and route.is_active:
+                if not chunks or not chunks[-1].accepts(route):
+                    chunks.append(AlternationChunk())
+                chunks[-1].append(route)
+        return [compiled for chunk in chunks for compiled in chunk.compile()]
+
+    def _chunks(self, method: str) -> List[AlternationChunk]:
+        """Get compiled chunks for given method, compile them if they are outdated."""
+        generation, chunks = self.compiled.get(method, (-1, []))
+        if generation != self.generation:
+            chunks = self._build_chunks(method)
+            self.compiled[method] = (self.generation, chunks)
+        return chunks
+
+    def candidates(self, method: str, path: str) -> Iterator[Route]:
+        """Get Routes starting with the first one with matching pattern.
+
+        If a candidate is rejected because the Route is no longer active, the
+        expressions are compiled again on next call, without the inactive Route.
+        """
+        for chunk in self._chunks(method):
+            for route in chunk.candidates(path):
+                yield route
+                if not route.is_active:
+                    self.generation += 1
+
+
+class ConditionIndex:
+    """Index of Routes by exact values of headers, query arguments or cookies they require.
+
+    Route requiring an exact value, eg. header `X-Tenant: acme`, can match only
+    requests with that value. Such Routes are split by the first exact value
+    they require to separate indexes, one for every name and value, and request
+    looks up only indexes of its own values. Thousands of Routes differing only
+    by the value cost one hash lookup per name. Other Routes are in the main
+    index. Candidates from all indexes are merged in the order they were added.
+
+    Copy of the index shares all indexes and maps with it, they are copied when
+    either index changes them, so neither index ever changes under its readers.
+    """
+
+    def __init__(self, index_type: Type[RouteIndex]) -> None:
+        self.owner = object()
+        self.index_type = index_type
+        self.index = index_type(self.owner)
+        self.values: CopyOnWriteDict[Tuple[ConditionSource, str], CopyOnWriteDict[str, RouteIndex]] = \
+            CopyOnWriteDict(self.owner)
+        self.orders: CopyOnWriteDict[str, Order] = CopyOnWriteDict(self.owner)
+
+    def copy(self) -> ConditionIndex:
+        """Create copy of the index, neither index changes structures shared with the other one."""
+        condition_index = copy.copy(self)
+        condition_index.owner, self.owner = object(), object()
+        return condition_index
+
+    def _index(self, route: Route) -> RouteIndex:
+        """Get index of the value the Route requires or the main index, create or copy it if needed."""
+        if route.conditions.key is None:
+            self.index = self.index.edit(self.owner)
+            return self.index
+        source, name, value = route.conditions.key
+        self.values = self.values.edit(self.owner)
+        return self.values.edit_item((source, name), CopyOnWriteDict).edit_item(value, self.index_type)
+
+    def add(self, route: Route, order: Order) -> None:
+        """Add Route to the index of the value it requires or to the main index."""
+        self.orders = self.orders.edit(self.owner)
+        self.orders[route.id] = order
+        self._index(route).add(route, order)
+
+    def remove(self, route: Route) -> Optional[Order]:
+        """Remove Route from the index containing it. Return its order or None if it wasn't present."""
+        if route.id not in self.orders:
+            return None
+        order = self._index(route).remove(route.id)
+        self.orders = self.orders.edit(self.owner)
+        del self.orders[route.id]
+        return order
+
+    def _indexes(self, request: IncomingRequest) -> List[RouteIndex]:
+        """Get the main index and indexes of Routes requiring values the request has."""
+        indexes = [self.index]
+        for (source, name), values in self.values.items():
+            value = source.get(request, name)
+            if isinstance(value, str) and (index := values.get(value)):
+                indexes.append(index)
+        return indexes
+
+    def candidates(self, request: IncomingRequest) -> Iterator[Route]:
+        """Get Routes that could match the request, in order they were added."""
+        if not self.values:
+            return self.index.candidates(request.method, request.path)
+        indexes = self._indexes(request)
+        if len(indexes) == 1:
+            return self.index.candidates(request.method, request.path)
+        orders = self.orders
+        return heapq.merge(
+            *[index.candidates(request.method, request.path) for index in indexes],
+            key=lambda route: orders[route.id]
+        )
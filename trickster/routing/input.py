@@ -3,11 +3,18 @@
 from __future__ import annotations
 
 import abc
+import functools
+import io
 import urllib.parse
-from typing import Any, Dict
+from typing import Any, Dict, MutableMapping
 
 import flask
 
+from werkzeug.datastructures import MultiDict
+from werkzeug.formparser import FormDataParser, parse_form_data
+from werkzeug.http import parse_cookie, parse_options_header
+from werkzeug.wsgi import get_current_url
+
 
 HTTP_METHODS = [
     'GET',
@@ -74,7 +81,7 @@ class IncomingFlaskRequest(IncomingRequest):
         """Path of the request: `http://domain.com/<path>?query`."""
         return self.request.path
 
-    @property
+    @functools.cached_property
     def headers(self) -> Dict[str, Any]:
         """Dictionary containing headers."""
         return {key: value for key, value in self.request.headers.items()}
@@ -105,6 +112,128 @@ class IncomingFlaskRequest(IncomingRequest):
         return self.request.cookies
 
 
+class IncomingAsgiRequest(IncomingRequest):
+    """Request received by ASGI server, described by its connection scope and body."""
+
+    def __init__(self, scope: MutableMapping[str, Any], body: bytes = b''):
+        self.scope = scope
+        self.body = body
+
+    @property
+    def method(self) -> str:
+        """HTTP method."""
+        return self.scope['method']
+
+    @property
+    def path(self) -> str:
+        """Path of the request: `http://domain.com/<path>?query`."""
+        return self.scope['path']
+
+    @functools.cached_property
+    def headers(self) -> Dict[str, Any]:
+        """Dictionary containing headers."""
+        headers: Dict[str, Any] = {}
+        for raw_name, raw_value in self.scope['headers']:
+            name = raw_name.decode('latin-1').title()
+            value = raw_value.decode('latin-1')
+            headers[name] = f'{headers[name]}, {value}' if name in headers else value
+        return headers
+
+    @functools.cached_property
+    def args(self) -> Dict[str, Any]:
+        """Dictionary containing URL arguments."""
+        return MultiDict(urllib.parse.parse_qsl(self.query_string, keep_blank_values=True))
+
+    @property
+    def url(self) -> str:
+        """Full url of the request."""
+        scheme = self.scope.get('scheme', 'http')
+        if 'Host' in self.headers:
+            host = self.headers['Host']
+        elif server := self.scope.get('server'):
+            host = f'{server[0]}:{server[1]}'
+        else:
+            host = 'localhost'
+        query = f'?{self.query_string}' if self.query_string else ''
+        return f'{scheme}://{host}{self.scope.get("root_path", "")}{self.path}{query}'
+
+    @property
+    def query_string(self) -> str:
+        """Query string of the request: `http://domain.com/path?<query>`."""
+        return self.scope.get('query_string', b'').decode('latin-1')
+
+    @functools.cached_property
+    def form(self) -> Dict[str, Any]:
+        """Dictionary containing form data."""
+        mimetype, options = parse_options_header(self.headers.get('Content-Type', ''))
+        _, form, _ = FormDataParser().parse(io.BytesIO(self.body), mimetype, len(self.body), options)
+        return form
+
+    @functools.cached_property
+    def cookies(self) -> Dict[str, Any]:
+        """Dictionary containing cookies."""
+        return parse_cookie(self.headers.get('Cookie', ''))
+
+
+class IncomingWsgiRequest(IncomingRequest):
+    """Request received by WSGI server, described by its environment.
+
+    Values are decoded the same way Flask decodes them, parts of the request
+    not needed to match a Route are parsed only when they are accessed.
+    """
+
+    def __init__(self, environ: Dict[str, Any]):
+        self.environ = environ
+
+    @property
+    def method(self) -> str:
+        """HTTP method."""
+        return self.environ['REQUEST_METHOD'].upper()
+
+    @functools.cached_property
+    def path(self) -> str:
+        """Path of the request: `http://domain.com/<path>?query`."""
+        path = self.environ.get('PATH_INFO', '').encode('latin-1').decode('utf-8', 'replace')
+        return '/' + path.lstrip('/')
+
+    @functools.cached_property
+    def headers(self) -> Dict[str, Any]:
+        """Dictionary containing headers."""
+        headers = {}
+        for key, value in self.environ.items():
+            if key.startswith('HTTP_'):
+                headers[key[5:].replace('_', '-').title()] = value
+            elif key in ('CONTENT_TYPE', 'CONTENT_LENGTH') and value:
+                headers[key.replace('_', '-').title()] = value
+        return headers
+
+    @functools.cached_property
+    def args(self) -> Dict[str, Any]:
+        """Dictionary containing URL arguments."""
+        return MultiDict(urllib.parse.parse_qsl(self.query_string, keep_blank_values=True))
+
+    @property
+    def url(self) -> str:
+        """Full url of the request."""
+        return get_current_url(self.environ)
+
+    @property
+    def query_string(self) -> str:
+        """Query string of the request: `http://domain.com/path?<query>`."""
+        return self.environ.get('QUERY_STRING', '').encode('latin-1').decode('utf-8', 'replace')
+
+    @functools.cached_property
+    def form(self) -> Dict[str, Any]:
+        """Dictionary containing form data."""
+        _, form, _ = parse_form_data(self.environ)
+        return form
+
+    @functools.cached_property
+    def cookies(self) -> Dict[str, Any]:
+        """Dictionary containing cookies."""
+        return parse_cookie(self.environ.get('HTTP_COOKIE', ''))
+
+
 class IncomingTestRequest:
     """Model of a request used for testing route matching."""
 
@@ -129,14 +258,10 @@ class IncomingTestRequest:
         """Path of the request: `http://domain.com/<path>?query`."""
         return self.parsed_url.path
 
-    @property
+    @functools.cached_property
     def args(self) -> Dict[str, Any]:
         """Dictionary containing URL arguments."""
-        args = urllib.parse.parse_qs(self.parsed_url.query)
-        parsed_args = {}
-        for key, values in args.items():
-            parsed_args[key] = values[0] if len(values) == 1 else values
-        return parsed_args
+        return MultiDict(urllib.parse.parse_qsl(self.parsed_url.query, keep_blank_values=True))
 
     @property
     def query_string(self) -> str:
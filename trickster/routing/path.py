@@ -0,0 +1,250 @@
+"""Analysis of path patterns used by Routes."""
+
+from __future__ import annotations
+
+import enum
+import re
+import sys
+from typing import Any, Callable, Iterator, List, Optional, Set, Tuple, Union
+
+if sys.version_info >= (3, 11):
+    from re import _parser as sre_parse  # type: ignore # pragma: no cover
+else:
+    import sre_parse  # pragma: no cover
+
+from trickster.routing import RouteConfigurationError, UnsafePathError
+
+
+# Nodes that match empty string at the beginning of a path and can be skipped.
+BEGINNING_ANCHORS = {sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING}
+
+# Repetitions with unlimited number of repeats that backtrack when the rest of the pattern fails.
+BACKTRACKING_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+
+# Categories of characters used in character sets with patterns testing them.
+CATEGORIES = {
+    category: re.compile(pattern) for category, pattern in [
+        (sre_parse.CATEGORY_DIGIT, r'\d'),
+        (sre_parse.CATEGORY_NOT_DIGIT, r'\D'),
+        (sre_parse.CATEGORY_SPACE, r'\s'),
+        (sre_parse.CATEGORY_NOT_SPACE, r'\S'),
+        (sre_parse.CATEGORY_WORD, r'\w'),
+        (sre_parse.CATEGORY_NOT_WORD, r'\W')
+    ]
+}
+
+# Characters with special meaning in a pattern, pattern without them matches only itself.
+SPECIAL_CHARACTERS = frozenset('.^$*+?{}[]\\|()')
+
+# Simple parameter matching a part of one path segment, eg. `\\d+`, `[^/]+` or `[0-9a-f]*`.
+PARAMETER = r'(?:\\[dw]|\[\^/\]|\[[\w\-]+\])[+*]'
+
+# Path of literal segments and segments with a simple parameter, optionally in a named group.
+PARAMETRIZED = re.compile(
+    rf'(?:[^.^$*+?{{}}\[\]\\|()]|(?<=/)(?:{PARAMETER}|\(\?P<\w+>{PARAMETER}\))(?=/|\$?\Z))*\$?'
+)
+
+
+class PathClass(enum.Enum):
+    """Class of a path pattern by the cheapest way to match it."""
+
+    literal = 'literal'  # Plain string matched exactly
+    prefix = 'prefix'  # Plain string every matched path starts with
+    parametrized = 'parametrized'  # Literal segments and simple parameters
+    regex = 'regex'
+
+
+def classify(text: str, flags: int = 0) -> Tuple[PathClass, Optional[str]]:
+    """Get class of a path pattern and its literal string if it has one."""
+    if flags & ~re.UNICODE:
+        return PathClass.regex, None
+    text = text[1:] if text.startswith('^') else text
+    if text.endswith('$') and SPECIAL_CHARACTERS.isdisjoint(text[:-1]):
+        return PathClass.literal, text[:-1]
+    prefix = text[:-2] if text.endswith('.*') else text
+    if SPECIAL_CHARACTERS.isdisjoint(prefix):
+        return PathClass.prefix, prefix
+    if PARAMETRIZED.fullmatch(text):
+        return PathClass.parametrized, None
+    return PathClass.regex, None
+
+
+class PathPattern:
+    """Path pattern of a Route classified by the cheapest way to match it.
+
+    Plain strings never need a regular expression, it's compiled only if it's
+    accessed. Other patterns are compiled right away, so invalid patterns are
+    rejected when the Route is created. So are patterns that may take
+    exponential time to match.
+    """
+
+    def __init__(self, pattern: Union[str, re.Pattern]) -> None:
+        if isinstance(pattern, str):
+            self.text, self.flags, self._regex = pattern, 0, None
+        else:
+            self.text, self.flags, self._regex = pattern.pattern, pattern.flags, pattern
+        self.path_class, self.literal = classify(self.text, self.flags)
+        if self.path_class is PathClass.regex and nested_repeat(self.regex):
+            raise UnsafePathError(
+                f'Path "{self.text}" repeats a part that has its own unlimited repeat, '
+                'matching it may take exponential time.'
+            )
+        if self.literal is None:
+            self.regex
+
+    @property
+    def regex(self) -> re.Pattern:
+        """Compiled regular expression of the pattern."""
+        if self._regex is None:
+            try:
+                self._regex = re.compile(self.text, self.flags)
+            except re.error as error:
+                raise RouteConfigurationError(f'Path "{self.text}" is not a valid regex: {error}.')
+        return self._regex
+
+    @property
+    def prefix(self) -> str:
+        """Literal string every path matched by the pattern has to start with."""
+        if self.literal is not None:
+            return self.literal
+        return literal_prefix(self.regex)
+
+    def matcher(self) -> Callable[[str], Any]:
+        """Get the cheapest function testing if the beginning of a path matches the pattern."""
+        if (literal := self.literal) is None:
+            return self.regex.match
+        if self.path_class is PathClass.literal:
+            terminated = f'{literal}\n'  # `$` matches also before a newline at the end of the path
+            return lambda path: path == literal or path == terminated
+        return lambda path: path.startswith(literal)
+
+
+def literal_prefix(pattern: re.Pattern) -> str:
+    """Get literal string every path matched by the pattern has to start with.
+
+    Returns empty string if pattern doesn't start with a literal or if it's
+    case insensitive.
+    """
+    if pattern.flags & re.IGNORECASE:
+        return ''
+    if (literal := plain_literal(pattern)) is not None:
+        return literal
+
+    prefix = []
+    for operation, argument in sre_parse.parse(pattern.pattern, pattern.flags):
+        if operation == sre_parse.LITERAL:
+            prefix.append(chr(argument))
+        elif operation != sre_parse.AT or argument not in BEGINNING_ANCHORS:
+            break
+    return ''.join(prefix)
+
+
+def plain_literal(pattern: re.Pattern) -> Optional[str]:
+    """Get the literal string if the pattern contains no special characters except anchors.
+
+    Most paths are plain strings, they don't have to be parsed to find their prefix.
+    """
+    if pattern.flags & re.VERBOSE:
+        return None
+    text = pattern.pattern
+    text = text[1:] if text.startswith('^') else text
+    text = text[:-1] if text.endswith('$') else text
+    if SPECIAL_CHARACTERS.isdisjoint(text):
+        return text
+    return None
+
+
+def literal_segments(prefix: str) -> List[str]:
+    """Get complete path segments from the literal prefix of a pattern.
+
+    The last segment of the prefix is left out because the pattern may continue
+    it with more characters, eg. `/users/list` yields `['', 'users']`.
+    """
+    return prefix.split('/')[:-1]
+
+
+def nested_repeat(pattern: re.Pattern) -> bool:
+    r"""Return True if the pattern repeats a part with its own unlimited repeat, eg. `(a+)+$`.
+
+    Regular expression engine tries every way to split the path between the inner
+    and the outer repeat before it gives up, so paths that don't match may take
+    exponential time. Nested repeat is safe if every repetition of the outer repeat
+    has to match a literal character the inner repeat can't match, eg. `(/\w+)*`.
+    """
+    return _nested_repeat(sre_parse.parse(pattern.pattern, pattern.flags), None)
+
+
+def _nested_repeat(subpattern: Any, separators: Optional[Set[int]]) -> bool:
+    """Find unlimited repeat inside another unlimited repeat with given separators."""
+    for operation, argument in subpattern:
+        if operation in BACKTRACKING_REPEATS and argument[1] == sre_parse.MAXREPEAT:
+            body = argument[2]
+            if separators is not None and all(_may_match(body, separator) for separator in separators):
+                return True
+            if _nested_repeat(body, _mandatory_literals(body)):
+                return True
+        elif any(_nested_repeat(child, separators) for child in _subpatterns(argument)):
+            return True
+    return False
+
+
+def _subpatterns(argument: Any) -> Iterator[Any]:
+    """Get parsed subpatterns from the argument of an operation."""
+    if isinstance(argument, sre_parse.SubPattern):
+        yield argument
+    elif isinstance(argument, (tuple, list)):
+        for item in argument:
+            yield from _subpatterns(item)
+
+
+def _mandatory_literals(subpattern: Any) -> Set[int]:
+    """Get literal characters the subpattern always has to match, outside of any repeat or branch."""
+    literals = set()
+    for operation, argument in subpattern:
+        if operation == sre_parse.LITERAL:
+            literals.add(argument)
+        elif operation == sre_parse.SUBPATTERN:
+            literals.update(_mandatory_literals(argument[3]))
+    return literals
+
+
+def _may_match(subpattern: Any, character: int) -> bool:
+    """Return True if any part of the subpattern may match given character."""
+    return any(_item_may_match(operation, argument, character) for operation, argument in subpattern)
+
+
+def _item_may_match(operation: Any, argument: Any, character: int) -> bool:
+    """Return True if operation may match given character, including all operations the analysis doesn't know."""
+    if operation == sre_parse.LITERAL:
+        return argument == character
+    if operation == sre_parse.NOT_LITERAL:
+        return argument != character
+    if operation == sre_parse.IN:
+        return _in_set(argument, character)
+    if operation == sre_parse.AT:
+        return False
+    if subpatterns := list(_subpatterns(argument)):
+        return any(_may_match(child, character) for child in subpatterns)
+    return True
+
+
+def _in_set(items: List[Tuple[Any, Any]], character: int) -> bool:
+    """Return True if character set may contain given character."""
+    negate = bool(items) and items[0][0] == sre_parse.NEGATE
+    for operation, argument in items:
+        if operation == sre_parse.CATEGORY and argument not in CATEGORIES:
+            return True
+        if _set_item_contains(operation, argument, character):
+            return not negate
+    return negate
+
+
+def _set_item_contains(operation: Any, argument: Any, character: int) -> bool:
+    """Return True if item of a character set contains given character."""
+    if operation == sre_parse.LITERAL:
+        return argument == character
+    if operation == sre_parse.RANGE:
+        return argument[0] <= character <= argument[1]
+    if operation == sre_parse.CATEGORY:
+        return bool(CATEGORIES[argument].match(chr(character)))
+    return False
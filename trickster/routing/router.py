@@ -2,63 +2,135 @@
 
 from __future__ import annotations
 
+import abc
+import copy
 import enum
+import functools
+import heapq
+import itertools
+import logging
 import random
 import re
+import threading
+import time
 import uuid
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Callable, ContextManager, Dict, Iterable, List, Optional, Tuple, Type, Union
 
-from trickster.collections import IdItem, IdList
-from trickster.routing import Delay, DuplicateRouteError, MissingRouteError, Response
+from trickster.collections import IdItem, IdList, LruCache, UsageCounter
+from trickster.routing import (
+    Delay, DuplicateRouteError, InvalidRoutesError, MissingRouteError, MissingSnapshotError, Response,
+    RouteConfigurationError
+)
 from trickster.routing.auth import Auth
+from trickster.routing.conditions import RequestConditions
+from trickster.routing.index import ConditionIndex, PrefixFilter, RouteIndex, TrieRouteIndex
 from trickster.routing.input import IncomingRequest
+from trickster.routing.path import PathClass, PathPattern
 
 
-class ResponseSelectionStrategy(enum.Enum):
-    """Strategy of how to select a RouteResponses from list of responses."""
+logger = logging.getLogger(__name__)
 
-    cycle = 'cycle'
-    random = 'random'
-    greedy = 'greedy'
 
-    def select_response_cycle(self, responses: List[RouteResponse]) -> Optional[RouteResponse]:
-        """Select proper response from list of candidate responses.
+class ResponseSelector(abc.ABC):
+    """State of selection of responses of a Route.
 
-        Consumes responses in order of definition. Cycles through items one by one.
-        """
-        candidate = None
+    Selectors expect that responses can only become inactive and their usage
+    counters only grow. They validate their state lazily when selecting.
+    """
 
-        for response in responses:
-            if response.is_active and (candidate is None or response.used_count < candidate.used_count):
-                candidate = response
-        return candidate
+    def __init__(self, responses: List[RouteResponse]) -> None:
+        self.responses = responses
 
-    def select_response_random(self, responses: List[RouteResponse]) -> Optional[RouteResponse]:
-        """Select proper response from list of candidate responses.
+    @abc.abstractmethod
+    def select(self) -> Optional[RouteResponse]:
+        """Select response, return None if there is no active response."""
 
-        Selects random response from all available.
-        """
-        population = [r for r in responses if r.is_active]
-        weights = [r.weight for r in population]
-        result = random.choices(population=population, weights=weights, k=1)
-        return result[0] if result else None
 
-    def select_response_greedy(self, responses: List[RouteResponse]) -> Optional[RouteResponse]:
-        """Select proper response from list of candidate responses.
+class GreedyResponseSelector(ResponseSelector):
+    """Consumes responses in order of definition until they are exhausted.
 
-        Consumes responses in order of definition until the first one is exhausted,
-        then starts consuming the next in the row.
-        """
-        for response in responses:
+    Selector remembers position of the first active response.
+    """
+
+    def __init__(self, responses: List[RouteResponse]) -> None:
+        super().__init__(responses)
+        self.cursor = 0
+
+    def select(self) -> Optional[RouteResponse]:
+        """Select the first active response."""
+        while self.cursor < len(self.responses):
+            response = self.responses[self.cursor]
+            if response.is_active:
+                return response
+            self.cursor += 1
+        return None
+
+
+class CycleResponseSelector(ResponseSelector):
+    """Consumes responses in order of definition. Cycles through items one by one.
+
+    Selector keeps a heap of responses ordered by their usage and position.
+    """
+
+    def __init__(self, responses: List[RouteResponse]) -> None:
+        super().__init__(responses)
+        self.heap = [(response.used_count, position) for position, response in enumerate(responses)]
+        heapq.heapify(self.heap)
+
+    def select(self) -> Optional[RouteResponse]:
+        """Select the least used active response."""
+        while self.heap:
+            used_count, position = self.heap[0]
+            response = self.responses[position]
+            if not response.is_active:
+                heapq.heappop(self.heap)
+            elif response.used_count != used_count:
+                heapq.heapreplace(self.heap, (response.used_count, position))
+            else:
+                return response
+        return None
+
+
+class RandomResponseSelector(ResponseSelector):
+    """Selects random response from all available.
+
+    Selector keeps cumulative weights of active responses and builds them again
+    only when it selects a response that is no longer active.
+    """
+
+    def __init__(self, responses: List[RouteResponse]) -> None:
+        super().__init__(responses)
+        self._build()
+
+    def _build(self) -> None:
+        """Build population of active responses with cumulative weights."""
+        self.population = [response for response in self.responses if response.is_active]
+        self.cumulative_weights = list(itertools.accumulate(response.weight for response in self.population))
+
+    def select(self) -> Optional[RouteResponse]:
+        """Select random active response."""
+        while self.population:
+            response = random.choices(self.population, cum_weights=self.cumulative_weights)[0]
             if response.is_active:
                 return response
+            self._build()
         return None
 
+
+class ResponseSelectionStrategy(enum.Enum):
+    """Strategy of how to select a RouteResponses from list of responses."""
+
+    cycle = 'cycle'
+    random = 'random'
+    greedy = 'greedy'
+
+    def create_selector(self, responses: Iterable[RouteResponse]) -> ResponseSelector:
+        """Create selection state for given responses."""
+        return RESPONSE_SELECTORS[self](list(responses))
+
     def select_response(self, responses: Iterable[RouteResponse]) -> Optional[RouteResponse]:
         """Select proper response from list of candidate responses."""
-        method_name = f'select_response_{self.value}'
-        method = getattr(self, method_name)
-        return method(responses)
+        return self.create_selector(responses).select()
 
     def serialize(self) -> str:
         """Convert ResponseSelectionStrategy to json."""
@@ -70,6 +142,13 @@ class ResponseSelectionStrategy(enum.Enum):
         return cls(method or 'greedy')
 
 
+RESPONSE_SELECTORS: Dict[ResponseSelectionStrategy, Type[ResponseSelector]] = {
+    ResponseSelectionStrategy.cycle: CycleResponseSelector,
+    ResponseSelectionStrategy.random: RandomResponseSelector,
+    ResponseSelectionStrategy.greedy: GreedyResponseSelector
+}
+
+
 class RouteResponse(Response, IdItem):
     """Container for predefined response in Route."""
 
@@ -98,6 +177,12 @@ class RouteResponse(Response, IdItem):
             'repeat': self.repeat,
         }
 
+    def copy(self) -> RouteResponse:
+        """Create copy of the response with its own usage counter."""
+        response = copy.copy(self)
+        response.counter = UsageCounter(self.used_count)
+        return response
+
     @property
     def is_active(self) -> bool:
         """Return True if response has some uses left."""
@@ -105,30 +190,65 @@ class RouteResponse(Response, IdItem):
 
 
 class Route(IdItem):
-    """Route is a pair of request arguments and all possible reponses."""
+    """Route is a pair of request arguments and all possible reponses.
+
+    Selection and usage of responses is guarded by a lock of the Route, so
+    concurrent requests never use the same response more times than allowed.
+    """
+
+    # Route is quarantined when matching its path takes longer than the budget this many times.
+    quarantine_after = 3
 
     def __init__(
         self,
         id: str,
         responses: Iterable[RouteResponse],
         response_selection: ResponseSelectionStrategy,
-        path: re.Pattern,
+        path: Union[str, re.Pattern],
         auth: Auth,
-        method: str = 'GET'
+        method: str = 'GET',
+        priority: int = 0,
+        conditions: Optional[RequestConditions] = None
     ):
         super().__init__(id)
+        self._set_matching(response_selection, path, method, priority, conditions)
+        self._set_content(responses, auth)
+
+    def _set_matching(
+        self,
+        response_selection: ResponseSelectionStrategy,
+        path: Union[str, re.Pattern],
+        method: str,
+        priority: int,
+        conditions: Optional[RequestConditions]
+    ) -> None:
+        """Set parts of the Route used to match requests, its usage counter and lock."""
         self.response_selection = response_selection
         self.method = method
-        self.path = path
-        self.auth = auth
-        self.used_count = 0
-        self.responses: IdList[RouteResponse] = IdList()
+        self.priority = priority
+        self.path_pattern = PathPattern(path)
+        self.conditions = conditions or RequestConditions()
+        self.counter = UsageCounter()
+        self.on_exhausted: Optional[Callable[[Route], None]] = None
+        self.lock: ContextManager[Any] = threading.Lock()
+        self.match_time_budget: Optional[float] = None
+        self.slow_matches = 0
+        self.quarantined = False
+        self.matcher = self._compile_matcher()
 
+    def _set_content(self, responses: Iterable[RouteResponse], auth: Auth) -> None:
+        """Set responses and auth of the Route."""
+        route_responses: IdList[RouteResponse] = IdList()
         try:
             for response in responses:
-                self.responses.add(response)
+                route_responses.add(response)
         except KeyError:
             raise DuplicateRouteError(f'Duplicate response id {response.id}.')
+        self.auth = auth
+        self.auth_required = auth.method is not None
+        self.responses = route_responses
+        self.active_counter = UsageCounter(sum(1 for response in route_responses if response.is_active))
+        self.selector = self.response_selection.create_selector(route_responses)
 
     def serialize(self) -> Dict[str, Any]:
         """Convert Route to JSON."""
@@ -137,12 +257,64 @@ class Route(IdItem):
             'response_selection': self.response_selection.serialize(),
             'auth': self.auth.serialize(),
             'method': self.method,
-            'path': self.path.pattern,
+            'priority': self.priority,
+            'path': self.path_pattern.text,
+            'path_class': self.path_pattern.path_class.value,
+            'conditions': self.conditions.serialize(),
             'used_count': self.used_count,
             'responses': self.responses.serialize(),
-            'is_active': self.is_active
+            'is_active': self.is_active,
+            'quarantined': self.quarantined
         }
 
+    def copy(self) -> Route:
+        """Create copy of the Route and its responses with their own usage counters and lock."""
+        route = copy.copy(self)
+        route.responses = IdList()
+        with self.lock:
+            for response in self.responses:
+                route.responses.add(response.copy())
+            route.counter = UsageCounter(self.used_count)
+            route.active_counter = UsageCounter(self.active_responses)
+        route.on_exhausted = None
+        route.lock = threading.Lock()
+        route.selector = route.response_selection.create_selector(route.responses)
+        return route
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Get state of the Route for pickling, without its lock, matcher and callback."""
+        state = self.__dict__.copy()
+        del state['lock']
+        del state['matcher']
+        state['on_exhausted'] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore pickled Route with a new lock and matcher."""
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        self.matcher = self._compile_matcher()
+
+    @property
+    def used_count(self) -> int:
+        """Number of times the Route was used."""
+        return self.counter.get()
+
+    @property
+    def active_responses(self) -> int:
+        """Number of RouteResponses that have some uses left."""
+        return self.active_counter.get()
+
+    @functools.cached_property
+    def path_prefix(self) -> str:
+        """Literal string every path matched by this Route starts with."""
+        return self.path_pattern.prefix
+
+    @property
+    def path(self) -> re.Pattern:
+        """Regular expression of the path pattern, compiled on first use for plain strings."""
+        return self.path_pattern.regex
+
     def get_response(self, response_id: str) -> Optional[RouteResponse]:
         """Get a RouteResponse by its id."""
         return self.responses.get(response_id)
@@ -162,7 +334,8 @@ class Route(IdItem):
         """Convert json to Route."""
         id = data.pop('id')
         auth = Auth.deserialize(data.pop('auth', None))
-        path = re.compile(data.pop('path', None))
+        path = data.pop('path', None)
+        conditions = RequestConditions.deserialize(data.pop('conditions', None))
         response_selection = ResponseSelectionStrategy.deserialize(data.pop('response_selection', None))
         responses = cls._create_responses(data.pop('responses'))
 
@@ -172,60 +345,550 @@ class Route(IdItem):
             response_selection=response_selection,
             path=path,
             auth=auth,
+            conditions=conditions,
             **data
         )
 
     def use(self, response: RouteResponse = None) -> None:
         """Increment use counter of this Route and given RouteResponse."""
-        self.used_count += 1
+        with self.lock:
+            exhausted = self._use(response)
+        if exhausted:
+            self._exhaust()
+
+    def consume(self) -> Optional[RouteResponse]:
+        """Select response and use it in one step, return None if there is no active response."""
+        with self.lock:
+            response = self.select_response()
+            exhausted = self._use(response) if response else False
+        if exhausted:
+            self._exhaust()
+        return response
+
+    def _use(self, response: Optional[RouteResponse]) -> bool:
+        """Increment use counters, return True if the Route used its last active RouteResponse."""
+        self.counter.add()
         if response:
+            was_active = response.is_active
             response.use()
+            if was_active and not response.is_active:
+                return not self.active_counter.add(-1)
+        return False
+
+    def _exhaust(self) -> None:
+        """Call `on_exhausted` callback after the Route used its last active RouteResponse.
+
+        Callback is called without holding the lock of the Route.
+        """
+        if self.on_exhausted:
+            self.on_exhausted(self)
 
     def match(self, request: IncomingRequest) -> bool:
         """Return True, if this request specification matches given request and Route is active."""
-        return all([
-            self._match_method(request.method),
-            self._match_path(request.path),
-            self.is_active
-        ])
+        return self.matcher(request)
+
+    def _compile_matcher(self) -> Callable[[IncomingRequest], bool]:
+        """Compile function matching requests.
+
+        Cheaper checks go first and the rest is skipped as soon as one of them fails,
+        path is matched by the cheapest function equivalent to its pattern. Conditions
+        on headers, query arguments and cookies are tested last.
+        """
+        method = self.method
+        match_path = self._compile_path_matcher()
+        if self.conditions:
+            return self._compile_conditions_matcher(match_path)
+        if method is None:
+            return lambda request: self.is_active and bool(match_path(request.path))
+        return lambda request: request.method == method and self.is_active and bool(match_path(request.path))
 
-    def _match_method(self, method: Optional[str]) -> bool:
-        """Return True, if this requests HTTP method matches given InputRequest."""
-        return self.method in [None, method]
+    def _compile_conditions_matcher(self, match_path: Callable[[str], Any]) -> Callable[[IncomingRequest], bool]:
+        """Compile function matching requests by method, path and conditions."""
+        method = self.method
+        match_conditions = self.conditions.match
 
-    def _match_path(self, path: str) -> bool:
-        """Return True, if this requests path matches given InputRequest."""
-        return bool(self.path.match(path))
+        def match_request(request: IncomingRequest) -> bool:
+            if method is not None and request.method != method:
+                return False
+            return self.is_active and bool(match_path(request.path)) and match_conditions(request)
+        return match_request
+
+    def _compile_path_matcher(self) -> Callable[[str], Any]:
+        """Compile function matching paths, measure time of matching paths that need full regular expression."""
+        match_path = self.path_pattern.matcher()
+        if self.path_pattern.path_class is not PathClass.regex:
+            return match_path
+
+        def match_path_in_budget(path: str) -> Any:
+            if (budget := self.match_time_budget) is None:
+                return match_path(path)
+            start = time.thread_time()
+            match = match_path(path)
+            if time.thread_time() - start > budget:
+                self._count_slow_match()
+            return match
+        return match_path_in_budget
+
+    def _count_slow_match(self) -> None:
+        """Count match that took longer than the budget, quarantine the Route after too many of them."""
+        self.slow_matches += 1
+        if self.slow_matches >= self.quarantine_after:
+            self.quarantine()
+
+    def quarantine(self) -> None:
+        """Stop matching the Route because matching its path took longer than its budget.
+
+        Quarantined Route is inactive, router retires it like an exhausted Route.
+        """
+        with self.lock:
+            if self.quarantined:
+                return
+            self.quarantined = True
+        logger.warning('Route %s quarantined, matching its path "%s" is too slow.', self.id, self.path_pattern.text)
+        self._exhaust()
 
     def select_response(self) -> Optional[RouteResponse]:
         """Select response from list of responses."""
-        return self.response_selection.select_response(self.responses)
+        return self.selector.select()
 
     def authenticate(self, request: IncomingRequest) -> None:
-        """Check if Request if properly authenticated."""
+        """Check if Request if properly authenticated.
+
+        Callers can skip authentication of Routes without `auth_required`.
+        """
         self.auth.authenticate(request)
 
     @property
     def is_active(self) -> bool:
-        """Return True if Route has at least one active RouteResponse."""
-        for response in self.responses:
-            if response.is_active:
-                return True
-        return False
+        """Return True if Route has at least one active RouteResponse and isn't quarantined."""
+        return self.active_responses > 0 and not self.quarantined
+
+    @property
+    def is_materialized(self) -> bool:
+        """Return True if responses and auth of the Route are deserialized."""
+        return True
+
+
+class LazyRoute(Route):
+    """Route deserializing its responses and auth when they are needed for the first time.
+
+    Only the parts used to match requests are created up front, responses and
+    auth are kept as json until the Route is matched or accessed through the
+    internal API. The json is checked when the Route is created, so invalid
+    Routes are rejected as soon as with eager deserialization.
+    """
+
+    lazy_attributes = frozenset({'auth', 'auth_required', 'responses', 'active_counter', 'selector'})
+    # Shared by all lazy Routes, lock of the Route is held while selecting a response.
+    materialization_lock = threading.Lock()
+
+    def __init__(
+        self,
+        id: str,
+        definition: Dict[str, Any],
+        response_selection: ResponseSelectionStrategy,
+        path: Union[str, re.Pattern],
+        method: str = 'GET',
+        priority: int = 0,
+        conditions: Optional[RequestConditions] = None
+    ):
+        IdItem.__init__(self, id)
+        self._set_matching(response_selection, path, method, priority, conditions)
+        self._check_responses(definition['responses'])
+        self._check_auth(definition['auth'])
+        self.initially_active = any(
+            response.get('repeat') is None or response['repeat'] > 0 for response in definition['responses']
+        )
+        self.definition: Optional[Dict[str, Any]] = definition
+
+    @staticmethod
+    def _check_responses(responses: List[Dict[str, Any]]) -> None:
+        """Raise errors deserialization of the responses would raise."""
+        ids = set()
+        for response in responses:
+            Delay.deserialize(response.get('delay'))
+            if 'id' in response:
+                if response['id'] in ids:
+                    raise DuplicateRouteError(f'Duplicate response id {response["id"]}.')
+                ids.add(response['id'])
+
+    @staticmethod
+    def _check_auth(auth: Optional[Dict[str, Any]]) -> None:
+        """Raise errors deserialization of the auth would raise."""
+        if auth is not None:
+            if 'method' not in auth:
+                raise RouteConfigurationError('Missing field "method" of Auth.')
+            Auth._find_implementation(auth['method'])
+            Delay.deserialize((auth.get('unauthorized_response') or {}).get('delay'))
+
+    def __getattr__(self, name: str) -> Any:
+        """Deserialize responses and auth when they are accessed for the first time."""
+        if name not in self.lazy_attributes:
+            raise AttributeError(name)
+        self.materialize()
+        return object.__getattribute__(self, name)
+
+    def materialize(self) -> None:
+        """Deserialize responses and auth of the Route unless they already are."""
+        with self.materialization_lock:
+            if self.definition is not None:
+                definition = copy.deepcopy(self.definition)
+                responses = self._create_responses(definition['responses'])
+                self._set_content(responses, Auth.deserialize(definition['auth']))
+                self.definition = None
+
+    def copy(self) -> Route:
+        """Create copy of the Route, copy of a Route that wasn't deserialized yet shares its json."""
+        with self.materialization_lock:
+            if self.definition is not None:
+                route = copy.copy(self)
+                route.counter = UsageCounter(self.used_count)
+                route.on_exhausted = None
+                route.lock = threading.Lock()
+                return route
+        return super().copy()
+
+    @classmethod
+    def deserialize(cls, data: Dict[str, Any]) -> Route:
+        """Convert json to Route, keep json of responses and auth."""
+        id = data.pop('id')
+        path = data.pop('path', None)
+        conditions = RequestConditions.deserialize(data.pop('conditions', None))
+        response_selection = ResponseSelectionStrategy.deserialize(data.pop('response_selection', None))
+        definition = {'responses': data.pop('responses'), 'auth': data.pop('auth', None)}
+
+        return cls(
+            id=id,
+            definition=definition,
+            response_selection=response_selection,
+            path=path,
+            conditions=conditions,
+            **data
+        )
+
+    @property
+    def is_active(self) -> bool:
+        """Return True if Route has at least one active RouteResponse and isn't quarantined."""
+        if self.definition is not None:
+            return self.initially_active and not self.quarantined
+        return super().is_active
+
+    @property
+    def is_materialized(self) -> bool:
+        """Return True if responses and auth of the Route are deserialized."""
+        return self.definition is None
+
+
+# Marks match that isn't cached, None is cached when no Route matches.
+NOT_CACHED = object()
+
+
+class RouteOrder(enum.Enum):
+    """Order in which Routes are tested when matching a request.
+
+    Routes with higher priority always go first. Routes with the same priority
+    are ordered by definition or the most specific Routes go first: literal
+    paths, then prefixes, parametrized paths and other regular expressions,
+    longer literal prefix first and Routes with more conditions first. Sorting
+    is stable, so Routes that are equally specific keep the order of definition.
+    """
+
+    definition = 'definition'
+    specificity = 'specificity'
+
+    def key(self, route: Route) -> Tuple[int, ...]:
+        """Get key sorting Routes in this order."""
+        if self is RouteOrder.specificity:
+            return (
+                -route.priority,
+                PATH_CLASS_SPECIFICITY[route.path_pattern.path_class],
+                -len(route.path_prefix),
+                -len(route.conditions)
+            )
+        return (-route.priority,)
+
+
+PATH_CLASS_SPECIFICITY: Dict[PathClass, int] = {
+    PathClass.literal: 0,
+    PathClass.prefix: 1,
+    PathClass.parametrized: 2,
+    PathClass.regex: 3
+}
+
+
+class RoutingTable:
+    """Snapshot of Routes used to match requests.
+
+    Table contains list of Routes, index and prefix filter built from them and
+    a cache of results of matching. Routes, index and filters of the table never
+    change, router creates a new table whenever Routes change. The new table gets
+    copies of index and filters of the previous one, only the changed Routes are
+    added to the copies and removed from them. Copies share everything else with
+    the previous table, so the change takes O(√n) per changed Route. The new
+    table gets a changed copy of the list of Routes and an empty cache. Routes are indexed by
+    the route order followed by their order key in the list, so the index
+    returns candidates in the route order.
+
+    Routes requiring exact values of headers, query arguments or cookies are
+    indexed by the value. Result of matching a request that may be matched by
+    a Route with conditions depends on more than method and path, so it's
+    never cached.
+    """
+
+    def __init__(
+        self,
+        routes: IdList[Route],
+        index_type: Type[RouteIndex],
+        match_cache_size: int,
+        previous: Optional[RoutingTable] = None,
+        route_order: RouteOrder = RouteOrder.definition
+    ) -> None:
+        self.routes = routes
+        self.route_order = route_order
+        self.condition_index = ConditionIndex(index_type)
+        self.prefix_filter = PrefixFilter()
+        self.conditions_filter = PrefixFilter()
+        self.match_cache: LruCache[Tuple[str, str], Optional[Route]] = LruCache(match_cache_size)
+        self.retired = 0
+        for route in sorted(routes, key=self.order):
+            self._add(route)
+        if previous:
+            self._keep_statistics(previous)
+
+    @property
+    def index(self) -> RouteIndex:
+        """Index of Routes without conditions on exact values."""
+        return self.condition_index.index
+
+    def order(self, route: Route) -> Tuple[int, ...]:
+        """Get order of Route in the index."""
+        return (*self.route_order.key(route), self.routes.order_key(route.id))  # type: ignore
+
+    def _add(self, route: Route) -> None:
+        """Add Route to filters and to the index if it's active."""
+        self.prefix_filter.add(route)
+        if route.conditions:
+            self.conditions_filter.add(route)
+        if route.is_active:
+            self.condition_index.add(route, self.order(route))
+        else:
+            self.retired += 1
+
+    def _remove(self, route: Route) -> None:
+        """Remove Route from the index and filters."""
+        if self.condition_index.remove(route) is None:
+            self.retired -= 1
+        if route.conditions:
+            self.conditions_filter.remove(route)
+        self.prefix_filter.remove(route)
+
+    def _next(self, routes: IdList[Route]) -> RoutingTable:
+        """Create next table with given list of Routes and copy of the index."""
+        table = copy.copy(self)
+        table.routes = routes
+        table.condition_index = self.condition_index.copy()
+        return table
+
+    def change(self, routes: IdList[Route], removed: Iterable[Route] = (), added: Iterable[Route] = ()) -> RoutingTable:
+        """Create next table with given list of Routes, remove and add changed Routes to copies of index and filters."""
+        table = self._next(routes)
+        table.prefix_filter = self.prefix_filter.copy()
+        table.conditions_filter = self.conditions_filter.copy()
+        table.match_cache = LruCache(self.match_cache.max_size)
+        table._keep_statistics(self)
+        for route in removed:
+            table._remove(route)
+        for route in added:
+            table._add(route)
+        return table
+
+    def retire(self, route: Route) -> RoutingTable:
+        """Create next table without exhausted Route in the index, so it's never tested again.
+
+        Filters and cache of matches are shared with this table, cached exhausted Route is matched again.
+        """
+        table = self._next(self.routes)
+        if table.condition_index.remove(route) is not None:
+            table.retired += 1
+        return table
+
+    def _keep_statistics(self, previous: RoutingTable) -> None:
+        """Continue counting statistics of the previous table."""
+        self.prefix_filter.rejections = previous.prefix_filter.rejections
+        self.match_cache.hits = previous.match_cache.hits
+        self.match_cache.misses = previous.match_cache.misses
+        self.match_cache.evictions = previous.match_cache.evictions
+
+    def match(self, incoming_request: IncomingRequest) -> Optional[Route]:
+        """Find matching Route, use cached result if the cached Route is still active."""
+        if not self.prefix_filter.accepts(incoming_request.method, incoming_request.path):
+            return None
+        if self.conditions_filter.covers(incoming_request.method, incoming_request.path):
+            return self._match(incoming_request)
+
+        key = (incoming_request.method, incoming_request.path)
+        route = self.match_cache.get(key, NOT_CACHED)
+        if route is NOT_CACHED or not (route is None or route.is_active):
+            route = self._match(incoming_request)
+            self.match_cache.put(key, route)
+        return route
+
+    def _match(self, incoming_request: IncomingRequest) -> Optional[Route]:
+        """Find the first matching Route in the index."""
+        for route in self.condition_index.candidates(incoming_request):
+            if route.matcher(incoming_request):
+                return route
+        return None
+
+
+class RouterSnapshot:
+    """Routes and their usage saved to be restored later.
+
+    Routes of a snapshot are never matched, router restores their copies so
+    a snapshot can be restored many times.
+    """
+
+    def __init__(
+        self,
+        routes: Optional[IdList[Route]] = None,
+        definitions: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> None:
+        self.routes: IdList[Route] = routes or IdList()
+        self.definitions = definitions or {}
+
+    def copy(self) -> RouterSnapshot:
+        """Create copy of the snapshot with fresh copies of its Routes."""
+        routes: IdList[Route] = IdList()
+        for route in self.routes:
+            routes.add(route.copy())
+        return RouterSnapshot(routes, dict(self.definitions))
 
 
 class Router:
-    """Custom request/response router."""
+    """Custom request/response router.
+
+    Requests are matched against the current RoutingTable without locking. Every
+    change of Routes creates a new table from the current one and replaces it by
+    a single assignment, only the changed Routes are added to copies of its index
+    and removed from them. Changes are serialized by a lock of the router. Usage
+    counters are kept by Routes and responses, outside of the table.
 
-    def __init__(self) -> None:
-        self.reset()
+    Routes that used all their responses are retired, they are removed from the
+    index of the next table right away but they are still listed in `routes`.
+
+    Routes can be compiled to a RouterSnapshot once and restored many times
+    without parsing them again. Named snapshots keep state of the router
+    including usage of Routes. Lazy router compiles LazyRoutes, their responses
+    and auth are deserialized only when they are needed.
+
+    Routes are matched in the route order, the first defined Route wins by
+    default. Moving a Route changes its position in the order of definition.
+
+    Matching paths of Routes that need full regular expressions is timed if
+    `match_time_budget` in seconds is set. Time is CPU time of the matching
+    thread, so waiting for the GIL doesn't count. Route that takes longer to
+    match repeatedly is quarantined and retired, so one slow pattern can't slow
+    down every request.
+    """
+
+    # Table is built again when a move spreads order keys of more than 1/rebuild_ratio of Routes.
+    rebuild_ratio = 8
+
+    def __init__(
+        self,
+        index: str = TrieRouteIndex.name,
+        match_cache_size: int = 1024,
+        lazy: bool = False,
+        match_time_budget: Optional[float] = None,
+        route_order: str = RouteOrder.definition.value
+    ) -> None:
+        self.lock = threading.RLock()
+        self.route_type: Type[Route] = LazyRoute if lazy else Route
+        self.index_type = RouteIndex.find_implementation(index)
+        self.route_order = RouteOrder(route_order)
+        self.match_cache_size = match_cache_size
+        self.match_time_budget = match_time_budget
+        self.table = RoutingTable(IdList(), self.index_type, match_cache_size, route_order=self.route_order)
+        self.snapshots: Dict[str, RouterSnapshot] = {}
+
+    @property
+    def routes(self) -> IdList[Route]:
+        """All Routes in order of definition."""
+        return self.table.routes
+
+    def _prepare(self, routes: Iterable[Route]) -> None:
+        """Prepare Routes to be added to routing table."""
+        for route in routes:
+            route.on_exhausted = self.retire
+            route.match_time_budget = self.match_time_budget
+
+    def _build_table(self, routes: IdList[Route]) -> None:
+        """Build new routing table from Routes and replace the current one."""
+        self._prepare(routes)
+        self.table = RoutingTable(routes, self.index_type, self.match_cache_size, self.table, self.route_order)
+
+    def _change_table(self, routes: IdList[Route], removed: Iterable[Route] = (), added: Iterable[Route] = ()) -> None:
+        """Create next routing table from the current one with changed Routes and replace the current one."""
+        self._prepare(added)
+        self.table = self.table.change(routes, removed, added)
+
+    def retire(self, route: Route) -> None:
+        """Replace the routing table by a table without exhausted Route in the index so it's never tested again."""
+        with self.lock:
+            if self.routes.get(route.id) is route:
+                self.table = self.table.retire(route)
+
+    def initialize(self, snapshot: Optional[RouterSnapshot] = None) -> None:
+        """Set initial routes when application starts."""
+        self.restore(snapshot or RouterSnapshot())
 
     def reset(self, routes: Optional[List[Dict[str, Any]]] = None) -> None:
         """Replace all custom routes."""
-        self.routes: IdList[Route] = IdList()
-        if routes:
-            for route in routes:
-                self.add_route(route)
+        self._restore(self.compile(routes))
+
+    def compile(
+        self,
+        routes: Optional[Iterable[Dict[str, Any]]] = None,
+        keep_definitions: bool = False
+    ) -> RouterSnapshot:
+        """Create snapshot of Routes from json without adding them to the router.
+
+        Snapshot keeps json definitions of the Routes if requested, they are needed
+        to publish the Routes to other processes.
+        """
+        snapshot = RouterSnapshot()
+        for route in map(copy.deepcopy, routes or []):
+            if keep_definitions:
+                definition = self._define(route)
+                snapshot.definitions[definition['id']] = definition
+            else:
+                self._set_ids(route)
+            self._add(snapshot.routes, self.route_type.deserialize(route))
+        return snapshot
+
+    def snapshot(self) -> RouterSnapshot:
+        """Create snapshot of current Routes and their usage."""
+        return RouterSnapshot(self.routes).copy()
+
+    def restore(self, snapshot: RouterSnapshot) -> None:
+        """Replace all Routes by copies of Routes from snapshot."""
+        self._restore(snapshot.copy())
+
+    def _restore(self, snapshot: RouterSnapshot) -> None:
+        """Replace all Routes by Routes from snapshot, the snapshot can't be restored again."""
+        with self.lock:
+            self._build_table(snapshot.routes)
+
+    def save_snapshot(self, name: str) -> None:
+        """Save snapshot of current Routes and their usage under given name."""
+        with self.lock:
+            self.snapshots[name] = self.snapshot()
+
+    def restore_snapshot(self, name: str) -> None:
+        """Restore snapshot saved under given name."""
+        if (snapshot := self.snapshots.get(name)) is None:
+            raise MissingSnapshotError(f'Snapshot "{name}" does not exist.')
+        self.restore(snapshot)
 
     def _generate_route_id(self) -> str:
         """Generate route id."""
@@ -234,46 +897,156 @@ class Router:
             continue  # pragma: no cover
         return route_id
 
-    def _set_route_id(self, route: Dict[str, Any], route_id: str = None) -> None:
+    def _set_route_id(self, route: Dict[str, Any], route_id: Optional[str] = None) -> None:
         """Set route id if it doesn't already exist. Generate id if not set."""
         route.setdefault('id', route_id or self._generate_route_id())
 
-    def add_route(self, route: Dict[str, Any]) -> Route:
-        """Add custom request and matching responses."""
+    def _set_ids(self, route: Dict[str, Any]) -> None:
+        """Set missing ids of a Route and its responses."""
         self._set_route_id(route)
-        route_object = Route.deserialize(route)
+        for response in route.get('responses', []):
+            response.setdefault('id', str(uuid.uuid4()))
+
+    def _define(self, route: Dict[str, Any]) -> Dict[str, Any]:
+        """Set missing ids of a Route and its responses, return copy of its definition."""
+        self._set_ids(route)
+        return copy.deepcopy(route)
+
+    def _create_route(self, route: Dict[str, Any]) -> Route:
+        """Create Route from json, generate its id if it's not set."""
+        self._set_route_id(route)
+        return Route.deserialize(route)
+
+    @staticmethod
+    def _add(routes: IdList[Route], route: Route) -> None:
+        """Add Route to list of Routes."""
         try:
-            self.routes.add(route_object)
+            routes.add(route)
         except KeyError:
-            raise DuplicateRouteError(f'Route id "{route_object.id}" already exists.')
+            raise DuplicateRouteError(f'Route id "{route.id}" already exists.')
+
+    def _accept(self, added: List[Route]) -> None:
+        """Prepare new Routes once all of them are valid, right before they are added to routing table."""
+
+    def add_route(self, route: Dict[str, Any]) -> Route:
+        """Add custom request and matching responses."""
+        with self.lock:
+            route_object = self._create_route(route)
+            routes = self.routes.copy()
+            self._add(routes, route_object)
+            self._accept([route_object])
+            self._change_table(routes, added=[route_object])
         return route_object
 
+    def _extend(self, added: List[Route]) -> None:
+        """Add prepared Routes to the end of order of definition."""
+        routes = self.routes.copy()
+        for route in added:
+            self._add(routes, route)
+        self._change_table(routes, added=added)
+
+    def add_routes(self, routes: List[Dict[str, Any]]) -> List[Route]:
+        """Add multiple Routes at once, add all of them or none if any of them is invalid."""
+        with self.lock:
+            new_routes = self.routes.copy()
+            added = []
+            errors: Dict[int, str] = {}
+            for index, route in enumerate(routes):
+                try:
+                    route_object = self._create_route(route)
+                    self._add(new_routes, route_object)
+                    added.append(route_object)
+                except RouteConfigurationError as error:
+                    errors[index] = str(error)
+            if errors:
+                raise InvalidRoutesError(f'{len(errors)} of {len(routes)} Routes could not be added.', errors)
+            self._accept(added)
+            self._change_table(new_routes, added=added)
+        return added
+
     def get_route(self, route_id: str) -> Optional[Route]:
         """Get Route by its id."""
         return self.routes.get(route_id)
 
     def remove_route(self, route_id: str) -> None:
         """Remove Route by its id."""
-        self.routes.remove(route_id)
+        with self.lock:
+            if (route := self.routes.get(route_id)) is not None:
+                routes = self.routes.copy()
+                routes.remove(route_id)
+                self._change_table(routes, removed=[route])
 
     def update_route(self, route: Dict[str, Any], route_id: str) -> Route:
         """Update route with completely new data."""
-        self._set_route_id(route, route_id)
-        if route_id != route['id'] and route['id'] in self.routes:
-            raise DuplicateRouteError(
-                f'Cannot change route id "{route_id}" to "{route["id"]}". Route id "{route["id"]}" already exists.'
-            )
+        with self.lock:
+            if route_id not in self.routes:
+                raise MissingRouteError(f'Cannot update route "{route_id}". Route doesn\'t exist.')
+            self._set_route_id(route, route_id)
+            if route_id != route['id'] and route['id'] in self.routes:
+                raise DuplicateRouteError(
+                    f'Cannot change route id "{route_id}" to "{route["id"]}". Route id "{route["id"]}" already exists.'
+                )
 
-        route_object = Route.deserialize(route)
-        try:
-            self.routes.replace(route_id, route_object)
-        except KeyError:
-            raise MissingRouteError(f'Cannot update route "{route_id}". Route doesn\'t exist.')
+            route_object = self._create_route(route)
+            self._accept([route_object])
+            self._replace(route_id, route_object)
         return route_object
 
+    def _replace(self, route_id: str, route: Route) -> None:
+        """Replace Route with given id by prepared Route keeping its position in order of definition."""
+        if (original := self.routes.get(route_id)) is None:
+            raise MissingRouteError(f'Cannot update route "{route_id}". Route doesn\'t exist.')
+        routes = self.routes.copy()
+        routes.replace(route_id, route)
+        self._change_table(routes, removed=[original], added=[route])
+
+    def move_route(self, route_id: str, index: int) -> Route:
+        """Move Route to given position in order of definition."""
+        with self.lock:
+            if (route := self.routes.get(route_id)) is None:
+                raise MissingRouteError(f'Cannot move route "{route_id}". Route doesn\'t exist.')
+            routes = self.routes.copy()
+            spread = routes.move(route_id, index)
+            if len(spread) * self.rebuild_ratio > len(routes):
+                self._build_table(routes)
+            else:
+                self._change_table(routes, removed=[route, *spread], added=[route, *spread])
+        return route
+
     def match(self, incoming_request: IncomingRequest) -> Optional[Route]:
         """Find matching Route and return apropriet RouteResponse or None."""
-        for route in self.routes:
-            if route.match(incoming_request):
-                return route
+        return self.table.match(incoming_request)
+
+    def consume(self, incoming_request: IncomingRequest) -> Optional[RouteResponse]:
+        """Find matching Route, authenticate the request and use response of the Route, None if no Route matches.
+
+        Another request may use the last response of the Route between matching and
+        consuming it, the request is then matched again, the exhausted Route is skipped.
+        Raises AuthenticationError if the request isn't authenticated for the Route.
+        """
+        exhausted = None
+        while (route := self.match(incoming_request)) and route is not exhausted:
+            if route.auth_required:
+                route.authenticate(incoming_request)
+            if response := route.consume():
+                return response
+            exhausted = route
         return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get statistics of the router."""
+        table = self.table
+        return {
+            'routes': {
+                'total': len(table.routes),
+                'retired': table.retired,
+                'materialized': sum(1 for route in table.routes if route.is_materialized),
+                'quarantined': sum(1 for route in table.routes if route.quarantined)
+            },
+            'match_cache': table.match_cache.serialize(),
+            'prefix_filter': table.prefix_filter.serialize()
+        }
+
+    def serialize(self) -> List[Dict[str, Any]]:
+        """Convert all Routes to json."""
+        return self.routes.serialize()
@@ -0,0 +1,583 @@
+"""Routes shared by multiple worker processes."""
+
+from __future__ import annotations
+
+import contextlib
+import copy
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from trickster.collections import IdList, UsageCounter
+from trickster.routing import MissingSnapshotError, SharedStateFullError
+from trickster.routing.index import TrieRouteIndex
+from trickster.routing.input import IncomingRequest
+from trickster.routing.router import (
+    ResponseSelector, Route, RouteOrder, RouteResponse, Router, RouterSnapshot, RoutingTable
+)
+
+
+COUNTER = struct.Struct('q')
+
+# The file starts with a header containing generation of published Routes, first free counter slot,
+# epoch of counters, incremented whenever all counter slots are released, and generation of published
+# definitions of all Routes, changes published later are appended to a separate file.
+HEADER_SLOTS = 4
+
+# Counters of a Route: uses of the Route and number of active responses, followed by uses of each response.
+ROUTE_SLOTS = 2
+
+
+class SharedCounter(UsageCounter):
+    """Usage counter stored in memory shared by processes.
+
+    Changes of the counter are not atomic, counters have to be changed under a SharedLock.
+    """
+
+    __slots__ = ('memory', 'offset')
+
+    def __init__(self, memory: mmap.mmap, offset: int) -> None:
+        self.memory = memory
+        self.offset = offset
+
+    def get(self) -> int:
+        """Get current value of the counter."""
+        return COUNTER.unpack_from(self.memory, self.offset)[0]
+
+    def set(self, value: int) -> None:
+        """Set value of the counter."""
+        COUNTER.pack_into(self.memory, self.offset, value)
+
+    def add(self, delta: int = 1) -> int:
+        """Add delta to the counter, return the new value."""
+        value = self.get() + delta
+        self.set(value)
+        return value
+
+
+class SharedLock:
+    """Lock excluding other threads of this process and all other processes.
+
+    Processes lock a byte range of the shared file, threads of one process share a lock
+    of the byte range.
+    """
+
+    def __init__(self, fd: int, offset: int, thread_lock: threading.Lock, length: int = COUNTER.size) -> None:
+        self.fd = fd
+        self.offset = offset
+        self.thread_lock = thread_lock
+        self.length = length
+
+    def __enter__(self) -> None:
+        """Acquire the lock."""
+        self.thread_lock.acquire()
+        try:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, self.length, self.offset)
+        except BaseException:
+            self.thread_lock.release()
+            raise
+
+    def __exit__(self, *args: Any) -> None:
+        """Release the lock."""
+        fcntl.lockf(self.fd, fcntl.LOCK_UN, self.length, self.offset)
+        self.thread_lock.release()
+
+
+class SharedSelector(ResponseSelector):
+    """Selector of responses of a Route with counters in shared state.
+
+    Selector remembers epoch of the counters when the Route got them. Once the
+    counters are released, the Route is stale and its counters may belong to
+    other Routes, so the selector doesn't select any response. Router then
+    matches the request again with Routes loaded from the shared state.
+    """
+
+    def __init__(self, selector: ResponseSelector, epoch: SharedCounter) -> None:
+        super().__init__(selector.responses)
+        self.selector = selector
+        self.epoch = epoch
+        self.expected_epoch = epoch.get()
+
+    def select(self) -> Optional[RouteResponse]:
+        """Select response using the wrapped selector, None if counters of the Route were released."""
+        if self.epoch.get() != self.expected_epoch:
+            return None
+        return self.selector.select()
+
+
+class SharedState:
+    """State of Routes shared by worker processes.
+
+    Usage counters are stored in a file mapped to memory of every process. Definitions
+    of all Routes are published to a json file next to it, later changes of Routes are
+    appended to another file, one json line per publication. Every publication increments
+    generation of the state. Releasing counters increments their epoch while locks of
+    all Routes are held, Routes check the epoch under their lock before using them.
+    """
+
+    def __init__(self, path: Path, size: int) -> None:
+        self.path = path
+        self.definitions_path = self.get_definitions_path(path)
+        self.changes_path = self.get_changes_path(path)
+        self.size = size
+        length = (HEADER_SLOTS + size) * COUNTER.size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < length:
+            os.ftruncate(self.fd, length)
+        self.memory = mmap.mmap(self.fd, length)
+        self.generation = SharedCounter(self.memory, 0)
+        self.next_slot = SharedCounter(self.memory, COUNTER.size)
+        self.epoch = SharedCounter(self.memory, 2 * COUNTER.size)
+        self.base = SharedCounter(self.memory, 3 * COUNTER.size)
+        self.thread_locks: Dict[int, threading.Lock] = {}
+        self.lock = SharedLock(self.fd, 0, threading.Lock())
+
+    @staticmethod
+    def get_definitions_path(path: Path) -> Path:
+        """Get path to file with published definitions of Routes."""
+        return path.with_name(f'{path.name}.routes.json')
+
+    @staticmethod
+    def get_changes_path(path: Path) -> Path:
+        """Get path to file with changes of Routes published after their definitions."""
+        return path.with_name(f'{path.name}.changes.jsonl')
+
+    @staticmethod
+    def get_snapshot_path(path: Path, name: str) -> Path:
+        """Get path to file with named snapshot of Routes."""
+        return path.with_name(f'{path.name}.snapshot.{name}.json')
+
+    @classmethod
+    def remove(cls, path: Path) -> None:
+        """Remove files of shared state."""
+        snapshot_paths = path.parent.glob(cls.get_snapshot_path(path, '*').name)
+        for file_path in [path, cls.get_definitions_path(path), cls.get_changes_path(path), *snapshot_paths]:
+            if file_path.exists():
+                file_path.unlink()
+
+    def _offset(self, slot: int) -> int:
+        """Get offset of counter slot in the file."""
+        return (HEADER_SLOTS + slot) * COUNTER.size
+
+    def counter(self, slot: int) -> SharedCounter:
+        """Get counter in given slot."""
+        return SharedCounter(self.memory, self._offset(slot))
+
+    def route_lock(self, slot: int) -> SharedLock:
+        """Get lock of a Route with counters starting in given slot."""
+        thread_lock = self.thread_locks.setdefault(slot, threading.Lock())
+        return SharedLock(self.fd, self._offset(slot), thread_lock)
+
+    def _check(self, slot: int, count: int) -> None:
+        """Raise SharedStateFullError if given number of counters doesn't fit after given slot."""
+        if slot + count > self.size:
+            raise SharedStateFullError(
+                f'Cannot allocate {count} counters, {self.size - slot} of {self.size} counters left.'
+            )
+
+    def allocate(self, count: int) -> int:
+        """Reserve given number of counter slots, return the first one."""
+        slot = self.next_slot.get()
+        self._check(slot, count)
+        self.next_slot.add(count)
+        return slot
+
+    @contextlib.contextmanager
+    def _route_locks(self) -> Iterator[None]:
+        """Hold locks of all Routes of this process and locks of all counters of other processes."""
+        with contextlib.ExitStack() as stack:
+            for thread_lock in list(self.thread_locks.values()):
+                stack.enter_context(thread_lock)
+            stack.enter_context(SharedLock(self.fd, self._offset(0), threading.Lock(), self.size * COUNTER.size))
+            yield
+
+    def clear(self) -> None:
+        """Release all counter slots, Routes using them become stale."""
+        with self._route_locks():
+            self.epoch.add()
+            self.next_slot.set(0)
+
+    def reset(self, count: int) -> int:
+        """Release all counter slots and reserve given number of them, nothing is released if they don't fit."""
+        self._check(0, count)
+        self.clear()
+        return self.allocate(count)
+
+    @staticmethod
+    def _write(path: Path, data: List[Dict[str, Any]]) -> None:
+        """Replace content of json file at once, so other processes never read it partially written."""
+        temp_path = path.with_name(f'{path.name}.{os.getpid()}')
+        with temp_path.open('w') as json_file:
+            json.dump(data, json_file)
+        os.replace(temp_path, path)
+
+    def publish(self, definitions: List[Dict[str, Any]]) -> int:
+        """Publish definitions of all Routes to other processes, drop published changes, return new generation."""
+        self._write(self.definitions_path, definitions)
+        self.changes_path.write_bytes(b'')
+        generation = self.generation.add()
+        self.base.set(generation)
+        return generation
+
+    def publish_changes(self, changes: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """Publish changes of Routes to other processes, return new generation and size of published changes."""
+        with self.changes_path.open('ab') as changes_file:
+            changes_file.write(json.dumps(changes).encode('utf-8') + b'\n')
+            size = changes_file.tell()
+        return self.generation.add(), size
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Load published definitions of Routes."""
+        if not self.definitions_path.exists():
+            return []
+        with self.definitions_path.open() as json_file:
+            return json.load(json_file)
+
+    def load_changes(self, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Load changes of Routes published after given offset, return them and size of published changes."""
+        if not self.changes_path.exists():
+            return [], 0
+        with self.changes_path.open('rb') as changes_file:
+            changes_file.seek(offset)
+            changes = [change for line in changes_file for change in json.loads(line)]
+            return changes, changes_file.tell()
+
+    def save_snapshot(self, name: str, entries: List[Dict[str, Any]]) -> None:
+        """Save definitions and usage of Routes under given name."""
+        self._write(self.get_snapshot_path(self.path, name), entries)
+
+    def load_snapshot(self, name: str) -> List[Dict[str, Any]]:
+        """Load definitions and usage of Routes saved under given name."""
+        path = self.get_snapshot_path(self.path, name)
+        if not path.exists():
+            raise MissingSnapshotError(f'Snapshot "{name}" does not exist.')
+        with path.open() as json_file:
+            return json.load(json_file)
+
+
+class SharedRouter(Router):
+    """Router sharing Routes and their usage with other worker processes.
+
+    Every change of Routes is published to the shared state, routers of other processes
+    apply the same changes when they notice the generation of the state changed, only
+    the changed Routes are deserialized. Definitions of all Routes are published after
+    a reset or when there are more published changes than Routes. Usage
+    counters of Routes and responses live in shared memory and responses are consumed
+    under locks excluding all processes.
+
+    A change is validated before any counters are allocated for it. When a change
+    fails, Routes and their definitions are restored as they were before it, so
+    they still match the published ones.
+
+    Counters of removed Routes are not reused until the Routes are reset, Routes
+    other processes matched before the reset never use the released counters.
+    Named snapshots are saved next to the shared state, so a snapshot saved
+    by one process can be restored by any other.
+    """
+
+    def __init__(
+        self,
+        state: SharedState,
+        index: str = TrieRouteIndex.name,
+        match_cache_size: int = 1024,
+        match_time_budget: Optional[float] = None,
+        route_order: str = RouteOrder.definition.value
+    ) -> None:
+        self.state = state
+        self.definitions: Dict[str, Dict[str, Any]] = {}
+        self.slots: Dict[str, int] = {}
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.journal: Optional[Dict[str, Optional[Tuple[Dict[str, Any], int]]]] = None
+        self.loaded_generation = 0
+        self.loaded_base = 0
+        self.changes_offset = 0
+        self.changes = 0
+        self.changelog: Optional[List[Dict[str, Any]]] = []
+        super().__init__(index, match_cache_size, match_time_budget=match_time_budget, route_order=route_order)
+
+    @contextlib.contextmanager
+    def _change(self) -> Iterator[None]:
+        """Change Routes and publish them to other processes, nested changes are published once."""
+        with self.lock:
+            if self.changes:
+                yield
+                return
+            with self.state.lock:
+                self._load_changes()
+                table, definitions, slots = self.table, self.definitions, self.slots
+                self.changes += 1
+                self.changelog = []
+                self.pending = {}
+                self.journal = {}
+                try:
+                    yield
+                    self._publish()
+                except Exception:
+                    self._rollback(table, definitions, slots)
+                    raise
+                finally:
+                    self.changes -= 1
+                    self.journal = None
+
+    def _rollback(self, table: RoutingTable, definitions: Dict[str, Dict[str, Any]], slots: Dict[str, int]) -> None:
+        """Restore Routes and their definitions as they were before a failed change."""
+        self.table = table
+        self.definitions, self.slots = definitions, slots
+        for route_id, entry in (self.journal or {}).items():
+            if entry is None:
+                self._forget(route_id)
+            else:
+                self.definitions[route_id], self.slots[route_id] = entry
+
+    def _load_changes(self) -> None:
+        """Load Routes published by other processes if they changed."""
+        if (generation := self.state.generation.get()) == self.loaded_generation:
+            return
+        if self.state.base.get() != self.loaded_base:
+            self._load_definitions()
+        changes, self.changes_offset = self.state.load_changes(self.changes_offset)
+        for change in changes:
+            self._apply(change)
+        self.loaded_generation = generation
+
+    def _load_definitions(self) -> None:
+        """Load definitions of all Routes published by other process."""
+        routes: IdList[Route] = IdList()
+        self.definitions = {}
+        self.slots = {}
+        for entry in self.state.load():
+            routes.add(self._load_route(entry['route'], entry['slot']))
+        self._build_table(routes)
+        self.loaded_base = self.state.base.get()
+        self.changes_offset = 0
+
+    def _apply(self, change: Dict[str, Any]) -> None:
+        """Apply change of Routes published by other process."""
+        action = change['action']
+        if action == 'add':
+            self._extend([self._load_route(entry['route'], entry['slot']) for entry in change['routes']])
+        elif action == 'update':
+            route = self._load_route(change['route'], change['slot'])
+            self._replace(change['id'], route)
+            if route.id != change['id']:
+                self._forget(change['id'])
+        elif action == 'remove':
+            super().remove_route(change['id'])
+            self._forget(change['id'])
+        elif action == 'move':
+            super().move_route(change['id'], change['index'])
+
+    def _load_route(self, definition: Dict[str, Any], slot: int) -> Route:
+        """Create Route published by other process."""
+        route = Route.deserialize(copy.deepcopy(definition))
+        self._attach(route, slot)
+        self._remember(route.id)
+        self.definitions[route.id] = definition
+        self.slots[route.id] = slot
+        return route
+
+    def _entry(self, route: Route) -> Dict[str, Any]:
+        """Get published definition of a Route with its first counter slot."""
+        return {'slot': self.slots[route.id], 'route': self.definitions[route.id]}
+
+    def _record(self, change: Dict[str, Any]) -> None:
+        """Record change of Routes to be published, unless all Routes are published."""
+        if self.changelog is not None:
+            self.changelog.append(change)
+
+    def _publish(self) -> None:
+        """Publish recorded changes to other processes, or all Routes if there are more changes than Routes."""
+        if self.changelog == []:
+            return
+        if self.changelog is None or self.state.generation.get() - self.state.base.get() >= len(self.routes):
+            self.loaded_generation = self.state.publish([self._entry(route) for route in self.routes])
+            self.loaded_base = self.loaded_generation
+            self.changes_offset = 0
+        else:
+            self.loaded_generation, self.changes_offset = self.state.publish_changes(self.changelog)
+
+    @staticmethod
+    def _counters(route: Route) -> List[UsageCounter]:
+        """Get counters of a Route in order of their slots."""
+        return [route.counter, route.active_counter, *(response.counter for response in route.responses)]
+
+    def _attach(self, route: Route, slot: int, initialize: bool = False) -> None:
+        """Replace counters and lock of a Route with shared ones."""
+        responses = list(route.responses)
+        counters = self._counters(route)
+        shared = [self.state.counter(slot + position) for position in range(len(counters))]
+        if initialize:
+            for counter, shared_counter in zip(counters, shared):
+                shared_counter.set(counter.get())
+        route.counter, route.active_counter = shared[:ROUTE_SLOTS]
+        for response, shared_counter in zip(responses, shared[ROUTE_SLOTS:]):
+            response.counter = shared_counter
+        route.lock = self.state.route_lock(slot)
+        route.selector = SharedSelector(route.selector, self.state.epoch)
+
+    @staticmethod
+    def _count(routes: Iterable[Route]) -> int:
+        """Count counter slots needed by Routes."""
+        return sum(ROUTE_SLOTS + len(route.responses) for route in routes)
+
+    def _create_route(self, route: Dict[str, Any]) -> Route:
+        """Create Route from json, keep its definition until the Route is accepted."""
+        definition = self._define(route)
+        route_object = super()._create_route(route)
+        self.pending[route_object.id] = definition
+        return route_object
+
+    def _accept(self, added: List[Route]) -> None:
+        """Allocate shared counters for valid new Routes at once."""
+        self._bind(added, self.pending, self.state.allocate(self._count(added)))
+
+    def _bind(self, routes: Iterable[Route], definitions: Dict[str, Dict[str, Any]], slot: int) -> None:
+        """Attach new Routes to shared counters allocated for them starting in given slot."""
+        for route in routes:
+            self._attach(route, slot, initialize=True)
+            self._remember(route.id)
+            self.definitions[route.id] = definitions[route.id]
+            self.slots[route.id] = slot
+            slot += ROUTE_SLOTS + len(route.responses)
+
+    def _remember(self, route_id: str) -> None:
+        """Remember definition of a Route before the first change of it, so a failed change can restore it."""
+        if self.journal is not None and route_id not in self.journal:
+            known = route_id in self.definitions
+            self.journal[route_id] = (self.definitions[route_id], self.slots[route_id]) if known else None
+
+    def _forget(self, route_id: str) -> None:
+        """Forget definition of a removed Route."""
+        self._remember(route_id)
+        self.definitions.pop(route_id, None)
+        self.slots.pop(route_id, None)
+
+    def refresh(self) -> None:
+        """Load Routes again if other process changed them."""
+        if self.state.generation.get() != self.loaded_generation:
+            with self.lock:
+                if not self.changes:
+                    with self.state.lock:
+                        self._load_changes()
+
+    def initialize(self, snapshot: Optional[RouterSnapshot] = None) -> None:
+        """Set initial routes if no other process did it, load shared Routes otherwise."""
+        with self._change():
+            if not self.loaded_generation:
+                super().initialize(snapshot)
+
+    def compile(
+        self,
+        routes: Optional[Iterable[Dict[str, Any]]] = None,
+        keep_definitions: bool = True
+    ) -> RouterSnapshot:
+        """Create snapshot of Routes from json, always keep their definitions to publish them."""
+        return super().compile(routes, keep_definitions=True)
+
+    def snapshot(self) -> RouterSnapshot:
+        """Create snapshot of current Routes and their usage."""
+        with self.lock:
+            self.refresh()
+            return RouterSnapshot(self.routes, self.definitions).copy()
+
+    def _restore(self, snapshot: RouterSnapshot) -> None:
+        """Replace all Routes by Routes from snapshot and publish them."""
+        with self._change():
+            self.changelog = None
+            slot = self.state.reset(self._count(snapshot.routes))
+            self.journal = None  # Routes are restored by replacing both dictionaries
+            self.definitions = {}
+            self.slots = {}
+            self._bind(snapshot.routes, snapshot.definitions, slot)
+            super()._restore(snapshot)
+
+    def save_snapshot(self, name: str) -> None:
+        """Save snapshot of current Routes and their usage, so any process can restore it."""
+        snapshot = self.snapshot()
+        self.state.save_snapshot(name, [
+            {
+                'route': snapshot.definitions[route.id],
+                'counters': [counter.get() for counter in self._counters(route)]
+            } for route in snapshot.routes
+        ])
+
+    def restore_snapshot(self, name: str) -> None:
+        """Restore snapshot saved under given name by any process."""
+        snapshot = RouterSnapshot()
+        for entry in self.state.load_snapshot(name):
+            route = Route.deserialize(copy.deepcopy(entry['route']))
+            for counter, value in zip(self._counters(route), entry['counters']):
+                counter.set(value)
+            route.selector = route.response_selection.create_selector(route.responses)
+            snapshot.routes.add(route)
+            snapshot.definitions[route.id] = entry['route']
+        self._restore(snapshot)
+
+    def add_route(self, route: Dict[str, Any]) -> Route:
+        """Add custom request and matching responses."""
+        with self._change():
+            route_object = super().add_route(route)
+            self._record({'action': 'add', 'routes': [self._entry(route_object)]})
+            return route_object
+
+    def add_routes(self, routes: List[Dict[str, Any]]) -> List[Route]:
+        """Add multiple Routes at once, add all of them or none if any of them is invalid."""
+        with self._change():
+            added = super().add_routes(routes)
+            self._record({'action': 'add', 'routes': [self._entry(route) for route in added]})
+            return added
+
+    def get_route(self, route_id: str) -> Optional[Route]:
+        """Get Route by its id."""
+        self.refresh()
+        return super().get_route(route_id)
+
+    def remove_route(self, route_id: str) -> None:
+        """Remove Route by its id."""
+        with self._change():
+            super().remove_route(route_id)
+            self._forget(route_id)
+            self._record({'action': 'remove', 'id': route_id})
+
+    def update_route(self, route: Dict[str, Any], route_id: str) -> Route:
+        """Update route with completely new data."""
+        with self._change():
+            route_object = super().update_route(route, route_id)
+            if route_object.id != route_id:
+                self._forget(route_id)
+            self._record({'action': 'update', 'id': route_id, **self._entry(route_object)})
+            return route_object
+
+    def move_route(self, route_id: str, index: int) -> Route:
+        """Move Route to given position in order of definition."""
+        with self._change():
+            route_object = super().move_route(route_id, index)
+            self._record({'action': 'move', 'id': route_id, 'index': index})
+            return route_object
+
+    def match(self, incoming_request: IncomingRequest) -> Optional[Route]:
+        """Find matching Route and return apropriet RouteResponse or None."""
+        self.refresh()
+        return super().match(incoming_request)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get statistics of the router."""
+        self.refresh()
+        return {
+            **super().stats(),
+            'shared_state': {
+                'generation': self.loaded_generation,
+                'counters': self.state.next_slot.get(),
+                'max_counters': self.state.size
+            }
+        }
+
+    def serialize(self) -> List[Dict[str, Any]]:
+        """Convert all Routes to json."""
+        self.refresh()
+        return super().serialize()
@@ -47,6 +47,12 @@ def compile_json_schema(schema_path: pathlib.Path) -> Callable:
         return fastjsonschema.compile(schema)
 
 
+def compile_json_schemas() -> None:
+    """Compile all json schemas in advance."""
+    for schema_path in schemas_path.glob('*.schema.json'):
+        compile_json_schema(schema_path)
+
+
 def get_schema_path(schema_name: str) -> pathlib.Path:
     """Return path to json schema file."""
     return schemas_path / schema_name
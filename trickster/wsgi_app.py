@@ -0,0 +1,72 @@
+"""Initialization of WSGI app."""
+
+from __future__ import annotations
+
+import functools
+import json
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from trickster.api_app import ApiApp
+from trickster.endpoints.external import DEFAULT_CONTENT_TYPE, NOT_FOUND_BODY, NOT_FOUND_HEADERS
+from trickster.routing.auth import AuthenticationError
+from trickster.routing.input import IncomingWsgiRequest
+
+from werkzeug.exceptions import Unauthorized
+from werkzeug.http import HTTP_STATUS_CODES
+
+
+Environ = Dict[str, Any]
+StartResponse = Callable[..., Any]
+Headers = List[Tuple[str, str]]
+
+
+@functools.lru_cache(maxsize=None)
+def status_line(status: int) -> str:
+    """Get status line of a response with given status code, the same as Flask sends."""
+    return f'{status} {HTTP_STATUS_CODES.get(status, "UNKNOWN").upper()}'
+
+
+def with_content_type(headers: Headers) -> Headers:
+    """Add default content type to headers of a response if they don't contain one."""
+    if any(name.lower() == 'content-type' for name, _ in headers):
+        return headers
+    return [*headers, ('Content-Type', DEFAULT_CONTENT_TYPE)]
+
+
+class WsgiApp:
+    """WSGI application serving Routes of an ApiApp without Flask.
+
+    Requests to user Routes are matched directly against the router and answered
+    by pre-rendered responses, without request context or response objects of
+    Flask. Requests the URL map of the app doesn't route to the external
+    endpoint, eg. internal endpoints or unsupported methods, are passed to the
+    wrapped Flask app, so both apps route requests the same way.
+    """
+
+    def __init__(self, api_app: ApiApp) -> None:
+        self.api_app = api_app
+
+    def __call__(self, environ: Environ, start_response: StartResponse) -> Iterable[bytes]:
+        """Handle WSGI request."""
+        request = IncomingWsgiRequest(environ)
+        if self.api_app.is_external(request.path, request.method):
+            return self.respond(request, start_response)
+        return self.api_app(environ, start_response)
+
+    def preload(self) -> None:
+        """Build everything created lazily on first use, so worker processes forked later share it."""
+        self.api_app.preload()
+
+    def respond(self, request: IncomingWsgiRequest, start_response: StartResponse) -> Iterable[bytes]:
+        """Match request againts defined routes and return appropriet response."""
+        try:
+            if response := self.api_app.user_router.consume(request):
+                response.wait()
+                start_response(status_line(response.status), with_content_type(response.content_headers))
+                return [b'' if request.method == 'HEAD' else response.content]
+            start_response(status_line(404), NOT_FOUND_HEADERS)
+            return [NOT_FOUND_BODY]
+        except AuthenticationError as error:
+            body = json.dumps({'error': Unauthorized().name, 'message': str(error)}).encode('utf-8')
+            start_response(status_line(401), [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+            return [body]